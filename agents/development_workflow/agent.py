@@ -1,5 +1,7 @@
 from google.adk.agents import SequentialAgent, LoopAgent
 
+from .callbacks import MAX_LOOP_ITERATIONS, mark_loop_complete, skip_loop_if_complete
+
 from .subagents.clinical_entity_extractor.agent import clinical_entity_extractor_agent
 from .subagents.medical_coder.agent import medical_coder_agent
 from .subagents.revenue_integrity_judge.agent import revenue_integrity_judge_agent
@@ -9,12 +11,15 @@ from .subagents.billing_finalizer.agent import billing_finalizer_agent
 # --- Define the Loop Agent (Iterative Refinement) ---
 billing_refinement_loop = LoopAgent(
     name="BillingRefinementLoop",
-    max_iterations=5,
+    max_iterations=MAX_LOOP_ITERATIONS,
     sub_agents=[
         medical_coder_agent,
         revenue_integrity_judge_agent,
     ],
-    description="Iteratively refines medical codes based on audit feedback."
+    description="Iteratively refines medical codes based on audit feedback.",
+    # Resumed runs skip the loop once it has finished
+    before_agent_callback=skip_loop_if_complete,
+    after_agent_callback=mark_loop_complete,
 )
 
 # --- Define the Root Sequential Agent ---
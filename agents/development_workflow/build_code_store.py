@@ -0,0 +1,28 @@
+import argparse
+import pathlib
+
+from .code_store import CODE_STORE_PATH, SOURCES_DIR, build_table, write_store
+
+# --- Code Store Builder ---
+# Usage: python -m agents.development_workflow.build_code_store [--icd10 FILE] [--cpt FILE] [--out FILE]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the memory-mapped ICD-10-CM / CPT code store.")
+    parser.add_argument("--icd10", type=pathlib.Path, default=SOURCES_DIR / "icd10cm_codes.txt",
+                        help="CMS ICD-10-CM code file (skipped if missing)")
+    parser.add_argument("--cpt", type=pathlib.Path, default=SOURCES_DIR / "cpt_fee_schedule.csv",
+                        help="CPT fee schedule CSV with code,description,fee columns (skipped if missing)")
+    parser.add_argument("--out", type=pathlib.Path, default=CODE_STORE_PATH)
+    args = parser.parse_args(argv)
+
+    table = build_table(
+        icd10_path=args.icd10 if args.icd10.exists() else None,
+        cpt_path=args.cpt if args.cpt.exists() else None,
+    )
+    write_store(table, args.out)
+    print(f"Wrote {table.num_rows} codes to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
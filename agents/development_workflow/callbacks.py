@@ -0,0 +1,166 @@
+import hashlib
+import os
+import re
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.genai import types
+
+from .structured_outputs import draft_text
+
+# --- Stage Checkpoint / Resume Callbacks ---
+# The worker persists the keys below to DynamoDB as each stage writes them, and seeds a
+# fresh session with them on retry. These callbacks skip every stage whose output is
+# already in state, so a retry resumes at the first unfinished stage instead of re-running
+# the extractor and every finished loop iteration.
+
+MAX_LOOP_ITERATIONS = 5
+
+# --- Loop Convergence ---
+# The refinement loop also stops early once another pass cannot help: the coder returned
+# the draft it already submitted ('same_draft'), or the judge's score did not improve on
+# the previous iteration ('same_score', 'score_regressed'). When it stops, or the budget is
+# spent, the best-scored draft and its review are restored for the finalizer.
+LOOP_CONVERGENCE_ENABLED = os.environ.get("LOOP_CONVERGENCE_ENABLED", "true").lower() == "true"
+
+CHECKPOINT_KEYS = (
+    "tech_spec",
+    "billing_draft",
+    "review_status",
+    "confidence_score",
+    "review_feedback",
+    "loop_iteration",  # coder iterations started
+    "drafted_iteration",  # last iteration whose draft was produced
+    "reviewed_iteration",  # last iteration whose draft was audited
+    "loop_complete",
+    "final_billing_report",
+    "model_tier",  # model-cascade tier reached ('strong' once escalated)
+    "escalation_reason",
+    "escalated_iteration",
+    "code_findings",  # judge's per-code findings for the next (targeted) coder pass
+    "revision_request",
+    "iteration_scores",
+    "best_review",
+    "draft_fingerprint",
+    "loop_converged",
+)
+
+
+def _skip(message: str) -> types.Content:
+    return types.Content(role="model", parts=[types.Part.from_text(text=f"[CHECKPOINT] {message}")])
+
+
+def _converged(message: str) -> types.Content:
+    return types.Content(role="model", parts=[types.Part.from_text(text=f"[CONVERGED] {message}")])
+
+
+def draft_fingerprint(draft: str) -> str:
+    """Whitespace- and case-insensitive hash of a billing draft."""
+    return hashlib.sha1(re.sub(r"\s+", " ", draft).strip().lower().encode()).hexdigest()[:16]
+
+
+def score_convergence(state) -> Optional[str]:
+    """Why the last review ends the loop ('same_score' / 'score_regressed'), or None."""
+    scores = state.get("iteration_scores") or {}
+    iteration = state.get("loop_iteration", 0)
+    current, previous = scores.get(str(iteration)), scores.get(str(iteration - 1))
+    if current is None or previous is None:
+        return None
+    if current == previous:
+        return "same_score"
+    return "score_regressed" if current < previous else None
+
+
+def restore_best_review(state) -> None:
+    """Puts the best-scored draft and its review back in state for the finalizer."""
+    best = state.get("best_review")
+    if not best or best.get("score", -1) <= (state.get("confidence_score") or 0):
+        return
+    state["billing_draft"] = best["billing_draft"]
+    state["confidence_score"] = best["score"]
+    state["review_status"] = best["review_status"]
+    state["review_feedback"] = best["review_feedback"]
+    state["code_findings"] = best.get("code_findings", [])
+
+
+def skip_extraction_if_checkpointed(callback_context: CallbackContext) -> Optional[types.Content]:
+    """before_agent_callback for ClinicalEntityExtractor."""
+    if callback_context.state.get("tech_spec"):
+        return _skip("Clinical spec restored from checkpoint; extraction skipped.")
+    return None
+
+
+def skip_loop_if_complete(callback_context: CallbackContext) -> Optional[types.Content]:
+    """before_agent_callback for BillingRefinementLoop."""
+    if callback_context.state.get("loop_complete"):
+        return _skip("Billing refinement already completed; loop skipped.")
+    return None
+
+
+def mark_loop_complete(callback_context: CallbackContext) -> None:
+    """after_agent_callback for BillingRefinementLoop."""
+    callback_context.state["loop_complete"] = True
+
+
+def start_coding_iteration(callback_context: CallbackContext) -> Optional[types.Content]:
+    """
+    before_agent_callback for MedicalCoderAgent. Counts iterations across retries, skips the
+    coder when its draft for the current iteration is still awaiting review, and ends the
+    loop once the draft was approved or the iteration budget is spent.
+    """
+    state = callback_context.state
+    iteration = state.get("loop_iteration", 0)
+    drafted = state.get("drafted_iteration", 0)
+    reviewed = state.get("reviewed_iteration", 0)
+
+    if state.get("loop_converged"):
+        callback_context._event_actions.escalate = True
+        return _skip(f"Billing refinement converged ({state['loop_converged']}); finalizing.")
+    if iteration and drafted == iteration and reviewed < iteration:
+        return _skip(f"Billing draft of iteration {iteration} restored from checkpoint; awaiting review.")
+    if drafted < iteration:
+        # The coder was interrupted mid-iteration; redo the same iteration
+        return None
+    if iteration and reviewed == iteration and state.get("review_status") == "APPROVED":
+        callback_context._event_actions.escalate = True
+        return _skip(f"Billing draft of iteration {iteration} already approved.")
+    reason = score_convergence(state) if LOOP_CONVERGENCE_ENABLED and iteration and reviewed == iteration else None
+    if reason:
+        state["loop_converged"] = reason
+        restore_best_review(state)
+        callback_context._event_actions.escalate = True
+        return _converged(f"Score did not improve in iteration {iteration} ({reason}); finalizing the best draft.")
+    if iteration >= MAX_LOOP_ITERATIONS:
+        restore_best_review(state)
+        callback_context._event_actions.escalate = True
+        return _skip(f"Iteration budget of {MAX_LOOP_ITERATIONS} spent; finalizing the best draft.")
+
+    state["loop_iteration"] = iteration + 1
+    return None
+
+
+def record_draft_iteration(callback_context: CallbackContext) -> Optional[types.Content]:
+    """after_agent_callback for MedicalCoderAgent. Ends the loop when the draft did not change."""
+    state = callback_context.state
+    iteration = state.get("loop_iteration", 0)
+    state["drafted_iteration"] = iteration
+    fingerprint = draft_fingerprint(draft_text(state))
+    previous, state["draft_fingerprint"] = state.get("draft_fingerprint"), fingerprint
+    if LOOP_CONVERGENCE_ENABLED and iteration > 1 and fingerprint == previous:
+        # The judge already reviewed this exact draft; its review stands
+        state["loop_converged"] = "same_draft"
+        restore_best_review(state)
+        callback_context._event_actions.escalate = True
+        return _converged(f"Iteration {iteration} repeated the previous draft; finalizing the best draft.")
+    return None
+
+
+def skip_review_if_checkpointed(callback_context: CallbackContext) -> Optional[types.Content]:
+    """before_agent_callback for RevenueIntegrityJudge."""
+    state = callback_context.state
+    iteration = state.get("loop_iteration", 0)
+    if iteration and state.get("reviewed_iteration", 0) == iteration:
+        if state.get("review_status") == "APPROVED":
+            callback_context._event_actions.escalate = True
+        return _skip(f"Audit of iteration {iteration} restored from checkpoint.")
+    return None
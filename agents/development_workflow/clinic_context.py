@@ -0,0 +1,81 @@
+import os
+import pathlib
+import re
+import threading
+
+# --- Clinic-Context Digest ---
+# onboard_project() used to hand every agent the full README (~35 KB of deployment and
+# architecture prose). Agents now get a digest of knowledge_base/clinic_context.md:
+# comments and blank runs removed, capped at CLINIC_CONTEXT_MAX_CHARS on a line boundary.
+# A capped digest ends with a visible [TRUNCATED] marker; the agents' instructions keep
+# their search / read_file fallback for anything a partial copy does not show.
+# The digest is built once per process and rebuilt only when the source file changes.
+#
+# With PRELOAD_KNOWLEDGE on, the worker also seeds every session with the digest and the
+# billing manual (preload_knowledge_state). The agents' instructions render them through
+# {clinic_context?} / {billing_manual?}, so the extractor starts extracting on its first
+# model turn instead of spending sequential turns on onboard_project / read_file, and the
+# coder and judge stop searching the manual for the same static facts.
+
+KNOWLEDGE_BASE = pathlib.Path(__file__).parent.parent.parent.resolve() / "knowledge_base"
+CLINIC_CONTEXT_PATH = KNOWLEDGE_BASE / "clinic_context.md"
+CLINIC_CONTEXT_MAX_CHARS = int(os.environ.get("CLINIC_CONTEXT_MAX_CHARS", "4000"))
+BILLING_MANUAL_PATH = KNOWLEDGE_BASE / "billing_codes.md"
+BILLING_MANUAL_MAX_CHARS = int(os.environ.get("BILLING_MANUAL_MAX_CHARS", "16000"))
+PRELOAD_KNOWLEDGE = os.environ.get("PRELOAD_KNOWLEDGE", "true").lower() == "true"
+
+COMMENT_PATTERN = re.compile(r"<!--.*?-->", re.DOTALL)
+TRUNCATION_MARKER = ("[TRUNCATED: {count} more line(s) of {source} not shown. This copy is partial; "
+                     "use `search_knowledge_base` or `read_file` for anything not shown above.]")
+
+_DIGEST_CACHE: dict[str, tuple[tuple[int, int, int], str]] = {}
+_DIGEST_LOCK = threading.Lock()
+
+
+def build_digest(content: str, max_chars: int = CLINIC_CONTEXT_MAX_CHARS, source: str = "the source") -> str:
+    """
+    Strips comments and blank lines and truncates at the last whole line within `max_chars`,
+    ending a truncated digest with TRUNCATION_MARKER.
+    """
+    lines = [line.rstrip() for line in COMMENT_PATTERN.sub("", content).splitlines() if line.strip()]
+    digest, size = [], 0
+    for line in lines:
+        if size + len(line) + 1 > max_chars:
+            digest.append(TRUNCATION_MARKER.format(count=len(lines) - len(digest), source=source))
+            break
+        digest.append(line)
+        size += len(line) + 1
+    return "\n".join(digest)
+
+
+def get_digest(path: str | os.PathLike, max_chars: int) -> str:
+    """Returns the cached digest for `path`, rebuilding it only when the file changed."""
+    path = os.fspath(path)
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size, max_chars)
+    cached = _DIGEST_CACHE.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    with _DIGEST_LOCK:
+        cached = _DIGEST_CACHE.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        with open(path, encoding="utf-8") as f:
+            digest = build_digest(f.read(), max_chars, source=f"knowledge_base/{os.path.basename(path)}")
+        _DIGEST_CACHE[path] = (signature, digest)
+        return digest
+
+
+def get_clinic_context() -> str:
+    return get_digest(CLINIC_CONTEXT_PATH, CLINIC_CONTEXT_MAX_CHARS)
+
+
+def preload_knowledge_state() -> dict[str, str]:
+    """Initial session state holding the static knowledge; empty when PRELOAD_KNOWLEDGE is off."""
+    if not PRELOAD_KNOWLEDGE:
+        return {}
+    return {
+        "clinic_context": get_clinic_context(),
+        "billing_manual": get_digest(BILLING_MANUAL_PATH, BILLING_MANUAL_MAX_CHARS),
+    }
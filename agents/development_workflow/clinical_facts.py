@@ -0,0 +1,242 @@
+import re
+from dataclasses import asdict, dataclass
+from datetime import date, datetime
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.genai import types
+
+# --- Deterministic Clinical Pre-Extractor ---
+# Patient age (Date of Birth vs Date of Service), laterality and billable procedures are
+# regex / date-arithmetic facts. They are extracted from the raw note in Python, with the
+# quoted evidence span for each, and written to state['clinical_facts'] before
+# ClinicalEntityExtractor runs. The extractor, coder and judge treat them as ground truth
+# (an ambiguous laterality, or a procedure not documented as performed, is marked unverified),
+# and the rule engine scores drafts with the same functions. Only precompiled regexes are
+# used, so one core extracts thousands of notes per second (also usable for triage).
+
+DATE_PATTERN = r"(\d{1,2}/\d{1,2}/\d{4}|\d{4}-\d{2}-\d{2})"
+DOB_PATTERN = re.compile(rf"(?:DOB|Date of Birth)\W*{DATE_PATTERN}", re.IGNORECASE)
+DOS_PATTERN = re.compile(rf"(?:DOS|Date of Service)\W*{DATE_PATTERN}", re.IGNORECASE)
+# "5-year-old", "5 yr old", "5 y/o", "5yo", "Age: 5", "aged 5"; never a duration ("a 2 yr history")
+STATED_AGE_PATTERN = re.compile(
+    r"\b(\d{1,2})[- ]?(?:(?:years?|yrs?)[- ]old\b|y/?o\b)"
+    r"|\b(?:age:?|aged)\s*(\d{1,2})\b(?!\s*(?:-|\s)?(?:years?|yrs?)?\s*(?:history|ago|duration))",
+    re.IGNORECASE)
+INFANT_AGE_PATTERN = re.compile(r"\b\d{1,2}[- ]?(?:months?|weeks?|days?)[- ]old\b", re.IGNORECASE)
+
+LATERALITY_SITE = r"(?:ear|eye|tympanic|tm|side)"
+BILATERAL_PATTERN = re.compile(r"\bbilateral\b|\bboth (?:ears|eyes)\b", re.IGNORECASE)
+RIGHT_PATTERN = re.compile(rf"\bright\s+{LATERALITY_SITE}|\b{LATERALITY_SITE}\W+right\b", re.IGNORECASE)
+LEFT_PATTERN = re.compile(rf"\bleft\s+{LATERALITY_SITE}|\b{LATERALITY_SITE}\W+left\b", re.IGNORECASE)
+# A side mentioned only in a normal / negated clause ("Right TM normal") has no findings
+NEGATED_PATTERN = re.compile(r"\b(?:normal|clear|unremarkable|intact|negative|wnl|no|not|without|pearly)\b",
+                             re.IGNORECASE)
+CLAUSE_BREAK = re.compile(r"[.;,\n]")
+PROFILE_PATTERN = re.compile(r"Laterality Profile:\W*(Right|Left|Bilateral)\b", re.IGNORECASE)
+
+PROCEDURE_PATTERNS = {
+    "nebulizer": re.compile(r"nebuli[sz]\w*", re.IGNORECASE),
+    "strep_test": re.compile(r"rapid strep|strep (?:test|swab)|antigen (?:test|detection)", re.IGNORECASE),
+}
+# A procedure is a fact only when the note says it was done in this visit ("given", "positive").
+# A negated mention ("No nebulizer needed") is dropped; a mention with no administration
+# context, or one about the patient's own device ("home nebulizer"), is kept as unconfirmed.
+PROCEDURE_NEGATED_BEFORE = re.compile(r"\b(?:no|not|without|declined|deferred|refused)\b", re.IGNORECASE)
+PROCEDURE_NEGATED_AFTER = re.compile(r"\b(?:not|declined|deferred|refused|unnecessary)\b", re.IGNORECASE)
+PROCEDURE_ADMINISTERED = re.compile(
+    r"\b(?:given|administered|performed|done|completed|obtained|collected|sent|in (?:clinic|office)|"
+    r"positive|negative|results?|resulted)\b", re.IGNORECASE)
+PROCEDURE_OFF_SITE = re.compile(r"\b(?:home|own)\b", re.IGNORECASE)
+PROCEDURE_LABELS = {"nebulizer": "Nebulizer treatment (CPT 94640)", "strep_test": "Rapid strep antigen test (CPT 87880)"}
+
+# Scenario 4 preventive-visit age bands: (min_age, max_age, cpt)
+PREVENTIVE_AGE_BANDS = ((1, 4, "99392"), (5, 11, "99393"))
+
+
+@dataclass(frozen=True)
+class Evidence:
+    """A quoted span of the note that supports one fact."""
+    fact: str
+    quote: str
+    start: int
+    end: int
+
+
+@dataclass(frozen=True)
+class ClinicalFacts:
+    age_years: Optional[int] = None
+    age_source: Optional[str] = None  # 'dob_dos', 'stated' or 'infant'
+    date_of_birth: Optional[str] = None  # ISO dates
+    date_of_service: Optional[str] = None
+    laterality: Optional[str] = None  # 'right', 'left' or 'bilateral'
+    # Both sides are mentioned but only one has findings: a hint, not ground truth
+    laterality_ambiguous: bool = False
+    procedures: tuple[str, ...] = ()
+    # Mentioned but not documented as done in this visit: hints, not ground truth
+    unconfirmed_procedures: tuple[str, ...] = ()
+    evidence: tuple[Evidence, ...] = ()
+
+    @property
+    def preventive_cpt(self) -> Optional[str]:
+        if self.age_years is None:
+            return None
+        return next((cpt for low, high, cpt in PREVENTIVE_AGE_BANDS if low <= self.age_years <= high), None)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def render(self) -> str:
+        """Markdown block the agents' instructions embed as ground truth."""
+        if self.age_years is None:
+            age = "Not determinable from the note"
+        elif self.age_source == "dob_dos":
+            age = f"{self.age_years} years (DOB {self.date_of_birth}, DOS {self.date_of_service})"
+        else:
+            age = f"{self.age_years} years (stated in the note)"
+        lines = [
+            f"* **Patient Age:** {age}",
+            f"* **Preventive Age Band (Scenario 4):** {self.preventive_cpt or 'Not applicable'}",
+            f"* **Laterality:** {(self.laterality or 'Not Specified').title()}"
+            + (" (unverified: both sides are mentioned but only this one has findings; confirm from the note)"
+               if self.laterality_ambiguous else ""),
+            f"* **Procedures Documented:** {', '.join(PROCEDURE_LABELS[p] for p in self.procedures) or 'None'}",
+        ]
+        if self.unconfirmed_procedures:
+            lines.append("* **Procedures Mentioned (unverified: not documented as performed this visit; confirm "
+                         f"from the note):** {', '.join(PROCEDURE_LABELS[p] for p in self.unconfirmed_procedures)}")
+        lines += [f"* Evidence ({e.fact}): \"{e.quote}\"" for e in self.evidence]
+        return "\n".join(lines)
+
+
+def _span(fact: str, match: re.Match) -> Evidence:
+    return Evidence(fact, match.group(0), match.start(), match.end())
+
+
+def _parse_date(value: str) -> Optional[date]:
+    for fmt in ("%m/%d/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def find_age(text: str) -> tuple[Optional[int], Optional[str], list[Evidence], Optional[date], Optional[date]]:
+    """Age in whole years: DOB vs DOS when both are present, otherwise a stated age."""
+    dob, dos = DOB_PATTERN.search(text), DOS_PATTERN.search(text)
+    born = _parse_date(dob.group(1)) if dob else None
+    seen = _parse_date(dos.group(1)) if dos else None
+    if born and seen and seen >= born:
+        age = seen.year - born.year - ((seen.month, seen.day) < (born.month, born.day))
+        return age, "dob_dos", [_span("age", dob), _span("age", dos)], born, seen
+    stated = STATED_AGE_PATTERN.search(text)
+    if stated:
+        return int(stated.group(1) or stated.group(2)), "stated", [_span("age", stated)], born, seen
+    infant = INFANT_AGE_PATTERN.search(text)
+    if infant:
+        return 0, "infant", [_span("age", infant)], born, seen
+    return None, None, [], born, seen
+
+
+def _clause(text: str, match: re.Match) -> tuple[int, int]:
+    """Bounds of the clause (between . ; , or newlines) around a match."""
+    breaks = [m.end() for m in CLAUSE_BREAK.finditer(text, 0, match.start())]
+    end = CLAUSE_BREAK.search(text, match.end())
+    return breaks[-1] if breaks else 0, end.start() if end else len(text)
+
+
+def _has_findings(text: str, match: re.Match) -> bool:
+    """False when the clause around a side mention is normal or negated ("Right TM normal")."""
+    start, end = _clause(text, match)
+    return not NEGATED_PATTERN.search(text, start, end)
+
+
+def affirmed_clauses(text: str) -> str:
+    """The note without its normal or negated clauses ("No wheezing", "Lungs clear")."""
+    return "\n".join(c for c in CLAUSE_BREAK.split(text) if not NEGATED_PATTERN.search(c))
+
+
+def _side_mentions(pattern: re.Pattern, text: str) -> tuple[Optional[re.Match], bool]:
+    """The first mention of a side with findings (else any mention), and whether it has findings."""
+    mentions = list(pattern.finditer(text))
+    positive = next((m for m in mentions if _has_findings(text, m)), None)
+    return (positive, True) if positive else (mentions[0] if mentions else None, False)
+
+
+def find_laterality(text: str) -> tuple[Optional[str], list[Evidence], bool]:
+    """
+    (side, evidence, ambiguous). Only sides with findings count. When both sides are
+    mentioned but only one has findings, that side is returned with ambiguous=True.
+    """
+    bilateral, bilateral_findings = _side_mentions(BILATERAL_PATTERN, text)
+    if bilateral_findings:
+        return "bilateral", [_span("laterality", bilateral)], False
+    right, right_findings = _side_mentions(RIGHT_PATTERN, text)
+    left, left_findings = _side_mentions(LEFT_PATTERN, text)
+    if right_findings and left_findings:
+        return "bilateral", [_span("laterality", right), _span("laterality", left)], False
+    if right_findings or left_findings:
+        side, match, other = ("right", right, left) if right_findings else ("left", left, right)
+        return side, [_span("laterality", match)], other is not None
+    return None, [], False
+
+
+def _procedure_status(text: str, match: re.Match) -> Optional[str]:
+    """'performed', 'unconfirmed', or None when the clause negates the procedure."""
+    start, end = _clause(text, match)
+    if PROCEDURE_NEGATED_BEFORE.search(text, start, match.start()) or \
+            PROCEDURE_NEGATED_AFTER.search(text, match.end(), end):
+        return None
+    if PROCEDURE_OFF_SITE.search(text, start, end) or not PROCEDURE_ADMINISTERED.search(text, start, end):
+        return "unconfirmed"
+    return "performed"
+
+
+def find_procedures(text: str) -> tuple[tuple[str, ...], list[Evidence], tuple[str, ...]]:
+    """
+    (performed, evidence, unconfirmed). A procedure counts as performed when one of its
+    mentions is documented as done this visit; otherwise a non-negated mention is unconfirmed.
+    """
+    found, evidence, unconfirmed = [], [], []
+    for name, pattern in PROCEDURE_PATTERNS.items():
+        statuses = {}
+        for match in pattern.finditer(text):
+            statuses.setdefault(_procedure_status(text, match), match)
+        if "performed" in statuses:
+            found.append(name)
+            evidence.append(_span(name, statuses["performed"]))
+        elif "unconfirmed" in statuses:
+            unconfirmed.append(name)
+    return tuple(found), evidence, tuple(unconfirmed)
+
+
+def spec_laterality(tech_spec: str) -> Optional[str]:
+    """The Laterality Profile stated in a Clinical Spec."""
+    profile = PROFILE_PATTERN.search(tech_spec)
+    return profile.group(1).lower() if profile else None
+
+
+def extract_clinical_facts(note: str) -> ClinicalFacts:
+    age, source, age_evidence, born, seen = find_age(note)
+    side, side_evidence, side_ambiguous = find_laterality(note)
+    procedures, procedure_evidence, unconfirmed = find_procedures(note)
+    return ClinicalFacts(
+        age_years=age,
+        age_source=source,
+        date_of_birth=born.isoformat() if born else None,
+        date_of_service=seen.isoformat() if seen else None,
+        laterality=side,
+        laterality_ambiguous=side_ambiguous,
+        procedures=procedures,
+        unconfirmed_procedures=unconfirmed,
+        evidence=tuple(age_evidence + side_evidence + procedure_evidence),
+    )
+
+
+def preextract_clinical_facts(callback_context: CallbackContext) -> Optional[types.Content]:
+    """before_agent_callback for ClinicalEntityExtractor: writes state['clinical_facts'] from the note."""
+    user_content = callback_context.user_content
+    note = "".join(p.text or "" for p in (user_content.parts or [])) if user_content else ""
+    callback_context.state["clinical_facts"] = extract_clinical_facts(note).render()
+    return None
@@ -0,0 +1,193 @@
+import csv
+import logging
+import os
+import pathlib
+import re
+import threading
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+
+from .knowledge_index import get_knowledge_index
+
+logger = logging.getLogger(__name__)
+
+# --- Columnar ICD-10-CM / CPT Code Store ---
+# The full code set lives in an uncompressed Arrow IPC file that is memory-mapped at
+# cold start, so opening it costs O(1) regardless of size and lookups run as vectorized
+# Arrow compute kernels over the mapped columns. Parquet files are also accepted.
+
+PACKAGE_ROOT = pathlib.Path(__file__).parent.parent.parent.resolve()
+MANUAL_PATH = PACKAGE_ROOT / "knowledge_base" / "billing_codes.md"
+SOURCES_DIR = PACKAGE_ROOT / "knowledge_base" / "code_sources"
+CODE_STORE_PATH = pathlib.Path(
+    os.environ.get("CODE_STORE_PATH", PACKAGE_ROOT / "knowledge_base" / "code_store.arrow")
+)
+
+SCHEMA = pa.schema([
+    pa.field("code", pa.string(), nullable=False),
+    pa.field("system", pa.string(), nullable=False),  # 'ICD-10-CM' or 'CPT'
+    pa.field("description", pa.string(), nullable=False),
+    pa.field("search_text", pa.string(), nullable=False),  # lowercased code + description + manual category
+    pa.field("fee", pa.float64()),  # CPT fee schedule amount, null for diagnoses
+])
+
+
+def normalize_code(code: str) -> str:
+    """Canonical form used by the store: uppercase, ICD-10 codes dotted after 3 chars."""
+    code = code.strip().upper().replace(" ", "")
+    if re.fullmatch(r"[A-Z][0-9][0-9A-Z][0-9A-Z]{1,4}", code):
+        return f"{code[:3]}.{code[3:]}"
+    return code
+
+
+class CodeStore:
+    """Read-only view over the code table with exact, prefix and keyword lookups."""
+
+    def __init__(self, table: pa.Table, source: str = "in-memory"):
+        self.table = table
+        self.source = source
+        self._code = self.table.column("code")
+        self._search_text = self.table.column("search_text")
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    def _rows(self, mask, limit: int) -> list[dict]:
+        return self.table.filter(mask).slice(0, limit).to_pylist()
+
+    def lookup(self, code: str) -> dict | None:
+        """Returns the row for an exact code, with or without the ICD-10 dot."""
+        rows = self._rows(pc.equal(self._code, normalize_code(code)), 1)
+        return rows[0] if rows else None
+
+    def prefix(self, prefix: str, limit: int = 50) -> list[dict]:
+        """Returns codes starting with `prefix` (e.g. 'H66.00' or 'H6600')."""
+        prefix = prefix.rstrip("*").strip().upper()
+        if len(prefix) > 3 and "." not in prefix:
+            prefix = normalize_code(prefix)
+        return self._rows(pc.starts_with(self._code, prefix), limit)
+
+    def keyword(self, query: str, limit: int = 20) -> list[dict]:
+        """Returns rows whose code, description or manual category contains every term."""
+        terms = [t for t in query.lower().split() if t]
+        if not terms:
+            return []
+        mask = None
+        for term in terms:
+            term_mask = pc.match_substring(self._search_text, term)
+            mask = term_mask if mask is None else pc.and_(mask, term_mask)
+        return self._rows(mask, limit)
+
+    def search(self, query: str, limit: int = 20) -> list[dict]:
+        """Dispatches to exact, prefix ('H66.00*') or description keyword lookup."""
+        query = query.strip()
+        if query.endswith("*"):
+            return self.prefix(query, limit)
+        if " " not in query:
+            exact = self.lookup(query)
+            if exact:
+                return [exact]
+        return self.keyword(query, limit)
+
+
+def format_rows(rows: list[dict]) -> str:
+    lines = []
+    for row in rows:
+        fee = f" | fee ${row['fee']:.2f}" if row.get("fee") is not None else ""
+        lines.append(f"{row['code']} | {row['system']} | {row['description']}{fee}")
+    return "\n".join(lines)
+
+
+# --- Building the store ---
+
+def _rows_from_manual(manual_path: pathlib.Path) -> list[dict]:
+    index = get_knowledge_index(manual_path)
+    rows = [{"code": r.code, "system": "ICD-10-CM", "description": r.description, "category": r.category, "fee": None}
+            for r in index.icd10]
+    rows += [{"code": r.code, "system": "CPT", "description": r.description, "category": r.category, "fee": None}
+             for r in index.cpt]
+    return rows
+
+
+def _rows_from_icd10_file(path: pathlib.Path) -> list[dict]:
+    """Parses the CMS 'icd10cm_codes_YYYY.txt' format: '<CODE> <description>' per line."""
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            parts = line.strip().split(None, 1)
+            if len(parts) == 2:
+                rows.append({"code": normalize_code(parts[0]), "system": "ICD-10-CM",
+                             "description": parts[1].strip(), "fee": None})
+    return rows
+
+
+def _rows_from_cpt_csv(path: pathlib.Path) -> list[dict]:
+    """Parses a fee schedule CSV with 'code', 'description' and optional 'fee' columns."""
+    rows = []
+    with open(path, encoding="utf-8", newline="") as f:
+        for record in csv.DictReader(f):
+            fee = (record.get("fee") or "").replace("$", "").strip()
+            rows.append({"code": record["code"].strip(), "system": "CPT",
+                         "description": record["description"].strip(), "fee": float(fee) if fee else None})
+    return rows
+
+
+def build_table(icd10_path=None, cpt_path=None, manual_path=MANUAL_PATH) -> pa.Table:
+    """Merges the manual's rows with the full code sets; later sources override earlier ones."""
+    merged: dict[str, dict] = {}
+    sources = [_rows_from_manual(pathlib.Path(manual_path))]
+    if icd10_path:
+        sources.append(_rows_from_icd10_file(pathlib.Path(icd10_path)))
+    if cpt_path:
+        sources.append(_rows_from_cpt_csv(pathlib.Path(cpt_path)))
+    for rows in sources:
+        for row in rows:
+            merged[row["code"]] = {**merged.get(row["code"], {}), **{k: v for k, v in row.items() if v is not None}}
+
+    ordered = [merged[code] for code in sorted(merged)]
+    # The manual's category labels ('Nebulizer Treatment') stay searchable without a column.
+    return pa.Table.from_pylist([
+        {"code": row["code"], "system": row["system"], "description": row["description"], "fee": row.get("fee"),
+         "search_text": " ".join(filter(None, [row["code"], row["description"], row.get("category")])).lower()}
+        for row in ordered
+    ], schema=SCHEMA)
+
+
+def write_store(table: pa.Table, out_path: pathlib.Path) -> None:
+    """Writes an uncompressed Arrow IPC file so it can be memory-mapped zero-copy."""
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_suffix(out_path.suffix + ".tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink, ipc.new_file(sink, SCHEMA) as writer:
+        writer.write_table(table, max_chunksize=64 * 1024)
+    os.replace(tmp_path, out_path)
+
+
+def open_store(path: pathlib.Path) -> CodeStore:
+    """Memory-maps an Arrow IPC (or Parquet) store file."""
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+        return CodeStore(pq.read_table(path, memory_map=True), source=str(path))
+    with pa.memory_map(str(path), "r") as source:
+        table = ipc.open_file(source).read_all()
+    return CodeStore(table, source=str(path))
+
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_code_store() -> CodeStore:
+    """Returns the process-wide code store, memory-mapping it on first use."""
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                if CODE_STORE_PATH.exists():
+                    _STORE = open_store(CODE_STORE_PATH)
+                else:
+                    logger.warning(f"Code store {CODE_STORE_PATH} not found; falling back to the billing manual rows.")
+                    _STORE = CodeStore(build_table(), source=str(MANUAL_PATH))
+                logger.info(f"Code store loaded: {len(_STORE)} codes from {_STORE.source}")
+    return _STORE
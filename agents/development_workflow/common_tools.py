@@ -1,6 +1,11 @@
 import pathlib
 import subprocess
 
+from .clinic_context import CLINIC_CONTEXT_PATH, get_clinic_context
+from .code_store import format_rows, get_code_store
+from .knowledge_index import get_knowledge_index, render_results
+from .resource_snapshot import get_resource_snapshot, timed_tool
+
 # --- Path Safety Configuration ---
 # Resolves the root directory of the Pediatric RCM project.
 REPO_ROOT = pathlib.Path(__file__).parent.parent.parent.resolve()
@@ -15,21 +20,22 @@ def safe_path(file_path: str) -> pathlib.Path:
     return resolved_path
 
 
+@timed_tool
 def read_file(path: str) -> str:
-    """Reads clinical notes, knowledge base files, or encounter drafts."""
+    """Reads a knowledge base file (e.g., 'knowledge_base/billing_codes.md')."""
     try:
-        return safe_path(path).read_text()
+        return get_resource_snapshot().read(path)
     except Exception as e:
         return f"Error reading file {path}: {e}"
 
 
+@timed_tool
 def onboard_project() -> str:
-    """Reads the README.md to provide the agent with Pediatric Associates clinic context."""
-    readme_path = "README.md"
+    """Returns a compact digest of the Pediatric Associates clinic context (workflow, source of truth, coding conventions)."""
     try:
-        return read_file(path=readme_path)
+        return get_clinic_context()
     except Exception as e:
-        return f"Error: Could not read {readme_path}. {e}"
+        return f"Error: Could not read {CLINIC_CONTEXT_PATH.name}. {e}"
 
 
 def write_file(path: str, content: str) -> str:
@@ -41,31 +47,63 @@ def write_file(path: str, content: str) -> str:
         return f"Error writing file {path}: {e}"
 
 
+@timed_tool
 def search_knowledge_base(query: str, file_path: str = "knowledge_base/billing_codes.md") -> str:
     """
     Searches the billing manual for specific keywords (e.g., 'Asthma', 'Scenario 4').
+    Supports multiple terms ('asthma nebulizer'), prefixes ('H66*') and exact codes ('J45.51').
+    Matching code table rows are returned as-is and scenarios are returned as whole blocks.
     This is preferred over reading the whole file to save tokens and increase precision.
     """
     try:
-        content = read_file(file_path)
-        lines = content.splitlines()
-        # Find lines that contain the query (case-insensitive)
-        matches = [line for line in lines if query.lower() in line.lower()]
-        
+        index = get_knowledge_index(safe_path(file_path))
+        matches = index.search(query)
+
         if not matches:
             return f"No matches found for '{query}' in {file_path}."
-        
-        return "\n".join(matches)
+
+        return render_results(matches)
     except Exception as e:
         return f"Error searching knowledge base: {e}"
 
 
+@timed_tool
+def lookup_code(code: str) -> str:
+    """
+    Looks up an ICD-10-CM or CPT code in the full code store (e.g., 'J45.51', '94640').
+    A trailing '*' returns every code with that prefix (e.g., 'H66.00*').
+    Use this to confirm a code exists and to read its official description.
+    """
+    try:
+        store = get_code_store()
+        rows = store.prefix(code) if code.strip().endswith("*") else [r for r in [store.lookup(code)] if r]
+        if not rows:
+            return f"Code '{code}' not found in the code store."
+        return format_rows(rows)
+    except Exception as e:
+        return f"Error looking up code: {e}"
+
+
+@timed_tool
+def search_codes(query: str, limit: int = 20) -> str:
+    """
+    Searches the full ICD-10-CM / CPT code store by exact code, prefix ('H66.00*')
+    or description keywords (e.g., 'otitis media right', 'nebulizer').
+    """
+    try:
+        rows = get_code_store().search(query, limit=limit)
+        if not rows:
+            return f"No codes found for '{query}'."
+        return format_rows(rows)
+    except Exception as e:
+        return f"Error searching codes: {e}"
+
+
+@timed_tool
 def list_directory(path: str) -> list[str]:
-    """Lists available clinical notes or resource folders."""
+    """Lists the knowledge base files under a folder (e.g., 'knowledge_base')."""
     try:
-        root = safe_path(path)
-        files = [str(p.relative_to(REPO_ROOT)) for p in root.glob('**/*')]
-        return files
+        return get_resource_snapshot().list(path)
     except Exception as e:
         return [f"Error listing directory {path}: {e}"]
 
@@ -91,6 +129,7 @@ def run_shell_command(command: str) -> str:
         return f"Command failed:\nSTDOUT:\n{e.stdout}\nSTDERR:\n{e.stderr}"
 
 
+@timed_tool
 def list_git_files() -> str:
-    """Lists files tracked by Git (excludes .venv and other ignored files)."""
-    return run_shell_command(command="git ls-files")
\ No newline at end of file
+    """Lists every agent-visible resource file, one path per line."""
+    return "\n".join(get_resource_snapshot().list())
\ No newline at end of file
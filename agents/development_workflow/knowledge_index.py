@@ -0,0 +1,206 @@
+import bisect
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+
+# --- Compiled Billing Manual Index ---
+# Parses knowledge_base/billing_codes.md once into structured ICD-10 rows, CPT rows
+# and Scenario blocks, backed by an inverted token index. The compiled index is cached
+# per file and rebuilt automatically when the file's mtime or size changes.
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[a-z0-9]+)*")
+STOPWORDS = frozenset({"a", "an", "and", "the", "of", "to", "for", "in", "on", "or", "is", "be", "by", "with"})
+
+
+def normalize_token(token: str) -> str:
+    """Lowercases a token and strips a simple plural suffix ('years' -> 'year')."""
+    token = token.lower()
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss") and token.isalpha():
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    """Splits text into normalized index tokens. Codes such as 'H66.001' stay whole."""
+    return [normalize_token(t) for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+@dataclass(frozen=True)
+class CodeRow:
+    """A single row of the Master Code Lookup Table."""
+    system: str  # 'ICD-10' or 'CPT'
+    code: str
+    category: str
+    description: str
+    line: str
+
+    def render(self) -> str:
+        return self.line
+
+
+@dataclass(frozen=True)
+class ScenarioBlock:
+    """A '### Scenario N: ...' block from the Clinical Decision Scenarios section."""
+    number: int
+    title: str
+    text: str
+    codes: tuple[str, ...] = field(default_factory=tuple)
+
+    def render(self) -> str:
+        return self.text
+
+
+class KnowledgeIndex:
+    """Structured, token-indexed view of the billing manual."""
+
+    def __init__(self, content: str, source: str = ""):
+        self.source = source
+        self.icd10: list[CodeRow] = []
+        self.cpt: list[CodeRow] = []
+        self.scenarios: list[ScenarioBlock] = []
+        self._parse(content)
+
+        # Documents are searched in manual order: code rows first, then scenarios.
+        self.documents: list[CodeRow | ScenarioBlock] = [*self.icd10, *self.cpt, *self.scenarios]
+        self.codes: dict[str, CodeRow] = {row.code: row for row in (*self.icd10, *self.cpt)}
+        self._postings: dict[str, set[int]] = {}
+        for doc_id, doc in enumerate(self.documents):
+            for token in set(tokenize(self._searchable_text(doc))):
+                self._postings.setdefault(token, set()).add(doc_id)
+        self._vocabulary = sorted(self._postings)
+
+    # --- Parsing ---
+
+    def _parse(self, content: str) -> None:
+        table_system = None
+        scenario_lines: list[str] = []
+        scenario_header = None
+
+        def flush_scenario():
+            if scenario_header is None:
+                return
+            number, title = scenario_header
+            text = "\n".join(scenario_lines).strip()
+            codes = tuple(dict.fromkeys(re.findall(r"\b(?:[A-Z]\d{2}\.[0-9A-Z]{1,4}|\d{5})\b", text)))
+            self.scenarios.append(ScenarioBlock(number=number, title=title, text=text, codes=codes))
+
+        for line in content.splitlines():
+            stripped = line.strip()
+
+            scenario_match = re.match(r"^###\s+Scenario\s+(\d+)\s*:\s*(.+)$", stripped, re.IGNORECASE)
+            if scenario_match:
+                flush_scenario()
+                scenario_header = (int(scenario_match.group(1)), scenario_match.group(2).strip())
+                scenario_lines = [stripped]
+                continue
+            if scenario_header is not None:
+                if stripped.startswith("#") or stripped == "---":
+                    flush_scenario()
+                    scenario_header = None
+                elif stripped:
+                    scenario_lines.append(line.rstrip())
+                continue
+
+            if not stripped.startswith("|"):
+                table_system = None
+                continue
+            cells = [c.strip() for c in stripped.strip("|").split("|")]
+            if len(cells) < 3:
+                continue
+            header = cells[1].lower()
+            if "icd-10" in header:
+                table_system = "ICD-10"
+                continue
+            if "cpt" in header:
+                table_system = "CPT"
+                continue
+            if table_system is None or set(cells[1]) <= set(":- "):
+                continue
+            code = cells[1].strip("* ")
+            row = CodeRow(system=table_system, code=code, category=cells[0], description=cells[2], line=stripped)
+            (self.icd10 if table_system == "ICD-10" else self.cpt).append(row)
+        flush_scenario()
+
+    @staticmethod
+    def _searchable_text(doc) -> str:
+        if isinstance(doc, CodeRow):
+            return f"{doc.system} {doc.code} {doc.category} {doc.description}"
+        return doc.text
+
+    # --- Querying ---
+
+    def _expand_term(self, term: str) -> set[int]:
+        """Resolves one query term (exact token, or 'prefix*') to matching document ids."""
+        if term.endswith("*"):
+            prefix = normalize_token(term.rstrip("*").lower())
+            if not prefix:
+                return set()
+            matches: set[int] = set()
+            start = bisect.bisect_left(self._vocabulary, prefix)
+            for token in self._vocabulary[start:]:
+                if not token.startswith(prefix):
+                    break
+                matches |= self._postings[token]
+            return matches
+        return set(self._postings.get(normalize_token(term), ()))
+
+    def search(self, query: str, limit: int = 10) -> list[CodeRow | ScenarioBlock]:
+        """
+        Returns documents matching the query terms. Documents matching every term win;
+        if none do, the documents matching the most terms are returned instead.
+        """
+        terms = [t for t in re.findall(r"[A-Za-z0-9][A-Za-z0-9.]*\*?", query) if t.lower() not in STOPWORDS]
+        terms = [t.rstrip(".") if not t.endswith("*") else t for t in terms]
+        if not terms:
+            return []
+
+        scores: dict[int, int] = {}
+        for term in dict.fromkeys(terms):
+            for doc_id in self._expand_term(term):
+                scores[doc_id] = scores.get(doc_id, 0) + 1
+        if not scores:
+            return []
+
+        best = max(scores.values())
+        ranked = sorted(doc_id for doc_id, score in scores.items() if score == best)
+        return [self.documents[doc_id] for doc_id in ranked[:limit]]
+
+    def lookup(self, code: str) -> CodeRow | None:
+        """Returns the table row for an exact ICD-10 or CPT code."""
+        return self.codes.get(code.strip().strip("*").upper())
+
+    def scenario(self, number: int) -> ScenarioBlock | None:
+        return next((s for s in self.scenarios if s.number == number), None)
+
+
+def render_results(matches: list[CodeRow | ScenarioBlock]) -> str:
+    """Renders matched table rows as one block of lines, followed by whole scenario blocks."""
+    rows = [m.render() for m in matches if isinstance(m, CodeRow)]
+    blocks = ["\n".join(rows)] if rows else []
+    blocks += [m.render() for m in matches if isinstance(m, ScenarioBlock)]
+    return "\n\n".join(blocks)
+
+
+# --- Process-wide cache keyed by file path, invalidated on mtime/size change ---
+_INDEX_CACHE: dict[str, tuple[tuple[int, int], KnowledgeIndex]] = {}
+_INDEX_LOCK = threading.Lock()
+
+
+def get_knowledge_index(path: str | os.PathLike) -> KnowledgeIndex:
+    """Returns the compiled index for `path`, rebuilding it only when the file changed."""
+    path = os.fspath(path)
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _INDEX_CACHE.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    with _INDEX_LOCK:
+        cached = _INDEX_CACHE.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        with open(path, encoding="utf-8") as f:
+            index = KnowledgeIndex(f.read(), source=path)
+        _INDEX_CACHE[path] = (signature, index)
+        return index
@@ -0,0 +1,75 @@
+import os
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.genai import types
+
+from .structured_outputs import draft_text
+from .subagents.revenue_integrity_judge.rule_engine import draft_codes
+
+# --- Model-Tier Cascade ---
+# MedicalCoderAgent and RevenueIntegrityJudge start every job on the fast tier
+# (gemini-2.5-flash) and move to the strong tier (gemini-2.5-pro, the agents' configured
+# model) for the rest of the job as soon as the fast tier falls short:
+#   - malformed_draft:  the coder's output is not a parseable Billing Draft
+#   - malformed_review: the judge finished without recording a review
+#   - rule_engine:      the deterministic pre-score rejected the draft
+#   - low_confidence:   the LLM judge scored the draft below the approval threshold
+# The tier and the first escalation are kept in state (and checkpointed), so a resumed job
+# stays on the tier it reached and the job metrics can report escalation rates.
+
+CASCADE_ENABLED = os.environ.get("MODEL_CASCADE_ENABLED", "true").lower() == "true"
+FAST_MODEL = os.environ.get("CASCADE_FAST_MODEL", "gemini-2.5-flash")
+STRONG_MODEL = os.environ.get("CASCADE_STRONG_MODEL", "gemini-2.5-pro")
+
+CASCADE_KEYS = ("model_tier", "escalation_reason", "escalated_iteration")
+
+
+def current_model(state) -> str:
+    return STRONG_MODEL if state.get("model_tier") == "strong" else FAST_MODEL
+
+
+def escalate(callback_context: CallbackContext, reason: str) -> None:
+    """Moves the job to the strong tier; only the first escalation is recorded."""
+    state = callback_context.state
+    if not CASCADE_ENABLED or state.get("model_tier") == "strong":
+        return
+    state["model_tier"] = "strong"
+    state["escalation_reason"] = reason
+    state["escalated_iteration"] = state.get("loop_iteration", 0)
+
+
+def select_cascade_model(callback_context: CallbackContext, llm_request) -> None:
+    """before_model_callback: routes the call to the job's current tier (runs before the rate limiter)."""
+    if CASCADE_ENABLED:
+        llm_request.model = current_model(callback_context.state)
+    return None
+
+
+def escalate_after_rejected_draft(callback_context: CallbackContext) -> Optional[types.Content]:
+    """before_agent_callback for MedicalCoderAgent: a fast-tier draft that was not approved escalates."""
+    state = callback_context.state
+    iteration = state.get("loop_iteration", 0)
+    if iteration and state.get("reviewed_iteration", 0) == iteration and state.get("review_status") != "APPROVED":
+        decided = str(state.get("rule_engine_report", "")).startswith("Rule engine pre-score")
+        escalate(callback_context, "rule_engine" if decided else "low_confidence")
+    return None
+
+
+def escalate_on_malformed_draft(callback_context: CallbackContext) -> None:
+    """after_agent_callback for MedicalCoderAgent."""
+    draft = draft_text(callback_context.state)
+    if "insufficient data" in draft.lower():
+        return None
+    icd10, _ = draft_codes(draft)
+    if "[BILLING-DRAFT]" not in draft or not icd10:
+        escalate(callback_context, "malformed_draft")
+    return None
+
+
+def escalate_on_missing_review(callback_context: CallbackContext) -> None:
+    """after_agent_callback for RevenueIntegrityJudge; only runs when the LLM judge itself ran."""
+    state = callback_context.state
+    if state.get("reviewed_iteration", 0) != state.get("loop_iteration", 0):
+        escalate(callback_context, "malformed_review")
+    return None
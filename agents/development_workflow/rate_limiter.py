@@ -0,0 +1,317 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# --- Adaptive Client-Side Rate Limiter for Gemini ---
+# Every LLM call goes through a per-model token bucket (requests/minute and tokens/minute)
+# via the agents' before/after/on-error model callbacks. The budget adapts AIMD-style:
+# a 429 halves the model's rate and opens a cooldown (honouring Retry-After), every
+# successful call wins a little of it back. Waits carry random jitter so concurrent
+# pipelines do not retry in lockstep. State is process-wide (shared by every pipeline on
+# the worker's event loop); an optional QuotaStore shares it across Lambda instances.
+
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+
+# Defaults follow the Gemini API tier-1 quotas; override with RATE_LIMITS='{"<model>": {"rpm": .., "tpm": ..}}'
+DEFAULT_QUOTAS = {
+    "gemini-2.5-pro": {"rpm": 150, "tpm": 2_000_000},
+    "gemini-2.5-flash": {"rpm": 1000, "tpm": 1_000_000},
+}
+FALLBACK_QUOTA = {"rpm": 60, "tpm": 250_000}
+
+BURST_SECONDS = 5.0  # bucket capacity, in seconds of the current rate
+DECREASE_FACTOR = 0.5  # multiplicative decrease on 429
+INCREASE_STEP = 0.05  # additive increase per successful call
+MIN_RATE_FACTOR = 0.1
+DEFAULT_COOLDOWN_SECONDS = 2.0  # used when a 429 carries no Retry-After
+MAX_COOLDOWN_SECONDS = 60.0
+CHARS_PER_TOKEN = 4  # pre-call token estimate; reconciled with usage_metadata afterwards
+
+RETRY_DELAY_PATTERN = re.compile(r"retry[_-]?delay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s", re.IGNORECASE)
+
+
+def load_quotas() -> dict[str, dict[str, int]]:
+    quotas = {model: dict(quota) for model, quota in DEFAULT_QUOTAS.items()}
+    for model, quota in json.loads(os.environ.get("RATE_LIMITS") or "{}").items():
+        quotas[model] = {**quotas.get(model, FALLBACK_QUOTA), **quota}
+    return quotas
+
+
+def jitter(seconds: float) -> float:
+    """Spreads a wait over [seconds, 1.5 * seconds] so callers do not wake up together."""
+    return seconds * (1 + random.random() / 2) if seconds > 0 else 0.0
+
+
+@dataclass
+class ModelBudget:
+    """Token buckets for one model. Callers hold RateLimiter's lock while touching it."""
+    rpm: int
+    tpm: int
+    rate_factor: float = 1.0
+    cooldown_until: float = 0.0
+    requests: float = field(default=-1.0)
+    tokens: float = field(default=-1.0)
+    updated: float = field(default_factory=time.monotonic)
+
+    def __post_init__(self):
+        if self.requests < 0:
+            self.requests = self.request_capacity
+        if self.tokens < 0:
+            self.tokens = self.token_capacity
+
+    @property
+    def request_capacity(self) -> float:
+        return max(1.0, self.rpm * self.rate_factor / 60 * BURST_SECONDS)
+
+    @property
+    def token_capacity(self) -> float:
+        return max(1.0, self.tpm * self.rate_factor / 60 * BURST_SECONDS)
+
+    def refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self.updated)
+        self.updated = now
+        self.requests = min(self.request_capacity, self.requests + elapsed * self.rpm * self.rate_factor / 60)
+        self.tokens = min(self.token_capacity, self.tokens + elapsed * self.tpm * self.rate_factor / 60)
+
+    def try_take(self, tokens: int, now: float) -> float:
+        """Takes one request and `tokens` from the buckets, or returns the seconds to wait."""
+        self.refill(now)
+        if now < self.cooldown_until:
+            return self.cooldown_until - now
+        # A request larger than the bucket may go through once the bucket is full (it runs into debt)
+        needed_tokens = min(tokens, self.token_capacity)
+        wait = max(
+            (1 - self.requests) * 60 / (self.rpm * self.rate_factor),
+            (needed_tokens - self.tokens) * 60 / (self.tpm * self.rate_factor),
+        )
+        if wait > 0:
+            return wait
+        self.requests -= 1
+        self.tokens -= tokens
+        return 0.0
+
+
+class QuotaStore(ABC):
+    """Interface for sharing quota usage and cooldowns across processes."""
+
+    @abstractmethod
+    def reserve(self, model: str, tokens: int, quota: dict[str, int]) -> float:
+        """Records one request in the shared window; returns seconds to wait (0 when admitted)."""
+
+    @abstractmethod
+    def adjust_tokens(self, model: str, delta: int) -> None:
+        """Corrects the window's token count once a call's actual usage is known."""
+
+    @abstractmethod
+    def cooldown(self, model: str, until: float) -> None:
+        """Pauses `model` for every process until the epoch time `until`."""
+
+
+class DynamoQuotaStore(QuotaStore):
+    """
+    Fixed one-minute windows stored as 'ratelimit#<model>#<minute>' items in the results table.
+    Counters are incremented atomically with ADD, so every Lambda instance sees the same usage.
+    A 429 anywhere writes 'cooldownUntil' on the 'ratelimit#<model>' item.
+    """
+    PREFIX = "ratelimit#"
+    COUNTER_NAMES = {"#r": "requests", "#t": "tokens"}
+
+    def __init__(self, table):
+        self.table = table
+
+    def _window(self, model: str, now: float) -> tuple[str, int]:
+        minute = int(now // 60)
+        return f"{self.PREFIX}{model}#{minute}", minute
+
+    def reserve(self, model: str, tokens: int, quota: dict[str, int]) -> float:
+        now = time.time()
+        cooldown = self.table.get_item(Key={"jobId": self.PREFIX + model}).get("Item") or {}
+        if float(cooldown.get("cooldownUntil", 0)) > now:
+            return float(cooldown["cooldownUntil"]) - now
+
+        key, minute = self._window(model, now)
+        usage = self.table.update_item(
+            Key={"jobId": key},
+            UpdateExpression="ADD #r :one, #t :t SET recordType = :rt, expiresAt = :exp",
+            ExpressionAttributeNames=self.COUNTER_NAMES,
+            ExpressionAttributeValues={":one": 1, ":t": tokens, ":rt": "ratelimit", ":exp": (minute + 2) * 60},
+            ReturnValues="UPDATED_NEW",
+        )["Attributes"]
+        if int(usage["requests"]) <= quota["rpm"] and int(usage["tokens"]) <= quota["tpm"]:
+            return 0.0
+        # Over the shared quota: give the reservation back and wait for the next window
+        self.table.update_item(
+            Key={"jobId": key},
+            UpdateExpression="ADD #r :minus_one, #t :minus_t",
+            ExpressionAttributeNames=self.COUNTER_NAMES,
+            ExpressionAttributeValues={":minus_one": -1, ":minus_t": -tokens},
+        )
+        return (minute + 1) * 60 - now
+
+    def adjust_tokens(self, model: str, delta: int) -> None:
+        if delta:
+            key, _ = self._window(model, time.time())
+            self.table.update_item(Key={"jobId": key}, UpdateExpression="ADD #t :d",
+                                   ExpressionAttributeNames={"#t": "tokens"}, ExpressionAttributeValues={":d": delta})
+
+    def cooldown(self, model: str, until: float) -> None:
+        self.table.update_item(
+            Key={"jobId": self.PREFIX + model},
+            UpdateExpression="SET cooldownUntil = :u, recordType = :rt",
+            ExpressionAttributeValues={":u": int(until) + 1, ":rt": "ratelimit"},
+        )
+
+
+class RateLimiter:
+    """Process-wide limiter keyed by model name; safe to share across event loops and threads."""
+
+    def __init__(self, quotas: Optional[dict[str, dict[str, int]]] = None, store: Optional[QuotaStore] = None,
+                 clock=time.monotonic):
+        self.quotas = quotas if quotas is not None else load_quotas()
+        self.store = store
+        self.clock = clock
+        self._budgets: dict[str, ModelBudget] = {}
+        self._lock = threading.Lock()
+
+    def quota(self, model: str) -> dict[str, int]:
+        return self.quotas.get(model, FALLBACK_QUOTA)
+
+    def _budget(self, model: str) -> ModelBudget:
+        budget = self._budgets.get(model)
+        if budget is None:
+            quota = self.quota(model)
+            budget = self._budgets[model] = ModelBudget(rpm=quota["rpm"], tpm=quota["tpm"], updated=self.clock())
+        return budget
+
+    def try_acquire(self, model: str, tokens: int) -> float:
+        """Non-blocking local admission: 0 when admitted, otherwise the seconds to wait."""
+        with self._lock:
+            return self._budget(model).try_take(tokens, self.clock())
+
+    async def acquire(self, model: str, tokens: int) -> None:
+        """Waits (with jitter) until `model` has room for one request of ~`tokens` tokens."""
+        while True:
+            wait = self.try_acquire(model, tokens)
+            if not wait and self.store:
+                wait = await asyncio.to_thread(self.store.reserve, model, tokens, self.quota(model))
+                if wait:
+                    self.refund(model, tokens)
+            if not wait:
+                return
+            logger.info(f"RATE LIMIT: {model} throttled for {wait:.2f}s")
+            await asyncio.sleep(jitter(wait))
+
+    def refund(self, model: str, tokens: int) -> None:
+        with self._lock:
+            budget = self._budget(model)
+            budget.requests = min(budget.request_capacity, budget.requests + 1)
+            budget.tokens = min(budget.token_capacity, budget.tokens + tokens)
+
+    def record_success(self, model: str, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Reconciles the token estimate with real usage and additively restores the rate."""
+        delta = (actual_tokens - estimated_tokens) if actual_tokens else 0
+        with self._lock:
+            budget = self._budget(model)
+            budget.tokens -= delta
+            budget.rate_factor = min(1.0, budget.rate_factor + INCREASE_STEP)
+        if delta and self.store:
+            self.store.adjust_tokens(model, delta)
+
+    def record_rate_limited(self, model: str, retry_after: Optional[float] = None) -> float:
+        """Halves the model's rate and opens a cooldown; returns the cooldown length in seconds."""
+        with self._lock:
+            budget = self._budget(model)
+            budget.rate_factor = max(MIN_RATE_FACTOR, budget.rate_factor * DECREASE_FACTOR)
+            cooldown = min(MAX_COOLDOWN_SECONDS, retry_after if retry_after else DEFAULT_COOLDOWN_SECONDS)
+            now = self.clock()
+            budget.cooldown_until = max(budget.cooldown_until, now + cooldown)
+            budget.refill(now)
+            budget.requests = min(budget.requests, budget.request_capacity)
+            budget.tokens = min(budget.tokens, budget.token_capacity)
+        logger.warning(f"RATE LIMIT: {model} hit 429; rate factor {budget.rate_factor:.2f}, cooldown {cooldown:.1f}s")
+        if self.store:
+            self.store.cooldown(model, time.time() + cooldown)
+        return cooldown
+
+
+# --- 429 Parsing ---
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    return getattr(error, "code", None) == 429 or "429" in str(error) or "RESOURCE_EXHAUSTED" in str(error)
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Reads Retry-After from the HTTP response, or the RetryInfo 'retryDelay' in the error body."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    match = RETRY_DELAY_PATTERN.search(str(getattr(error, "details", "")) + str(error))
+    return float(match.group(1)) if match else None
+
+
+# --- Process-wide Limiter and ADK Model Callbacks ---
+
+_limiter = RateLimiter()
+# (invocation_id, agent_name) -> (model, estimated tokens) of the LLM call in flight; an agent's calls are sequential
+_pending: dict[tuple[str, str], tuple[str, int]] = {}
+
+
+def get_rate_limiter() -> RateLimiter:
+    return _limiter
+
+
+def configure_shared_store(store: Optional[QuotaStore]) -> None:
+    """Shares quota usage across Lambda instances (see DynamoQuotaStore)."""
+    _limiter.store = store
+
+
+def estimate_tokens(llm_request) -> int:
+    chars = len(str(getattr(getattr(llm_request, "config", None), "system_instruction", "") or ""))
+    for content in getattr(llm_request, "contents", None) or []:
+        for part in getattr(content, "parts", None) or []:
+            chars += len(getattr(part, "text", None) or "") or len(str(part))
+    return max(1, chars // CHARS_PER_TOKEN)
+
+
+async def throttle_model_call(callback_context, llm_request):
+    """before_model_callback: waits for the model's request/token budget before every LLM call."""
+    if not RATE_LIMIT_ENABLED:
+        return None
+    model = llm_request.model or "default"
+    tokens = estimate_tokens(llm_request)
+    await _limiter.acquire(model, tokens)
+    _pending[(callback_context.invocation_id, callback_context.agent_name)] = (model, tokens)
+    return None
+
+
+async def record_model_usage(callback_context, llm_response):
+    """after_model_callback: reconciles the token estimate with usage_metadata."""
+    pending = _pending.pop((callback_context.invocation_id, callback_context.agent_name), None)
+    if pending:
+        usage = getattr(llm_response, "usage_metadata", None)
+        # The shared store write is blocking; keep the event loop free for the other pipelines
+        await asyncio.to_thread(_limiter.record_success, *pending, getattr(usage, "total_token_count", None))
+    return None
+
+
+async def record_model_error(callback_context, llm_request, error):
+    """on_model_error_callback: feeds 429s and Retry-After back into the limiter, then re-raises."""
+    _pending.pop((callback_context.invocation_id, callback_context.agent_name), None)
+    if RATE_LIMIT_ENABLED and is_rate_limit_error(error):
+        await asyncio.to_thread(_limiter.record_rate_limited, llm_request.model or "default",
+                                retry_after_seconds(error))
+    return None
@@ -0,0 +1,104 @@
+import functools
+import os
+import pathlib
+import posixpath
+import threading
+import time
+from dataclasses import dataclass
+
+# --- Agent-Visible Resource Snapshot ---
+# The list/read tools used to walk the filesystem (`glob('**/*')` from '.', including .git)
+# and fork `git ls-files` (git is not in the Lambda image) on every call. The files agents
+# may see (the knowledge base text files) are now read once into a read-only snapshot and
+# every list/read call is served from memory. Large source extracts (code_sources/) and
+# binary artefacts (the Arrow code store) stay out of it; agents reach those through the
+# code store tools.
+
+REPO_ROOT = pathlib.Path(__file__).parent.parent.parent.resolve()
+SNAPSHOT_DIRS = ("knowledge_base",)
+SNAPSHOT_SUFFIXES = frozenset({".md", ".txt", ".json", ".csv"})
+SNAPSHOT_EXCLUDED_DIRS = frozenset({"code_sources", "__pycache__"})
+SNAPSHOT_MAX_FILE_BYTES = int(os.environ.get("SNAPSHOT_MAX_FILE_BYTES", str(256 * 1024)))
+
+
+@dataclass(frozen=True)
+class ResourceSnapshot:
+    """Repo-relative POSIX path -> file content, for every agent-visible file."""
+    files: dict[str, str]
+
+    @staticmethod
+    def normalize(path: str) -> str:
+        path = posixpath.normpath(str(path).replace("\\", "/").strip() or ".").lstrip("/")
+        return "" if path == "." else path
+
+    def read(self, path: str) -> str:
+        key = self.normalize(path)
+        if key not in self.files:
+            raise FileNotFoundError(f"'{path}' is not an agent-visible resource")
+        return self.files[key]
+
+    def list(self, path: str = ".") -> list[str]:
+        prefix = self.normalize(path)
+        if prefix.startswith(".."):
+            raise ValueError("Access denied. Path is outside project boundaries.")
+        return [p for p in self.files if not prefix or p == prefix or p.startswith(prefix + "/")]
+
+
+def build_snapshot(root: pathlib.Path = REPO_ROOT, directories=SNAPSHOT_DIRS) -> ResourceSnapshot:
+    files = {}
+    for directory in directories:
+        for dirpath, dirnames, filenames in os.walk(root / directory):
+            dirnames[:] = sorted(d for d in dirnames if d not in SNAPSHOT_EXCLUDED_DIRS and not d.startswith("."))
+            for name in sorted(filenames):
+                path = pathlib.Path(dirpath) / name
+                if path.suffix in SNAPSHOT_SUFFIXES and path.stat().st_size <= SNAPSHOT_MAX_FILE_BYTES:
+                    files[path.relative_to(root).as_posix()] = path.read_text(encoding="utf-8")
+    return ResourceSnapshot(dict(sorted(files.items())))
+
+
+_snapshot: ResourceSnapshot | None = None
+_snapshot_lock = threading.Lock()
+
+
+def get_resource_snapshot() -> ResourceSnapshot:
+    """Builds the snapshot on first use (the worker does it at cold start) and reuses it."""
+    global _snapshot
+    if _snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = build_snapshot()
+    return _snapshot
+
+
+# --- Tool Timing Counters ---
+# Process-wide calls / errors / wall time per tool, read with tool_stats().
+
+_TOOL_STATS: dict[str, dict[str, float]] = {}
+_stats_lock = threading.Lock()
+
+
+def timed_tool(func):
+    """Counts calls, errors (results starting with 'Error') and wall time of a sync tool."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        failed = isinstance(result, str) and result.startswith("Error")
+        with _stats_lock:
+            stats = _TOOL_STATS.setdefault(func.__name__, {"calls": 0, "errors": 0, "total_ms": 0.0})
+            stats["calls"] += 1
+            stats["errors"] += failed
+            stats["total_ms"] += elapsed_ms
+        return result
+    return wrapper
+
+
+def tool_stats() -> dict[str, dict[str, float]]:
+    with _stats_lock:
+        return {name: {**stats, "total_ms": round(stats["total_ms"], 3)} for name, stats in _TOOL_STATS.items()}
+
+
+def reset_tool_stats() -> None:
+    with _stats_lock:
+        _TOOL_STATS.clear()
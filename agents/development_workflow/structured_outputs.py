@@ -0,0 +1,63 @@
+import os
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.genai import types
+
+from pipeline.encounter_schema import (
+    AuditResult,
+    EncounterRecord,
+    as_markdown,
+    final_status,
+    render_billing_draft,
+    render_clinical_spec,
+)
+
+# --- Structured Stage Outputs ---
+# With STRUCTURED_OUTPUTS on, ClinicalEntityExtractor and MedicalCoderAgent answer with the
+# ClinicalSpec / BillingDraft schemas (pipeline/encounter_schema.py), so state['tech_spec']
+# and state['billing_draft'] hold typed dicts. BillingFinalizer's before_agent_callback then
+# assembles the EncounterRecord from state and skips its model call. The helpers below give
+# the text-based checks (rule engine, cascade, convergence) one view of either format.
+# Markdown checkpoints written before the switch still go through the LLM finalizer.
+
+STRUCTURED_OUTPUTS = os.environ.get("STRUCTURED_OUTPUTS", "true").lower() == "true"
+
+
+def spec_text(state) -> str:
+    return as_markdown(state.get("tech_spec"), render_clinical_spec)
+
+
+def draft_text(state) -> str:
+    return as_markdown(state.get("billing_draft"), render_billing_draft)
+
+
+def build_encounter_record(state) -> dict:
+    score = state.get("confidence_score") or 0
+    spec = state.get("tech_spec")
+    record = EncounterRecord(
+        clinical_spec=spec if isinstance(spec, dict) else None,
+        billing_draft=state.get("billing_draft"),
+        audit=AuditResult(
+            review_status=state.get("review_status"),
+            confidence_score=score,
+            final_status=final_status(score),
+            review_feedback=state.get("review_feedback") or "",
+            code_findings=state.get("code_findings") or [],
+        ),
+    )
+    return record.model_dump(exclude_none=True)
+
+
+def assemble_final_record(callback_context: CallbackContext) -> Optional[types.Content]:
+    """before_agent_callback for BillingFinalizer: builds the final record without a model call."""
+    state = callback_context.state
+    if not STRUCTURED_OUTPUTS or not isinstance(state.get("billing_draft"), dict):
+        return None
+    record = build_encounter_record(state)
+    state["final_billing_report"] = record
+    audit = record["audit"]
+    return types.Content(role="model", parts=[types.Part.from_text(
+        text=f"[STRUCTURED] Final encounter record assembled: {audit['final_status']} "
+             f"({audit['confidence_score']}%)."
+    )])
@@ -1,4 +1,6 @@
 from google.adk.agents import LlmAgent
+from ...structured_outputs import assemble_final_record
+from ...rate_limiter import record_model_error, record_model_usage, throttle_model_call
 
 billing_finalizer_agent = LlmAgent(
     name="BillingFinalizer",
@@ -30,5 +32,12 @@ billing_finalizer_agent = LlmAgent(
         """
     ),
     tools=[], 
-    output_key="final_billing_report"
+    output_key="final_billing_report",
+    # Typed spec and draft are assembled into the final record in Python; this LLM call
+    # only runs for markdown outputs (STRUCTURED_OUTPUTS off, or a pre-switch checkpoint)
+    before_agent_callback=assemble_final_record,
+    # Every Gemini call waits on the shared per-model rate limiter
+    before_model_callback=throttle_model_call,
+    after_model_callback=record_model_usage,
+    on_model_error_callback=record_model_error,
 )
\ No newline at end of file
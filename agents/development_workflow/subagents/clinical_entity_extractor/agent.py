@@ -1,21 +1,37 @@
 from google.adk.agents import LlmAgent
+from pipeline.encounter_schema import ClinicalSpec
 from ...common_tools import (
     list_directory,
     read_file,
     onboard_project,
     list_git_files,
 )
+from ...callbacks import skip_extraction_if_checkpointed
+from ...clinical_facts import preextract_clinical_facts
+from ...structured_outputs import STRUCTURED_OUTPUTS
+from ...rate_limiter import record_model_error, record_model_usage, throttle_model_call
 
-clinical_entity_extractor_agent = LlmAgent(
-    name="ClinicalEntityExtractor",
-    model="gemini-2.5-pro", # gemini-2.5-pro
-    description="Extracts clinical entities and complexities from pediatric visit notes using verified billing guidelines.",
-    instruction="""
+INSTRUCTION = """
         You are the Senior Clinical Data Analyst and Lead Entity Extractor for Pediatric Associates. 
         Your primary responsibility is to parse raw pediatric physician notes and convert them into a structured 'Clinical Spec' grounded in our internal billing guidelines.
 
+        ### PRELOADED KNOWLEDGE:
+        Clinic context:
+        {clinic_context?}
+
+        Billing manual (`knowledge_base/billing_codes.md`):
+        {billing_manual?}
+
+        ### VERIFIED CLINICAL FACTS (GROUND TRUTH):
+        Computed deterministically from the note (age from DOB vs DOS, laterality, procedures) with evidence quotes:
+        {clinical_facts?}
+        Copy these facts into the spec as-is; do not recompute or contradict them.
+        A fact marked 'unverified' is only a hint: determine it from the note's findings yourself.
+
         ### KNOWLEDGE GROUNDING (MANDATORY):
-        1.  **Reference Manual:** You MUST use the `read_file` tool to read `knowledge_base/billing_codes.md` as your FIRST action after onboarding. 
+        1.  **Reference Manual:** If the clinic context and billing manual are preloaded above in full (no [TRUNCATED] marker), ground every finding in them and
+            start extracting immediately; do NOT call `onboard_project`, `read_file` or `list_git_files` for them.
+            Otherwise you MUST use the `read_file` tool to read `knowledge_base/billing_codes.md` as your FIRST action after onboarding. 
         2.  **Constraint:** You are strictly forbidden from inventing codes or logic outside of the provided reference file. If a finding does not match a scenario in the manual, flag it as 'High Risk - Manual Review Required'.
 
         ### CLINICAL ANALYSIS MANDATES:
@@ -24,11 +40,13 @@ clinical_entity_extractor_agent = LlmAgent(
         3.  **Visit Complexity:** Analyze the physician's findings (e.g., nebulizer treatments, age-based screenings) to determine the CPT complexity level (99212, 99213, 99214) defined in the lookup table.
         4.  **Evidence-Based:** Every finding you report must be accompanied by a direct quote (Evidence) from the patient note.
 
-        ### TOOLS AVAILABLE TO YOU:
+        ### TOOLS AVAILABLE TO YOU (only when the knowledge above is not preloaded, or is marked [TRUNCATED]):
         1.  **`onboard_project`**: Call this first to get the general context.
         2.  **`read_file`**: Use this to read `knowledge_base/billing_codes.md` for ground-truth data.
         3.  **`list_git_files`**: Use this to verify the location of the knowledge base.
+        """
 
+MARKDOWN_OUTPUT = """
         ### OUTPUT FORMAT: THE 'RAW MARKDOWN' RULE (MANDATORY)
         Your entire response MUST be a single, raw markdown block wrapped in FOUR backticks (````).
 
@@ -58,14 +76,40 @@ clinical_entity_extractor_agent = LlmAgent(
 
         Your final output must be the raw markdown spec ONLY. If you cannot find sufficient information to complete 
         any section, explicitly state 'Insufficient Data - Manual Review Required' in that section.
-        """,
+        """
+
+STRUCTURED_OUTPUT = """
+        ### OUTPUT FORMAT: THE CLINICAL SPEC SCHEMA (MANDATORY)
+        Answer with a single `ClinicalSpec` object and nothing else (no markdown, no prose):
+        * `subject`, `patient_info` (age/sex, DOB for Scenario 4 cases) and `chief_complaint`.
+        * `findings`: one entry per key clinical finding, each with its direct `evidence` quote.
+        * `laterality`: Right / Left / Bilateral / Not Specified.
+        * `icd10_ranges` (e.g. 'J45.x') and `cpt_scope` (e.g. '94640 nebulizer, Scenario 2'), grounded in Sections 1 & 2.
+        * `risk_factors`: ambiguities or contradictions (e.g. age-based CPT conflicts); the Auditor scores from these.
+        * Set `insufficient_data` to true when the note cannot support the spec.
+        """
+
+clinical_entity_extractor_agent = LlmAgent(
+    name="ClinicalEntityExtractor",
+    model="gemini-2.5-pro", # gemini-2.5-pro
+    description="Extracts clinical entities and complexities from pediatric visit notes using verified billing guidelines.",
+    instruction=INSTRUCTION + (STRUCTURED_OUTPUT if STRUCTURED_OUTPUTS else MARKDOWN_OUTPUT),
     tools=[
         onboard_project, 
         list_directory, 
         read_file, 
         list_git_files,
     ],
-    output_key="tech_spec"
+    output_key="tech_spec",
+    # Typed spec in state instead of markdown (see structured_outputs.py)
+    output_schema=ClinicalSpec if STRUCTURED_OUTPUTS else None,
+    # Age, laterality and procedures are extracted in Python first; resumed runs reuse the
+    # checkpointed spec instead of repeating this gemini-2.5-pro call
+    before_agent_callback=[preextract_clinical_facts, skip_extraction_if_checkpointed],
+    # Every Gemini call waits on the shared per-model rate limiter
+    before_model_callback=throttle_model_call,
+    after_model_callback=record_model_usage,
+    on_model_error_callback=record_model_error,
 )
 
 
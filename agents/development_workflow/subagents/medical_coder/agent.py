@@ -1,35 +1,62 @@
 from google.adk.agents import LlmAgent
+from pipeline.encounter_schema import BillingDraft
 from ...common_tools import (
     onboard_project,
     read_file,
-    search_knowledge_base
+    search_knowledge_base,
+    lookup_code,
+    search_codes,
 )
+from ...callbacks import record_draft_iteration, start_coding_iteration
+from ...model_cascade import escalate_after_rejected_draft, escalate_on_malformed_draft, select_cascade_model
+from ...structured_outputs import STRUCTURED_OUTPUTS
+from ...rate_limiter import record_model_error, record_model_usage, throttle_model_call
 
-medical_coder_agent = LlmAgent(
-    name="MedicalCoderAgent",
-    model="gemini-2.5-pro", # Updated for higher cost efficiency and speed
-    description="Maps clinical findings to validated ICD-10 and CPT codes using targeted search queries.",
-    instruction=("""
+INSTRUCTION = """
         You are the Senior Medical Coding Specialist for Pediatric Associates. 
         Your task is to generate a 'Billing Draft' based on the report in state['tech_spec'].
 
         ### YOUR SOURCE OF TRUTH (STRICT):
-        1. **`knowledge_base/billing_codes.md`**: Access this ONLY via the search tool.
+        1. **`knowledge_base/billing_codes.md`**: Use the preloaded copy below; when it is empty, or for anything after a [TRUNCATED] marker, access the manual ONLY via the search tool.
         2. **Consistency:** Ensure the codes selected match the laterality and age-logic defined in the manual.
 
+        ### VERIFIED CLINICAL FACTS (GROUND TRUTH):
+        {clinical_facts?}
+        Use this age, preventive age band, laterality and procedure list as-is; where the spec disagrees, these facts win.
+        A fact marked 'unverified' is only a hint: confirm it from the spec and the note.
+
+        ### PRELOADED BILLING MANUAL:
+        {billing_manual?}
+
         ### OPERATIONAL PHASES:
 
         **PHASE 1: TARGETED SEARCH**
-        - Do not read the entire manual. Use `search_knowledge_base(query='...')` for specific clinical facts:
+        - If the manual is preloaded above, take scenarios, age rules and bundling rules from it and skip `search_knowledge_base`.
+          If it ends with a [TRUNCATED] marker, search for anything the partial copy does not show.
+        - Otherwise, do not read the entire manual. Use `search_knowledge_base(query='...')` for specific clinical facts:
             - Search for the diagnosis (e.g., 'Asthma', 'Ear Infection').
             - Search for age-related rules (e.g., 'Scenario 4', '5-year-old').
             - Search for procedures mentioned (e.g., 'Nebulizer', 'Strep Test').
 
         **PHASE 2: MAPPING & BUNDLING**
         - **ICD-10 Mapping:** Use search results to find the exact ICD-10 code. Confirm laterality (Right/Left) matches the spec.
+        - **Code Verification:** Use `lookup_code(code='...')` to confirm every selected code exists in the full ICD-10-CM / CPT code store.
+          Use `search_codes(query='...')` with description keywords or a prefix (e.g., 'H66.00*') when the manual does not list the exact code.
         - **CPT Bundling:** - Apply Scenario logic based on the manual's bundling rules.
             - Correct any errors if `state['review_feedback']` contains instructions from the Auditor.
 
+        **TARGETED REVISION (when the Auditor flagged codes)**
+        Codes flagged in the last audit:
+        {revision_request?}
+        Your previous draft:
+        {billing_draft?}
+        - If codes are flagged above, start from your previous draft and change ONLY the flagged codes.
+          Keep every other line as-is and do not search or look up codes that were not flagged.
+        - Never resubmit an unchanged draft: an identical draft ends the refinement loop.
+
+        """
+
+MARKDOWN_OUTPUT = """
         **PHASE 3: REPORTING**
         - Format your response as a structured Billing Draft.
         - Your output must be a single, raw markdown block wrapped in FOUR backticks (````).
@@ -46,11 +73,36 @@ medical_coder_agent = LlmAgent(
 
         Store this draft in `state['billing_draft']`.
         """
-    ),
+
+STRUCTURED_OUTPUT = """
+        **PHASE 3: REPORTING**
+        - Answer with a single `BillingDraft` object and nothing else (no markdown, no prose):
+            - `primary_icd10` and any `secondary_icd10`: `code` plus `description`.
+            - `cpts`: every supporting CPT (visit level and procedures), each with its `description`.
+            - `integrity_check`: one line confirming the age-logic and clinical alignment.
+        - If there isn't enough information to code accurately, set `insufficient_data` to true and omit the codes.
+        """
+
+medical_coder_agent = LlmAgent(
+    name="MedicalCoderAgent",
+    model="gemini-2.5-pro", # Updated for higher cost efficiency and speed
+    description="Maps clinical findings to validated ICD-10 and CPT codes using targeted search queries.",
+    instruction=INSTRUCTION + (STRUCTURED_OUTPUT if STRUCTURED_OUTPUTS else MARKDOWN_OUTPUT),
     tools=[
         onboard_project,
         read_file,
         search_knowledge_base,
+        lookup_code,
+        search_codes,
     ],
-    output_key="billing_draft"
+    output_key="billing_draft",
+    # Typed draft in state instead of markdown (see structured_outputs.py)
+    output_schema=BillingDraft if STRUCTURED_OUTPUTS else None,
+    # Rejected or malformed fast-tier drafts escalate the rest of the job to the strong tier
+    before_agent_callback=[escalate_after_rejected_draft, start_coding_iteration],
+    after_agent_callback=[record_draft_iteration, escalate_on_malformed_draft],
+    # Every Gemini call goes to the job's cascade tier and waits on the shared per-model rate limiter
+    before_model_callback=[select_cascade_model, throttle_model_call],
+    after_model_callback=record_model_usage,
+    on_model_error_callback=record_model_error,
 )
\ No newline at end of file
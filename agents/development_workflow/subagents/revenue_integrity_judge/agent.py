@@ -2,9 +2,15 @@ from google.adk.agents import LlmAgent
 from ...common_tools import (
     read_file,
     onboard_project,
-    search_knowledge_base 
+    search_knowledge_base,
+    lookup_code,
+    search_codes,
 )
 from .tools import set_review_status_and_exit_if_approved
+from .rule_engine import prescore_billing_draft
+from ...callbacks import skip_review_if_checkpointed
+from ...model_cascade import escalate_on_missing_review, select_cascade_model
+from ...rate_limiter import record_model_error, record_model_usage, throttle_model_call
 
 revenue_integrity_judge_agent = LlmAgent(
     name="RevenueIntegrityJudge",
@@ -14,16 +20,31 @@ revenue_integrity_judge_agent = LlmAgent(
         You are the Senior Revenue Integrity Auditor. Your mission is to protect the clinic from claim denials by ensuring a 90%+ accuracy rate.
 
         ### YOUR AUDIT MATERIALS:
-        1. **The Source of Truth:** `knowledge_base/billing_codes.md` (Access via `search_knowledge_base`).
+        1. **The Source of Truth:** `knowledge_base/billing_codes.md` (Preloaded below; access via `search_knowledge_base` only when it is empty).
         2. **Clinical Evidence:** `state['tech_spec']` (The findings extracted from the note).
         3. **The Proposed Bill:** `state['billing_draft']` (The codes selected by the Coder).
+        4. **Verified Clinical Facts (ground truth, computed from the note; facts marked 'unverified' are hints only):**
+        {clinical_facts?}
+
+        ### PRELOADED BILLING MANUAL:
+        {billing_manual?}
 
         ### AUDIT PROTOCOL (STEP-BY-STEP):
-        1. **Verification via Search:** Use `search_knowledge_base(query='...')` to verify the codes in the draft. 
+        1. **Verification via Search:** Verify the codes in the draft against the preloaded manual, or with `search_knowledge_base(query='...')` when it is not preloaded or is marked [TRUNCATED]. 
            - Don't just trust the Coder; check the manual for age limits and laterality rules.
+           - Use `lookup_code(code='...')` to confirm every drafted code exists in the full ICD-10-CM / CPT code store.
+             Use `search_codes(query='...')` to find the correctly lateralized sibling (e.g., 'H66.00*').
         2. **Scenario Validation:** Confirm if the correct 'Bundling Scenario' (1-6) was applied based on the clinical evidence.
-           - *Critical:* If the patient is 5 years old, verify Scenario 4 logic (99393 vs 99392).
+           - *Critical:* If the patient is 5 years old, verify Scenario 4 logic (99393 vs 99392) against the verified age band.
         3. **Evidence Check:** Ensure every code in the draft has a direct justification in the `tech_spec`.
+        4. **Targeted Re-Audit:** Codes you flagged in the previous iteration:
+           {revision_request?}
+           If codes are listed here, re-verify those codes; unflagged codes that are unchanged need no new search.
+
+        ### DETERMINISTIC PRE-SCORE:
+        A rule engine already applied the penalty rubric below and could not reach a decision on its own:
+        {rule_engine_report?}
+        Focus your audit on the open question it reports.
 
         ### CONFIDENCE SCORE CALCULATION:
         Start at 100 points and apply penalty points for the following:
@@ -41,12 +62,23 @@ revenue_integrity_judge_agent = LlmAgent(
             - `review_status='NEEDS REVISION'`
             - `confidence_score=score`
             - `review_feedback='<enter detailed feedback here for each penalty applied>'`
+            - `code_findings`: one entry per flagged code with `code`, `rule` (laterality / bundle / age-logic / evidence), `issue` (what to fix) and `penalty` (points)
     """
     ),
     tools=[
         onboard_project,
         read_file,
         search_knowledge_base,
+        lookup_code,
+        search_codes,
         set_review_status_and_exit_if_approved,
-    ]
+    ],
+    # Skips this LLM call when the review is checkpointed or the rule engine can decide it deterministically.
+    before_agent_callback=[skip_review_if_checkpointed, prescore_billing_draft],
+    # A fast-tier judge that ends without recording a review escalates the job
+    after_agent_callback=escalate_on_missing_review,
+    # Every Gemini call goes to the job's cascade tier and waits on the shared per-model rate limiter
+    before_model_callback=[select_cascade_model, throttle_model_call],
+    after_model_callback=record_model_usage,
+    on_model_error_callback=record_model_error,
 )
\ No newline at end of file
@@ -0,0 +1,258 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.tools import ToolContext
+from google.genai import types
+
+from ...clinical_facts import (PREVENTIVE_AGE_BANDS, affirmed_clauses, find_age, find_laterality, find_procedures,
+                               spec_laterality)
+from ...common_tools import REPO_ROOT
+from ...knowledge_index import get_knowledge_index, tokenize
+from ...structured_outputs import draft_text, spec_text
+from .tools import CodeFinding, set_review_status_and_exit_if_approved
+
+# --- Deterministic Pre-Scoring Rule Engine ---
+# Applies the judge's mechanical penalty rubric and the manual's Scenario 1-6 rules in Python.
+# When the outcome is unambiguous the engine records the review itself and the LLM judge is
+# skipped; otherwise it leaves its findings in state['rule_engine_report'] for the judge.
+
+RULE_ENGINE_ENABLED = os.environ.get("RULE_ENGINE_ENABLED", "true").lower() == "true"
+MANUAL_PATH = REPO_ROOT / "knowledge_base" / "billing_codes.md"
+
+# Penalty rubric (mirrors the RevenueIntegrityJudge instruction)
+LATERALITY_PENALTY = 20
+BUNDLE_PENALTY = 30
+AGE_LOGIC_PENALTY = 15
+APPROVAL_THRESHOLD = 90
+# Clinical Indicators another scenario must show (beyond its title or procedure) to count as documented
+COMORBIDITY_MIN_INDICATORS = 2
+
+ICD10_PATTERN = re.compile(r"\b[A-Z]\d{2}\.[0-9A-Z]{1,4}\b")
+CPT_PATTERN = re.compile(r"\b\d{5}\b")
+
+
+@dataclass(frozen=True)
+class ScenarioRule:
+    """Machine-checkable form of one Clinical Decision Scenario."""
+    number: int
+    icd10: tuple[str, ...]
+    visit_cpt: Optional[str] = None
+    conditional_cpts: tuple[tuple[str, str], ...] = ()  # (cpt, clinical fact that requires it)
+    laterality_codes: tuple[tuple[str, str], ...] = ()  # (icd10, required laterality)
+    age_cpts: tuple[tuple[int, int, str], ...] = ()  # (min_age, max_age, cpt)
+
+
+SCENARIO_RULES = (
+    ScenarioRule(1, ("H66.001", "H66.002", "H66.003"), visit_cpt="99213",
+                 laterality_codes=(("H66.001", "right"), ("H66.002", "left"), ("H66.003", "bilateral"))),
+    ScenarioRule(2, ("J45.51",), visit_cpt="99214", conditional_cpts=(("94640", "nebulizer"),)),
+    ScenarioRule(3, ("J02.0",), visit_cpt="99213", conditional_cpts=(("87880", "strep_test"),)),
+    ScenarioRule(4, ("Z00.129",), age_cpts=PREVENTIVE_AGE_BANDS),
+    ScenarioRule(5, ("B30.9", "H10.33"), visit_cpt="99212", laterality_codes=(("H10.33", "bilateral"),)),
+    ScenarioRule(6, ("J21.0",), visit_cpt="99214"),
+)
+RULES_BY_ICD10 = {code: rule for rule in SCENARIO_RULES for code in rule.icd10}
+
+
+@dataclass
+class Finding:
+    code: str
+    rule: str
+    penalty: int
+    message: str
+
+
+@dataclass
+class RuleEngineResult:
+    decided: bool
+    score: int = 100
+    findings: list[Finding] = field(default_factory=list)
+    reason: str = ""
+
+    @property
+    def status(self) -> str:
+        return "APPROVED" if self.score >= APPROVAL_THRESHOLD else "NEEDS_REVISION"
+
+    def feedback(self) -> str:
+        if not self.findings:
+            return "All codes verified with strong evidence."
+        return " ".join(f"-{f.penalty}pt ({f.rule}, {f.code}): {f.message}" for f in self.findings)
+
+    def summary(self) -> str:
+        if not self.decided:
+            return f"Rule engine could not decide: {self.reason}"
+        return f"Rule engine pre-score {self.score}% ({self.status}). {self.feedback()}"
+
+
+# --- Clinical facts from the note and tech spec ---
+
+def patient_age(text: str) -> Optional[int]:
+    """Age in whole years: DOB vs DOS when both are present, otherwise a stated age."""
+    return find_age(text)[0]
+
+
+def laterality(note: str, tech_spec: str = "") -> Optional[str]:
+    """'right', 'left' or 'bilateral' (sides with findings) from the note, else the spec's Laterality Profile."""
+    return find_laterality(note)[0] or spec_laterality(tech_spec)
+
+
+def procedures(note: str) -> set[str]:
+    """Procedures documented as performed this visit."""
+    return set(find_procedures(note)[0])
+
+
+def unconfirmed_procedures(note: str) -> set[str]:
+    """Procedures mentioned without being documented as performed ("home nebulizer")."""
+    return set(find_procedures(note)[2])
+
+
+def scenario_phrases(rule: ScenarioRule) -> tuple[list[frozenset], list[frozenset]]:
+    """Token sets of the scenario's title phrases and of its Clinical Indicators."""
+    scenario = get_knowledge_index(MANUAL_PATH).scenario(rule.number)
+    if scenario is None:
+        return [], []
+    indicators = re.search(r"Clinical Indicators:\**\s*(.+)", scenario.text)
+    titles = [frozenset(tokenize(p)) for p in re.split(r"[(),]", scenario.title)]
+    signs = [frozenset(tokenize(p)) for p in re.split(r"[,/.]", indicators.group(1))] if indicators else []
+    return [t for t in titles if t], [t for t in signs if t]
+
+
+def has_clinical_evidence(rule: ScenarioRule, note: str) -> bool:
+    """True if any Clinical Indicator (or the title) of the scenario appears in the note."""
+    titles, signs = scenario_phrases(rule)
+    note_tokens = set(tokenize(note))
+    return any(tokens <= note_tokens for tokens in titles + signs)
+
+
+def uncovered_scenarios(rule: ScenarioRule, note: str) -> list[int]:
+    """
+    Other scenarios the note also documents (a comorbidity the draft leaves out): by title,
+    by a performed procedure the scenario bills, or by several indicators not shared with `rule`.
+    Normal and negated clauses ("No wheezing") are ignored.
+    """
+    note_tokens = set(tokenize(affirmed_clauses(note)))
+    performed = procedures(note)
+    own = set(sum(scenario_phrases(rule), []))
+    found = []
+    for other in SCENARIO_RULES:
+        if other is rule:
+            continue
+        titles, signs = scenario_phrases(other)
+        distinct = sum(tokens <= note_tokens for tokens in signs if tokens not in own)
+        if any(tokens <= note_tokens for tokens in titles) or distinct >= COMORBIDITY_MIN_INDICATORS \
+                or any(fact in performed for _, fact in other.conditional_cpts):
+            found.append(other.number)
+    return found
+
+
+# --- Billing draft parsing ---
+
+def draft_codes(billing_draft: str) -> tuple[list[str], list[str]]:
+    """Returns (ICD-10 codes, CPT codes) in the order the draft lists them."""
+    icd10 = list(dict.fromkeys(ICD10_PATTERN.findall(billing_draft)))
+    cpt_line = re.search(r"Supporting CPTs?:\**(.*)", billing_draft, re.IGNORECASE)
+    cpts = list(dict.fromkeys(CPT_PATTERN.findall(cpt_line.group(1) if cpt_line else billing_draft)))
+    return icd10, cpts
+
+
+def evaluate(note: str, tech_spec: str, billing_draft: str) -> RuleEngineResult:
+    """Scores a billing draft with the judge's rubric, or explains why it cannot."""
+    if not billing_draft or "insufficient data" in billing_draft.lower():
+        return RuleEngineResult(decided=False, reason="draft reports insufficient data")
+
+    icd10, cpts = draft_codes(billing_draft)
+    rules = {RULES_BY_ICD10.get(code) for code in icd10}
+    if not icd10 or None in rules or len(rules) != 1:
+        return RuleEngineResult(decided=False, reason="draft does not map to exactly one manual scenario")
+    (rule,) = rules
+    if not has_clinical_evidence(rule, note):
+        return RuleEngineResult(decided=False, reason=f"no Scenario {rule.number} indicators found in the note")
+    uncovered = uncovered_scenarios(rule, note)
+    if uncovered:
+        return RuleEngineResult(decided=False, reason=f"note also documents Scenario "
+                                                      f"{', '.join(map(str, uncovered))}, which the draft does not code")
+
+    result = RuleEngineResult(decided=True)
+    facts = procedures(note)
+    unconfirmed = {fact for _, fact in rule.conditional_cpts} & unconfirmed_procedures(note)
+    if unconfirmed:
+        return RuleEngineResult(decided=False, reason=f"{', '.join(sorted(unconfirmed))} mentioned but not "
+                                                      "documented as performed this visit")
+
+    if rule.laterality_codes:
+        if find_laterality(note)[2]:
+            return RuleEngineResult(decided=False, reason="both sides are mentioned but only one has findings")
+        side = laterality(note, tech_spec)
+        required = dict(rule.laterality_codes)
+        for code in icd10:
+            if code not in required:
+                continue
+            if side is None:
+                return RuleEngineResult(decided=False, reason="laterality not stated in the note")
+            if required[code] != side:
+                expected = next((c for c, s in rule.laterality_codes if s == side), None)
+                hint = f"use {expected}" if expected else "use the unspecified code"
+                result.findings.append(Finding(code, "laterality", LATERALITY_PENALTY,
+                                               f"note documents {side} laterality; {hint}."))
+
+    expected_cpts = {rule.visit_cpt} if rule.visit_cpt else set()
+    expected_cpts |= {cpt for cpt, fact in rule.conditional_cpts if fact in facts}
+    age_codes = {cpt for _, _, cpt in rule.age_cpts}
+    if rule.age_cpts:
+        age = patient_age(note)
+        if age is None:
+            age = patient_age(tech_spec)
+        if age is None:
+            return RuleEngineResult(decided=False, reason="patient age cannot be determined from DOB/DOS")
+        age_cpt = next((cpt for low, high, cpt in rule.age_cpts if low <= age <= high), None)
+        if age_cpt is None:
+            return RuleEngineResult(decided=False, reason=f"age {age} is outside the Scenario {rule.number} table")
+        if age_cpt not in cpts:
+            result.findings.append(Finding(age_cpt, "age-logic", AGE_LOGIC_PENALTY,
+                                           f"patient is {age} years old; Scenario {rule.number} requires {age_cpt}."))
+
+    actual_cpts = set(cpts) - age_codes
+    missing, extra = sorted(expected_cpts - actual_cpts), sorted(actual_cpts - expected_cpts)
+    if missing or extra:
+        parts = [f"missing {', '.join(missing)}" if missing else "", f"unsupported {', '.join(extra)}" if extra else ""]
+        result.findings.append(Finding(", ".join(missing + extra), "bundle", BUNDLE_PENALTY,
+                                       f"Scenario {rule.number} bundle is {', '.join(sorted(expected_cpts))}; "
+                                       f"{'; '.join(p for p in parts if p)}."))
+
+    result.score = max(0, 100 - sum(f.penalty for f in result.findings))
+    return result
+
+
+# --- Judge integration ---
+
+def prescore_billing_draft(callback_context: CallbackContext) -> Optional[types.Content]:
+    """
+    before_agent_callback for RevenueIntegrityJudge. Records the review directly and skips
+    the LLM judge when the rule engine can decide; otherwise lets the judge run.
+    """
+    if not RULE_ENGINE_ENABLED:
+        return None
+
+    user_content = callback_context.user_content
+    note = "".join(p.text or "" for p in (user_content.parts or [])) if user_content else ""
+    state = callback_context.state
+    result = evaluate(note, spec_text(state), draft_text(state))
+    state["rule_engine_report"] = result.summary()
+    if not result.decided:
+        return None
+
+    tool_context = ToolContext(callback_context._invocation_context, event_actions=callback_context._event_actions)
+    response = set_review_status_and_exit_if_approved(
+        status=result.status,
+        confidence_score=result.score,
+        review_feedback=result.feedback(),
+        tool_context=tool_context,
+        code_findings=[CodeFinding(code=f.code, rule=f.rule, issue=f.message, penalty=f.penalty)
+                       for f in result.findings],
+    )
+    return types.Content(role="model", parts=[types.Part.from_text(
+        text=f"[RULE-ENGINE AUDIT] {response['message']} {result.feedback()}"
+    )])
@@ -1,25 +1,66 @@
 from google.adk.tools import ToolContext
-from typing import Dict, Literal
+from typing import Dict, Literal, Optional
+
+from pipeline.encounter_schema import CodeFinding
+
+
+def render_code_findings(findings: list[dict]) -> str:
+    """The coder's revision request: only these codes are to be changed."""
+    return "\n".join(
+        f"- {f['code']} ({f['rule']}, -{f['penalty']}pt): {f['issue']}" for f in findings
+    )
+
+
+def record_review(state, confidence_score: int, draft: str) -> None:
+    """Tracks the score per iteration and the best-scored draft, for convergence checks."""
+    iteration = state.get('loop_iteration', 0)
+    scores = dict(state.get('iteration_scores') or {})
+    scores[str(iteration)] = confidence_score
+    state['iteration_scores'] = scores
+    best = state.get('best_review') or {}
+    if not best or confidence_score > best.get('score', -1):
+        state['best_review'] = {
+            'iteration': iteration,
+            'score': confidence_score,
+            'billing_draft': draft,
+            'review_status': state.get('review_status'),
+            'review_feedback': state.get('review_feedback'),
+            'code_findings': state.get('code_findings') or [],
+        }
+
 
 def set_review_status_and_exit_if_approved(
     status: Literal["APPROVED", "NEEDS_REVISION"],
     confidence_score: int,
     review_feedback: str,
-    tool_context: ToolContext
+    tool_context: ToolContext,
+    code_findings: Optional[list[CodeFinding]] = None,
 ) -> Dict[str, str]:
     """
-    Sets the audit status and confidence score. 
+    Sets the audit status and confidence score.
     If score is 90% or higher and status is APPROVED, it exits the loop.
+    For NEEDS_REVISION, list every flagged code in `code_findings` (code, rule, issue, penalty);
+    the coder then revises only those codes and keeps the rest of the draft.
     """
     if not status:
         return {"status": "error", "message": "Status cannot be empty."}
 
+    # Function-call arguments arrive as plain dicts
+    findings = [
+        (f if isinstance(f, CodeFinding) else CodeFinding.model_validate(f)).model_dump()
+        for f in code_findings or []
+    ]
+
     tool_context.state['review_status'] = status
     tool_context.state['confidence_score'] = confidence_score
     tool_context.state['review_feedback'] = f"Score: {confidence_score}% | Feedback: {review_feedback}"
-    
+    tool_context.state['reviewed_iteration'] = tool_context.state.get('loop_iteration', 0)
+    tool_context.state['code_findings'] = findings
+    tool_context.state['revision_request'] = render_code_findings(findings)
+    record_review(tool_context.state, confidence_score, tool_context.state.get('billing_draft', ''))
+
     if status == "APPROVED" and confidence_score >= 90:
-        tool_context.actions.escalate = True 
+        tool_context.actions.escalate = True
         return {
             "status": "success",
             "message": f"Encounter APPROVED with {confidence_score}% confidence. Finalizing bill."
@@ -28,4 +69,4 @@ def set_review_status_and_exit_if_approved(
         return {
             "status": "success",
             "message": f"Revision Required (Score: {confidence_score}%). Feedback sent to Coder Agent."
-        }
\ No newline at end of file
+        }
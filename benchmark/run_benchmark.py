@@ -0,0 +1,207 @@
+"""
+Offline pipeline benchmark.
+
+Replays every scenario in test/scenarios through the full POST -> worker -> GET flow under
+moto, with each LlmAgent's model swapped for the scripted stub in benchmark/stub_llm.py.
+For each concurrency level it reports throughput, p50/p95/p99 job latency, mean per-stage
+time and tokens, loop iterations and the memory high-water mark, plus per-tool call
+counters, as JSON, so runs can be diffed between releases.
+
+Usage:
+    python -m benchmark.run_benchmark --concurrency 1,4,8 --jobs 16 --model-latency-ms 50
+    python -m benchmark.run_benchmark --output bench.json --trace-memory
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import math
+import os
+import pathlib
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+from unittest import mock
+
+REPO_ROOT = pathlib.Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(REPO_ROOT))
+
+# Fake AWS credentials for moto, set before handler creates its boto3 clients
+for key, value in {"RESULTS_TABLE": "PediatricRcmResults", "AWS_DEFAULT_REGION": "us-east-1",
+                   "AWS_ACCESS_KEY_ID": "testing", "AWS_SECRET_ACCESS_KEY": "testing"}.items():
+    os.environ.setdefault(key, value)
+
+import boto3
+from moto import mock_aws
+
+import handler
+from agents.development_workflow import rate_limiter
+from agents.development_workflow.agent import root_agent
+from agents.development_workflow.resource_snapshot import reset_tool_stats, tool_stats
+from benchmark.stub_llm import load_script, stub_models
+
+SCENARIOS_DIR = REPO_ROOT / "test" / "scenarios"
+CONTEXT = SimpleNamespace(aws_request_id="benchmark", function_name="PediatricRcmFunction")
+
+
+def load_scenarios(directory=SCENARIOS_DIR) -> list[tuple[str, str]]:
+    """Returns (scenario name, note) for every scenario file; accepts full events or raw payloads."""
+    scenarios = []
+    for path in sorted(pathlib.Path(directory).glob("*.json")):
+        content = json.loads(path.read_text())
+        body = json.loads(content["body"]) if "body" in content else content
+        scenarios.append((path.stem, body["note"]))
+    return scenarios
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+def create_table():
+    return boto3.resource("dynamodb", region_name=os.environ["AWS_DEFAULT_REGION"]).create_table(
+        TableName=handler.RESULTS_TABLE,
+        KeySchema=[{"AttributeName": "jobId", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "jobId", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+
+
+def summarize(items: list[dict], wall_s: float, concurrency: int) -> dict:
+    metrics = [item["metrics"] for item in items if item.get("metrics")]
+    latencies = [m["total_ms"] for m in metrics]
+    agents = sorted({name for m in metrics for name in m["agents"]})
+    iterations = [m["loop_iterations"] for m in metrics]
+    escalations = [m["escalation"]["reason"] for m in metrics if m.get("escalation")]
+    converged = [m["loop_converged"] for m in metrics if m.get("loop_converged")]
+    return {
+        "concurrency": concurrency,
+        "jobs": len(items),
+        "completed": sum(item.get("status") == "Completed" for item in items),
+        "failed": sum(item.get("status") == "Failed" for item in items),
+        "wall_s": round(wall_s, 3),
+        "throughput_jobs_per_s": round(len(items) / wall_s, 3) if wall_s else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 50), "p95": percentile(latencies, 95), "p99": percentile(latencies, 99),
+            "mean": round(statistics.fmean(latencies), 1) if latencies else 0.0, "max": max(latencies, default=0),
+        },
+        "stages": {
+            name: {
+                field: round(statistics.fmean(m["agents"][name][field] for m in metrics if name in m["agents"]), 1)
+                for field in ("wall_ms", "model_calls", "tool_calls", "prompt_tokens", "candidate_tokens")
+            }
+            for name in agents
+        },
+        "loop_iterations": {
+            "mean": round(statistics.fmean(iterations), 2) if iterations else 0.0, "max": max(iterations, default=0),
+            "converged": {reason: converged.count(reason) for reason in sorted(set(converged))},
+        },
+        "retries": sum(m["retries"] for m in metrics),
+        "escalations": {
+            "rate": round(len(escalations) / len(metrics), 3) if metrics else 0.0,
+            "reasons": {reason: escalations.count(reason) for reason in sorted(set(escalations))},
+        },
+    }
+
+
+def run_level(scenarios: list[tuple[str, str]], concurrency: int, jobs: int) -> dict:
+    """Submits `jobs` notes (cycling through the scenarios), runs them in one worker and reads them back."""
+    with mock_aws():
+        create_table()
+        payloads = []
+
+        def invoke(**kwargs):
+            payloads.append(json.loads(kwargs["Payload"]))
+            return {"StatusCode": 202}
+
+        # --- POST: one job per note; the async worker invoke is captured instead of sent ---
+        with mock.patch.object(handler.lambda_client, "invoke", side_effect=invoke):
+            for i in range(jobs):
+                _, note = scenarios[i % len(scenarios)]
+                response = handler.lambda_handler({"httpMethod": "POST", "body": json.dumps({"note": note})}, CONTEXT)
+                assert response["statusCode"] == 202, response
+
+        # --- Worker: every job on one event loop at the requested concurrency ---
+        worker_event = {"worker_mode": True, "concurrency": concurrency,
+                        "jobs": [job for p in payloads for job in p["jobs"]]}
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        # The worker prints EMF lines to stdout; keep stdout for the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            handler.lambda_handler(worker_event, CONTEXT)
+        wall_s = time.perf_counter() - started
+
+        # --- GET: read every job back through the status endpoint ---
+        items = [
+            json.loads(handler.lambda_handler({"httpMethod": "GET", "pathParameters": {"jobId": job["job_id"]}},
+                                              CONTEXT)["body"])
+            for job in worker_event["jobs"]
+        ]
+
+    level = summarize(items, wall_s, concurrency)
+    level["memory"] = {"max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    if tracemalloc.is_tracing():
+        level["memory"]["python_peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+    return level
+
+
+def run_benchmark(scenarios: list[tuple[str, str]], concurrency_levels=(1, 4, 8), jobs: int = 16,
+                  model_latency_ms: float = 0.0) -> dict:
+    scripts = {note: load_script(name) for name, note in scenarios}
+    reset_tool_stats()
+    # Every job must really run: no result cache hits, no client-side throttling of the stub
+    with mock.patch.object(handler, "RESULT_CACHE_ENABLED", False), \
+         mock.patch.object(handler, "DISPATCH_MODE", "invoke"), \
+         mock.patch.object(rate_limiter, "RATE_LIMIT_ENABLED", False), \
+         stub_models(root_agent, scripts, latency_ms=model_latency_ms):
+        levels = [run_level(scenarios, concurrency, jobs) for concurrency in concurrency_levels]
+    return {
+        "benchmark": "pipeline",
+        "python": platform.python_version(),
+        "scenarios": [name for name, _ in scenarios],
+        "jobs_per_level": jobs,
+        "model_latency_ms": model_latency_ms,
+        "levels": levels,
+        # In-process time spent inside the tool functions, across every level
+        "tools": tool_stats(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmark with a scripted stub LLM.")
+    parser.add_argument("--concurrency", default="1,4,8", help="Comma-separated worker concurrency levels.")
+    parser.add_argument("--jobs", type=int, default=16, help="Jobs per concurrency level.")
+    parser.add_argument("--model-latency-ms", type=float, default=0.0, help="Simulated latency per model call.")
+    parser.add_argument("--scenarios", default=str(SCENARIOS_DIR), help="Directory of scenario JSON files.")
+    parser.add_argument("--trace-memory", action="store_true", help="Also report the Python allocation peak.")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    if args.trace_memory:
+        tracemalloc.start()
+    report = run_benchmark(
+        load_scenarios(args.scenarios),
+        concurrency_levels=[int(c) for c in args.concurrency.split(",")],
+        jobs=args.jobs,
+        model_latency_ms=args.model_latency_ms,
+    )
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        pathlib.Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import asyncio
+import contextlib
+import json
+import pathlib
+from typing import AsyncGenerator
+
+from google.adk.agents import LlmAgent
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+# --- Deterministic Stub LLM ---
+# Replays a canned list of turns per agent instead of calling Gemini. Each turn is either
+# {"tool": <name>, "args": {...}} (a function call the real tool then executes) or
+# {"text": "..."} (the agent's answer). The turn to play is the number of tool round-trips
+# the agent has already made in the current request, so every loop iteration replays the
+# agent's script from the start. Scripts live in benchmark/scripts/<scenario>.json, with
+# default.json as the fallback; the stub picks a job's script by its patient note, so
+# different scenarios can share one concurrent worker run.
+
+SCRIPTS_DIR = pathlib.Path(__file__).parent / "scripts"
+CHARS_PER_TOKEN = 4
+
+
+def load_script(scenario: str) -> dict[str, list[dict]]:
+    """Returns the agent -> turns script for a scenario (by file stem), or the default script."""
+    path = SCRIPTS_DIR / f"{pathlib.Path(scenario).stem}.json"
+    return json.loads((path if path.exists() else SCRIPTS_DIR / "default.json").read_text())
+
+
+def completed_tool_turns(llm_request: LlmRequest) -> int:
+    """Counts the agent's trailing function_call contents (each answered by a function_response)."""
+    turns = 0
+    for content in reversed(llm_request.contents or []):
+        parts = content.parts or []
+        if any(p.function_call for p in parts):
+            turns += 1
+        elif not any(p.function_response for p in parts):
+            break
+    return turns
+
+
+def patient_note(llm_request: LlmRequest) -> str:
+    """The pipeline's user message, i.e. the first user text in the request."""
+    for content in llm_request.contents or []:
+        if content.role == "user":
+            return "".join(p.text or "" for p in content.parts or [])
+    return ""
+
+
+class ScriptedLlm(BaseLlm):
+    """BaseLlm that plays an agent's scripted turns, optionally after a simulated model latency."""
+    agent_name: str
+    scripts: dict[str, dict[str, list[dict]]]  # patient note -> agent name -> turns
+    default_script: dict[str, list[dict]]
+    latency_ms: float = 0.0
+
+    def turns_for(self, llm_request: LlmRequest) -> list[dict]:
+        return self.scripts.get(patient_note(llm_request), self.default_script)[self.agent_name]
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        turns = self.turns_for(llm_request)
+        turn = turns[min(completed_tool_turns(llm_request), len(turns) - 1)]
+        if "tool" in turn:
+            part = types.Part(function_call=types.FunctionCall(name=turn["tool"], args=turn.get("args", {})))
+        else:
+            part = types.Part.from_text(text=turn["text"])
+
+        prompt_chars = sum(
+            len(p.text or "") + (len(str(p.function_response.response)) if p.function_response else 0)
+            for c in llm_request.contents or [] for p in c.parts or []
+        )
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[part]),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_chars // CHARS_PER_TOKEN,
+                candidates_token_count=len(json.dumps(turn)) // CHARS_PER_TOKEN,
+            ),
+        )
+
+
+def llm_agents(agent) -> list[LlmAgent]:
+    found = [agent] if isinstance(agent, LlmAgent) else []
+    for sub_agent in agent.sub_agents:
+        found.extend(llm_agents(sub_agent))
+    return found
+
+
+@contextlib.contextmanager
+def stub_models(root_agent, scripts: dict[str, dict[str, list[dict]]], latency_ms: float = 0.0):
+    """
+    Swaps every LlmAgent's model for a ScriptedLlm (keeping the model name, so per-model
+    logic still applies) and restores the real models on exit.
+    `scripts` maps patient notes to agent scripts; other notes replay default.json.
+    """
+    default_script = load_script("default")
+    originals = {}
+    try:
+        for agent in llm_agents(root_agent):
+            originals[agent.name] = agent.model
+            name = agent.model if isinstance(agent.model, str) else agent.model.model
+            agent.model = ScriptedLlm(model=name, agent_name=agent.name, scripts=scripts,
+                                      default_script=default_script, latency_ms=latency_ms)
+        yield
+    finally:
+        for agent in llm_agents(root_agent):
+            if agent.name in originals:
+                agent.model = originals[agent.name]
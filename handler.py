@@ -1,16 +1,24 @@
 import json
 import uuid
 import boto3
+import decimal
 import asyncio
 import logging
 import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
 from dotenv import load_dotenv
 
-# ADK and Gemini Imports
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.genai import types
-from agents.development_workflow.agent import root_agent
+# ADK, Gemini and the agent tree are imported lazily by get_agent_stack(): the GET and POST
+# dispatch paths only need boto3, so a status poll never pays the agent stack's cold start.
+from pipeline.deadline import MAX_CONTINUATIONS, Deadline, DeadlineExceeded, deadline_record, next_stage
+from pipeline.metrics import PipelineMetrics
+from pipeline.progress import ProgressTracker
+from pipeline.result_cache import RESULT_CACHE_ENABLED, RESULT_CACHE_POLL_SECONDS, ResultCache, cache_key
+from pipeline.result_store import BODY_FIELDS, STORAGE_FIELDS, ResultStore, truncate_error
 
 # 1. Setup Logging
 logger = logging.getLogger()
@@ -19,80 +27,520 @@ logger.setLevel(logging.INFO)
 load_dotenv()
 
 # 2. Global Resource Initialization
-session_service = InMemorySessionService()
-runner = Runner(
-    agent=root_agent,
-    app_name="pediatric-rcm-automation",
-    session_service=session_service
-)
-
 # DynamoDB table name comes from template.yml environment variables
 RESULTS_TABLE = os.environ.get('RESULTS_TABLE', 'PediatricRcmResults')
 dynamo = boto3.resource('dynamodb').Table(RESULTS_TABLE)
 lambda_client = boto3.client('lambda')
+sqs_client = boto3.client('sqs')
+s3_client = boto3.client('s3')
+result_cache = ResultCache(dynamo)
+# Results are stored compressed; bodies over RESULT_INLINE_MAX_BYTES go to RESULT_BUCKET
+result_store = ResultStore(s3_client)
+
+@dataclass(frozen=True)
+class AgentStack:
+    runner: object
+    session_service: object
+    checkpoint_keys: tuple
+    knowledge_state: Callable[[], dict]
+
+_agent_stack = None
+_agent_stack_lock = threading.Lock()
+
+def get_agent_stack():
+    """Builds the ADK Runner and session service on first worker use (once per container)."""
+    global _agent_stack
+    if _agent_stack is None:
+        with _agent_stack_lock:
+            if _agent_stack is None:
+                from google.adk.runners import Runner
+                from agents.development_workflow.agent import root_agent
+                from agents.development_workflow.callbacks import CHECKPOINT_KEYS
+                from agents.development_workflow.clinic_context import preload_knowledge_state
+                from agents.development_workflow.code_store import get_code_store
+                from agents.development_workflow.rate_limiter import DynamoQuotaStore, configure_shared_store
+                from agents.development_workflow.resource_snapshot import get_resource_snapshot
+                from pipeline.session_store import BoundedSessionService
+
+                # Sessions are capped and evicted when idle, so warm containers do not accumulate them
+                session_service = BoundedSessionService()
+                runner = Runner(
+                    agent=root_agent,
+                    app_name="pediatric-rcm-automation",
+                    session_service=session_service
+                )
+
+                # Memory-map the ICD-10-CM / CPT code store and snapshot the agent-visible files once per container
+                get_code_store()
+                get_resource_snapshot()
+
+                # Share Gemini quota usage and 429 cooldowns across Lambda instances through the results table
+                if os.environ.get('RATE_LIMIT_SHARED', 'false').lower() == 'true':
+                    configure_shared_store(DynamoQuotaStore(dynamo))
+
+                _agent_stack = AgentStack(runner, session_service, CHECKPOINT_KEYS, preload_knowledge_state)
+                logger.info("WORKER: Agent stack loaded.")
+    return _agent_stack
+
+# Max pipelines multiplexed on one event loop per worker invocation
+WORKER_CONCURRENCY = int(os.environ.get('WORKER_CONCURRENCY', '8'))
+
+# Batch submission limits: notes per worker invoke, and the async invoke payload cap (256 KB)
+DISPATCH_CHUNK_SIZE = int(os.environ.get('DISPATCH_CHUNK_SIZE', '10'))
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '1000'))
+MAX_INVOKE_PAYLOAD_BYTES = 240 * 1024
+
+# Dispatch: 'invoke' self-invokes the worker asynchronously; 'sqs' enqueues one message per job
+# on JOB_QUEUE_URL, which the worker consumes through the SQS event source mapping
+DISPATCH_MODE = os.environ.get('DISPATCH_MODE', 'invoke').lower()
+JOB_QUEUE_URL = os.environ.get('JOB_QUEUE_URL')
+SQS_SEND_BATCH_SIZE = 10
+# Deliveries before SQS moves a message to the dead-letter queue (must match the redrive policy)
+MAX_RECEIVE_COUNT = int(os.environ.get('MAX_RECEIVE_COUNT', '3'))
+TERMINAL_STATUSES = ('Completed', 'Failed')
+
+# Status polling: bounded long-poll (API Gateway gives up after 29s) and the fields every poll reads
+MAX_LONG_POLL_SECONDS = float(os.environ.get('MAX_LONG_POLL_SECONDS', '20'))
+LONG_POLL_INTERVAL_SECONDS = float(os.environ.get('LONG_POLL_INTERVAL_SECONDS', '1'))
+STATUS_FIELDS = ('jobId', 'status', 'stage', 'iteration', 'score', 'version', 'updatedAt', 'error', 'batchId')
+RESULT_FIELDS = STORAGE_FIELDS + ('metrics',)
 
 # 3. --- CORE ADK PIPELINE ---
-async def run_pipeline(patient_note, request_id):
+async def run_pipeline(patient_note, request_id, checkpoint=None, metrics=None, deadline=None,
+                       on_progress=None, on_checkpoint=None):
+    """
+    Runs the agent pipeline for one note and returns its final report. Stage changes and
+    stage outputs go to the job item (update_progress / save_checkpoint) unless other
+    on_progress / on_checkpoint hooks are given, e.g. by the local backfill.
+    """
     logger.info(f"PIPELINE START: Request {request_id}")
-    
-    session = await session_service.create_session(
-        app_name="pediatric-rcm-automation",
-        user_id="api-user",
-        session_id=request_id
-    )
+    on_progress = on_progress or update_progress
+    on_checkpoint = on_checkpoint or save_checkpoint
+
+    # Stage outputs already persisted by an earlier attempt or invocation
+    checkpoint = dict(checkpoint or {})
+    metrics = metrics or PipelineMetrics(request_id)
+    metrics.restore(checkpoint)
+    progress = ProgressTracker(checkpoint)
+    if checkpoint.get("final_billing_report"):
+        logger.info(f"PIPELINE RESUME: Job {request_id} already finalized.")
+        return checkpoint["final_billing_report"]
 
-    content = types.Content(role="user", parts=[types.Part.from_text(text=patient_note)])
+    from google.genai import types
+
+    stack = get_agent_stack()
+    runner, session_service = stack.runner, stack.session_service
+    new_message = types.Content(role="user", parts=[types.Part.from_text(text=patient_note)])
     final_report = "No report generated."
     
     # --- RETRY LOGIC FOR 429 ERRORS ---
     max_retries = 5
     for attempt in range(max_retries):
+        # Stop before a stage that would not finish inside this invocation (see pipeline/deadline.py)
+        if deadline:
+            deadline.check(next_stage(checkpoint))
+        # Each attempt starts a clean session seeded with the checkpoint, so the agents'
+        # callbacks skip every finished stage instead of replaying partial history.
+        # The static knowledge rides along, so the agents need no tool turns to fetch it.
+        session = await session_service.create_session(
+            app_name="pediatric-rcm-automation",
+            user_id="api-user",
+            session_id=f"{request_id}#{attempt}",
+            state={**stack.knowledge_state(), **checkpoint}
+        )
+        metrics.start_attempt(attempt)
+        if checkpoint:
+            logger.info(f"PIPELINE RESUME: Job {request_id} from stages {sorted(checkpoint)}")
         try:
-            for adk_event in runner.run(
-                user_id="api-user",
-                session_id=session.id,
-                new_message=content
-            ):
-                agent_name = getattr(adk_event, 'agent_name', None)
-                if agent_name:
-                    logger.info(f"[AGENT: {agent_name}] processing... event: {adk_event}")
-                if adk_event.is_final_response():
-                    content = getattr(adk_event, 'content', None)
-                    if content and hasattr(content, 'parts') and content.parts:
-                        final_report = getattr(content.parts[0], 'text', str(content.parts[0]))
+            # A model call that overruns its stage budget is cut off at the safety margin
+            async with asyncio.timeout(deadline.usable_ms() / 1000 if deadline else None) as timer:
+                # run_async yields events without blocking the loop, so many pipelines can share it
+                async for adk_event in runner.run_async(
+                    user_id="api-user",
+                    session_id=session.id,
+                    new_message=new_message
+                ):
+                    agent_name = getattr(adk_event, 'author', None)
+                    if agent_name:
+                        logger.info(f"[AGENT: {agent_name}] [JOB: {request_id}] processing... event: {adk_event}")
+                    metrics.record_event(adk_event)
+                    stage = progress.observe(adk_event)
+                    if stage:
+                        await asyncio.to_thread(on_progress, request_id, stage)
+                    delta = {k: v for k, v in adk_event.actions.state_delta.items() if k in stack.checkpoint_keys}
+                    if delta:
+                        checkpoint.update(delta)
+                        await asyncio.to_thread(on_checkpoint, request_id, checkpoint)
+                        # A stage just finished (and is persisted); hand off if the next one cannot
+                        if deadline:
+                            deadline.check(next_stage(checkpoint))
+                    if adk_event.is_final_response():
+                        content = getattr(adk_event, 'content', None)
+                        if content and hasattr(content, 'parts') and content.parts:
+                            final_report = getattr(content.parts[0], 'text', str(content.parts[0]))
             
             break # Success! Exit the retry loop.
 
+        except TimeoutError as e:
+            if not (deadline and timer.expired()):
+                raise
+            raise DeadlineExceeded((progress.current or {}).get("stage"), deadline.remaining_ms()) from e
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             if "429" in str(e) and attempt < max_retries - 1:
-                # Exponential backoff: 2, 4, 8 seconds + a little "jitter"
-                wait_time = (2 ** attempt) + random.random()
+                # The rate limiter already opened the model's cooldown (honouring Retry-After);
+                # full jitter here keeps concurrent pipelines from retrying in waves.
+                wait_time = random.uniform(0, 2 ** attempt)
+                if deadline:
+                    deadline.check(next_stage(checkpoint), wait_time * 1000)
                 logger.warning(f"429 Rate Limit hit. Retrying in {wait_time:.2f}s... (Attempt {attempt+1})")
                 await asyncio.sleep(wait_time)
             else:
                 raise e # Re-raise if it's not a 429 or we're out of retries
-            
-    return final_report
+        finally:
+            await session_service.delete_session(
+                app_name="pediatric-rcm-automation", user_id="api-user", session_id=session.id
+            )
+
+    # Typed outputs: the finalizer's record (a dict) is the result, not its status message
+    return checkpoint.get("final_billing_report", final_report)
+
+def to_dynamo(value):
+    """DynamoDB rejects floats (e.g. a judge score); round-trips through JSON to store numbers as Decimals."""
+    return json.loads(json.dumps(value, default=json_default), parse_float=decimal.Decimal)
+
+def progress_update(progress):
+    """SET clauses, names and values that record `progress` and bump the item's version."""
+    clauses = ["#v = if_not_exists(#v, :zero) + :one", "#u = :u"]
+    names = {'#v': 'version', '#u': 'updatedAt'}
+    values = {':zero': 0, ':one': 1, ':u': int(time.time())}
+    for i, (field, value) in enumerate(progress.items()):
+        clauses.append(f"#p{i} = :p{i}")
+        names[f'#p{i}'] = field
+        values[f':p{i}'] = to_dynamo(value)
+    return clauses, names, values
+
+def update_progress(job_id, progress):
+    """Records the job's current stage (and iteration/score) as a new version."""
+    clauses, names, values = progress_update(progress)
+    dynamo.update_item(
+        Key={'jobId': job_id},
+        UpdateExpression="set " + ", ".join(clauses),
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values
+    )
+
+def save_checkpoint(job_id, checkpoint):
+    """Persists the stage outputs produced so far on the job row."""
+    dynamo.update_item(
+        Key={'jobId': job_id},
+        UpdateExpression="set #c = :c",
+        ExpressionAttributeNames={'#c': 'checkpoint'},
+        ExpressionAttributeValues={':c': to_dynamo(checkpoint)}
+    )
+
+def load_checkpoint(job_id):
+    """Returns the job's persisted stage outputs, or {} for a fresh job."""
+    item = dynamo.get_item(
+        Key={'jobId': job_id},
+        ProjectionExpression='#c',
+        ExpressionAttributeNames={'#c': 'checkpoint'}
+    ).get('Item') or {}
+    return json.loads(json.dumps(item.get('checkpoint', {}), default=json_default))
+
+def complete_job(job_id, report, metrics=None):
+    """
+    Marks a job 'Completed' and stores its final report (and pipeline metrics, if any).
+    The report is stored compressed (or offloaded to S3) with an inline summary of its
+    status, score and codes; returns the stored attributes so the result cache can reuse them.
+    """
+    stored = result_store.encode(job_id, report)
+    names = {'#s': 'status'}
+    values = {':s': 'Completed'}
+    update = "set #s = :s"
+    for i, (field, value) in enumerate(stored.items()):
+        update += f", #r{i} = :r{i}"
+        names[f'#r{i}'] = field
+        values[f':r{i}'] = value
+    if metrics is not None:
+        update += ", #m = :m"
+        names['#m'] = 'metrics'
+        values[':m'] = metrics
+    clauses, progress_names, progress_values = progress_update({'stage': 'completed'})
+    update += ", " + ", ".join(clauses)
+    names.update(progress_names)
+    values.update(progress_values)
+    dynamo.update_item(
+        Key={'jobId': job_id},
+        UpdateExpression=update,
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values
+    )
+    return stored
+
+def fail_job(job_id, error, metrics=None):
+    """Marks a job 'Failed' and stores the error message (and pipeline metrics, if any)."""
+    # Note: 'error' is also risky, so we map it too
+    names = {
+        '#s': 'status', 
+        '#err': 'error'
+    }
+    values = {
+        ':s': 'Failed', 
+        ':e': truncate_error(error)
+    }
+    update = "set #s = :s, #err = :e"
+    if metrics is not None:
+        update += ", #m = :m"
+        names['#m'] = 'metrics'
+        values[':m'] = metrics
+    clauses, progress_names, progress_values = progress_update({'stage': 'failed'})
+    update += ", " + ", ".join(clauses)
+    names.update(progress_names)
+    values.update(progress_values)
+    dynamo.update_item(
+        Key={'jobId': job_id},
+        UpdateExpression=update,
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values
+    )
+
+def release_sessions(job_id, metrics):
+    """Drops every session the job left behind and records the session store's footprint."""
+    if _agent_stack is None:
+        return
+    store = _agent_stack.session_service
+    store.release(f"{job_id}#")
+    metrics.session_store = store.stats()
+
+async def continue_or_finalize(job, key, metrics, deadline, error):
+    """
+    Handles a job that reached the invocation's deadline: dispatches a continuation that
+    resumes from the checkpoint, or (after MAX_CONTINUATIONS, or if the dispatch fails)
+    completes it with the best draft so far as 'HUMAN REVIEW NEEDED'.
+    """
+    job_id = job["job_id"]
+    continuations = int(job.get("continuations", 0))
+    if continuations < MAX_CONTINUATIONS:
+        continuation = {k: v for k, v in job.items() if k != "final_attempt"}
+        continuation.update({"continuations": continuations + 1, "cache_key": key})
+        await asyncio.to_thread(update_progress, job_id, {'stage': 'continuing', 'continuations': continuations + 1})
+        failed = await asyncio.to_thread(dispatch_jobs, [continuation], deadline.context)
+        if not failed:
+            logger.warning(f"WORKER DEADLINE: Job {job_id} continues in a new invocation ({error}).")
+            return True
+        logger.error(f"WORKER DEADLINE: Continuation of job {job_id} not dispatched: {failed[0][1]}")
+
+    checkpoint = await asyncio.to_thread(load_checkpoint, job_id)
+    summary = metrics.to_dict()
+    summary["deadline"] = {"continuations": continuations, "stage": error.stage}
+    metrics.emit(summary, 'Completed')
+    await asyncio.to_thread(complete_job, job_id, deadline_record(checkpoint, continuations), summary)
+    # A deadline record is not a reviewed result; do not serve it to identical notes
+    if key:
+        await asyncio.to_thread(result_cache.release, key, job_id)
+    logger.warning(f"WORKER DEADLINE: Job {job_id} finalized for human review after {continuations} continuation(s).")
+    return True
+
+async def resolve_single_flight(job_id, key, deadline=None):
+    """
+    Makes `job_id` the in-flight owner of its cache key, or returns the completed entry it
+    should be served from. While another job owns the key, waits (without a worker slot) for
+    that owner to finish; if the owner releases its claim or the claim expires, takes it over.
+    """
+    while True:
+        entry = await asyncio.to_thread(result_cache.get, key)
+        if entry is None:
+            entry = await asyncio.to_thread(result_cache.claim, key, job_id)
+            if entry is None:
+                return None
+        if entry.get('status') == 'Completed':
+            return entry
+        if entry.get('ownerJobId') == job_id:
+            return None  # our own claim (an SQS redelivery or a continuation)
+        if deadline and not deadline.allows(RESULT_CACHE_POLL_SECONDS * 1000):
+            raise DeadlineExceeded('waiting', deadline.remaining_ms())
+        await asyncio.sleep(RESULT_CACHE_POLL_SECONDS)
+
+async def run_job(job, semaphore, deadline=None):
+    """
+    Runs one job's pipeline under the shared semaphore and records its own outcome.
+    A job whose note is already in flight in another job waits for that job's result
+    instead of running a second pipeline (see resolve_single_flight).
+    A job with final_attempt=False (an SQS delivery that will be retried) stays 'Running'
+    on failure, so the redelivery resumes from its checkpoint and keeps its cache claim.
+    A job that reaches the invocation's deadline is handed to continue_or_finalize.
+    """
+    job_id = job["job_id"]
+    key = job.get("cache_key") or (cache_key(job["note"]) if RESULT_CACHE_ENABLED else None)
+    metrics = PipelineMetrics(job_id)
+    try:
+        # Serve identical, already-completed (or in-flight) encounters from the result cache
+        if key:
+            cached = await resolve_single_flight(job_id, key, deadline)
+            if cached:
+                await asyncio.to_thread(complete_job, job_id, result_store.decode(cached))
+                logger.info(f"WORKER CACHE HIT: Job {job_id} served from job {cached.get('ownerJobId')}.")
+                return True
+
+        async with semaphore:
+            # Metrics time the pipeline itself, not the wait for a slot
+            metrics = PipelineMetrics(job_id)
+            # Re-invocations (e.g. after a Lambda timeout) resume from the last completed stage
+            checkpoint = await asyncio.to_thread(load_checkpoint, job_id)
+            report = await run_pipeline(job["note"], job_id, checkpoint, metrics, deadline)
+        release_sessions(job_id, metrics)
+        summary = metrics.to_dict()
+        metrics.emit(summary, 'Completed')
+        # boto3 is blocking; keep the event loop free for the other pipelines
+        stored = await asyncio.to_thread(complete_job, job_id, report, summary)
+        if key:
+            await asyncio.to_thread(result_cache.complete, key, job_id, stored)
+        logger.info(f"WORKER SUCCESS: Job {job_id} complete.")
+        return True
+    except DeadlineExceeded as e:
+        release_sessions(job_id, metrics)
+        return await continue_or_finalize(job, key, metrics, deadline, e)
+    except Exception as e:
+        logger.error(f"WORKER FAILURE: Job {job_id}: {str(e)}")
+        release_sessions(job_id, metrics)
+        if not job.get("final_attempt", True):
+            await asyncio.to_thread(update_progress, job_id, {'stage': 'retrying', 'error': truncate_error(e)})
+            return False
+        summary = metrics.to_dict()
+        metrics.emit(summary, 'Failed')
+        await asyncio.to_thread(fail_job, job_id, e, summary)
+        if key:
+            await asyncio.to_thread(result_cache.release, key, job_id)
+        return False
+
+async def run_jobs(jobs, concurrency=WORKER_CONCURRENCY, deadline=None):
+    """
+    Runs many pipelines concurrently on one event loop, sharing the Runner and session service
+    (and the invocation's deadline, when there is one).
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    return await asyncio.gather(*(run_job(job, semaphore, deadline) for job in jobs))
 
 # 4. --- HELPER FLOW METHODS ---
 
-def handle_get_flow(event):
-    """Handles polling requests to check job status."""
-    job_id = event.get("pathParameters", {}).get("jobId")
+def json_default(value):
+    """Serializes DynamoDB Decimals as int or float."""
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def parse_body(event):
+    """Returns the request body as a dict whether API Gateway sent a string or an object."""
+    return json.loads(event.get("body") or "{}") if isinstance(event.get("body"), str) else (event.get("body") or {})
+
+def chunk_jobs(jobs, chunk_size=DISPATCH_CHUNK_SIZE, max_bytes=MAX_INVOKE_PAYLOAD_BYTES):
+    """Splits jobs into worker payloads bounded by job count and serialized size."""
+    chunk, chunk_bytes = [], 0
+    for job in jobs:
+        job_bytes = len(json.dumps(job))
+        if chunk and (len(chunk) >= chunk_size or chunk_bytes + job_bytes > max_bytes):
+            yield chunk
+            chunk, chunk_bytes = [], 0
+        chunk.append(job)
+        chunk_bytes += job_bytes
+    if chunk:
+        yield chunk
+
+def dispatch_jobs(jobs, context):
+    """
+    Hands jobs to workers: SQS messages (SendMessageBatch) in 'sqs' mode, otherwise one
+    async self-invoke per chunk. Returns (job, error) for every job that was not dispatched.
+    """
+    failures = []
+    chunk_size = SQS_SEND_BATCH_SIZE if DISPATCH_MODE == 'sqs' else DISPATCH_CHUNK_SIZE
+    for chunk in chunk_jobs(jobs, chunk_size=chunk_size):
+        try:
+            if DISPATCH_MODE == 'sqs':
+                response = sqs_client.send_message_batch(
+                    QueueUrl=JOB_QUEUE_URL,
+                    Entries=[{"Id": str(i), "MessageBody": json.dumps(job)} for i, job in enumerate(chunk)]
+                )
+                failures.extend((chunk[int(f["Id"])], f.get("Message", f.get("Code"))) for f in response.get("Failed", []))
+            else:
+                lambda_client.invoke(
+                    FunctionName=context.function_name,
+                    InvocationType='Event',
+                    Payload=json.dumps({"worker_mode": True, "jobs": chunk})
+                )
+        except Exception as e:
+            failures.extend((job, str(e)) for job in chunk)
+    return failures
+
+def parse_known_version(event):
+    """The version the client already has, from If-None-Match (an ETag we issued) or ?sinceVersion."""
+    headers = {k.lower(): v for k, v in (event.get("headers") or {}).items()}
+    params = event.get("queryStringParameters") or {}
+    raw = headers.get("if-none-match") or params.get("sinceVersion")
+    try:
+        return int(str(raw).removeprefix("W/").strip('"')) if raw is not None else None
+    except ValueError:
+        return None
+
+def read_job_fields(job_id, fields):
+    """Reads only `fields` of a job item (polls never pay for the result or checkpoint)."""
+    return dynamo.get_item(
+        Key={'jobId': job_id},
+        ProjectionExpression=", ".join(f"#f{i}" for i in range(len(fields))),
+        ExpressionAttributeNames={f"#f{i}": field for i, field in enumerate(fields)}
+    ).get('Item')
+
+def handle_get_flow(event, context=None):
+    """
+    Handles polling requests to check job status. Supports If-None-Match / ?sinceVersion
+    (304 when nothing changed), ?wait=<seconds> to long-poll for the next version, and
+    ?format=markdown to receive a structured result rendered as the markdown report.
+    """
+    job_id = (event.get("pathParameters") or {}).get("jobId")
     if not job_id:
         return {"statusCode": 400, "body": json.dumps({"error": "Missing jobId"})}
 
     logger.info(f"GET: Fetching status for {job_id}")
-    response = dynamo.get_item(Key={'jobId': job_id})
-    item = response.get('Item')
+    item = read_job_fields(job_id, STATUS_FIELDS)
 
     if not item:
         return {"statusCode": 404, "body": json.dumps({"error": "Job ID not found"})}
 
+    known = parse_known_version(event)
+    if known is not None:
+        # Long-poll within the API Gateway limit and the invocation's remaining time
+        try:
+            wait = float((event.get("queryStringParameters") or {}).get("wait") or 0)
+        except ValueError:
+            wait = 0.0
+        remaining = getattr(context, "get_remaining_time_in_millis", None)
+        wait = min(max(wait, 0.0), MAX_LONG_POLL_SECONDS, (remaining() / 1000 - 1) if remaining else MAX_LONG_POLL_SECONDS)
+        deadline = time.monotonic() + wait
+        while (int(item.get('version', 0)) <= known and item.get('status') not in TERMINAL_STATUSES
+               and time.monotonic() + LONG_POLL_INTERVAL_SECONDS <= deadline):
+            time.sleep(LONG_POLL_INTERVAL_SECONDS)
+            item = read_job_fields(job_id, STATUS_FIELDS) or item
+
+    etag = f'"{int(item.get("version", 0))}"'
+    if known is not None and int(item.get('version', 0)) <= known:
+        return {"statusCode": 304, "headers": {"ETag": etag}, "body": ""}
+
+    # The report is fetched only once the job finished and the client has not seen that version
+    if item.get('status') in TERMINAL_STATUSES:
+        stored = read_job_fields(job_id, RESULT_FIELDS) or {}
+        item.update({field: stored[field] for field in ('summary', 'metrics') if field in stored})
+        if any(field in stored for field in BODY_FIELDS):
+            item['result'] = result_store.decode(stored)
+        # Structured results are stored as records; markdown is rendered only on request
+        if 'result' in item and ((event.get("queryStringParameters") or {}).get("format") or "").lower() == "markdown":
+            from pipeline.encounter_schema import render_encounter_record
+            item['result'] = render_encounter_record(item['result'])
+
     return {
         "statusCode": 200,
-        "headers": {"Content-Type": "application/json"},
-        "body": json.dumps(item)
+        "headers": {"Content-Type": "application/json", "ETag": etag},
+        "body": json.dumps(item, default=json_default)
     }
 
 def handle_post_flow(event, context):
@@ -101,21 +549,47 @@ def handle_post_flow(event, context):
     logger.info(f"POST: Initiating Job {job_id}")
     
     try:
-        body = json.loads(event.get("body", "{}")) if isinstance(event.get("body"), str) else event.get("body", {})
+        body = parse_body(event)
         note = body.get("note", "")
         
         if not note:
             return {"statusCode": 400, "body": json.dumps({"error": "No note provided"})}
 
+        # Identical resubmissions return the completed report or attach to the in-flight job
+        key = None
+        if RESULT_CACHE_ENABLED:
+            key = cache_key(note)
+            existing = result_cache.claim(key, job_id)
+            if existing and existing.get('status') == 'Completed':
+                logger.info(f"POST CACHE HIT: Returning report of job {existing['ownerJobId']}")
+                return {
+                    "statusCode": 200,
+                    "headers": {"Content-Type": "application/json"},
+                    "body": json.dumps({"jobId": existing['ownerJobId'], "status": "Completed",
+                                        "result": result_store.decode(existing), "cached": True},
+                                       default=json_default)
+                }
+            if existing:
+                logger.info(f"POST SINGLE-FLIGHT: Attaching to in-flight job {existing['ownerJobId']}")
+                return {
+                    "statusCode": 202,
+                    "headers": {"Content-Type": "application/json"},
+                    "body": json.dumps({"jobId": existing['ownerJobId'], "message": "Attached to in-flight job",
+                                        "cached": True})
+                }
+
         # Save 'Running' status
-        dynamo.put_item(Item={'jobId': job_id, 'status': 'Running'})
+        now = int(time.time())
+        dynamo.put_item(Item={'jobId': job_id, 'status': 'Running', 'stage': 'queued', 'version': 1,
+                              'createdAt': now, 'updatedAt': now})
 
-        # Trigger Worker asynchronously
-        lambda_client.invoke(
-            FunctionName=context.function_name,
-            InvocationType='Event',
-            Payload=json.dumps({"worker_mode": True, "job_id": job_id, "note": note})
-        )
+        # Hand off to a worker (async self-invoke or SQS, see DISPATCH_MODE)
+        failed = dispatch_jobs([{"job_id": job_id, "note": note, "cache_key": key}], context)
+        if failed:
+            fail_job(job_id, f"Dispatch failed: {failed[0][1]}")
+            if key:
+                result_cache.release(key, job_id)
+            raise RuntimeError(failed[0][1])
 
         return {
             "statusCode": 202,
@@ -126,45 +600,136 @@ def handle_post_flow(event, context):
         logger.error(f"Post Flow Error: {str(e)}")
         return {"statusCode": 500, "body": json.dumps({"error": "Failed to start flow"})}
 
-def handle_worker_flow(event):
-    """Handles background execution of the ADK pipeline."""
-    job_id = event["job_id"]
-    note = event["note"]
-    logger.info(f"WORKER: Execution started for {job_id}")
-    
+def handle_batch_post_flow(event, context):
+    """Handles POST /process-encounters: one batch of notes, fanned out to workers in chunks."""
+    batch_id = str(uuid.uuid4())
+    logger.info(f"POST BATCH: Initiating Batch {batch_id}")
+
     try:
-        report = asyncio.run(run_pipeline(note, job_id))
-        
-        # FIXED: Use #r as a placeholder for the reserved keyword 'result'
-        dynamo.update_item(
-            Key={'jobId': job_id},
-            UpdateExpression="set #s = :s, #res = :r",
-            ExpressionAttributeNames={
-                '#s': 'status', 
-                '#res': 'result'  # This maps the placeholder to the actual column
-            },
-            ExpressionAttributeValues={
-                ':s': 'Completed', 
-                ':r': report
-            }
-        )
-        logger.info(f"WORKER SUCCESS: Job {job_id} complete.")
-        
+        body = parse_body(event)
+        notes = [n.get("note", "") if isinstance(n, dict) else n for n in body.get("notes") or []]
+
+        if not notes or not all(isinstance(n, str) and n for n in notes):
+            return {"statusCode": 400, "body": json.dumps({"error": "'notes' must be a non-empty array of notes"})}
+        if len(notes) > MAX_BATCH_SIZE:
+            return {"statusCode": 413, "body": json.dumps({"error": f"Batch exceeds {MAX_BATCH_SIZE} notes"})}
+
+        jobs = [{"job_id": str(uuid.uuid4()), "note": note} for note in notes]
+        job_ids = [job["job_id"] for job in jobs]
+
+        # One batched write for the batch record and every job row
+        now = int(time.time())
+        with dynamo.batch_writer() as writer:
+            writer.put_item(Item={'jobId': batch_id, 'recordType': 'batch', 'jobIds': job_ids, 'total': len(job_ids)})
+            for job_id in job_ids:
+                writer.put_item(Item={'jobId': job_id, 'status': 'Running', 'batchId': batch_id, 'stage': 'queued',
+                                      'version': 1, 'createdAt': now, 'updatedAt': now})
+
+        # One worker invoke (or SQS send) per chunk instead of one per note
+        failed = dispatch_jobs(jobs, context)
+        for job, error in failed:
+            logger.error(f"Batch {batch_id} dispatch error for job {job['job_id']}: {error}")
+            fail_job(job["job_id"], f"Dispatch failed: {error}")
+
+        logger.info(f"POST BATCH: {len(jobs) - len(failed)}/{len(jobs)} job(s) dispatched via {DISPATCH_MODE}")
+        return {
+            "statusCode": 202,
+            "headers": {"Content-Type": "application/json"},
+            "body": json.dumps({"batchId": batch_id, "jobIds": job_ids, "message": "Batch started"})
+        }
     except Exception as e:
-        logger.error(f"WORKER FAILURE: {str(e)}")
-        # Note: 'error' is also risky, so we map it too
-        dynamo.update_item(
-            Key={'jobId': job_id},
-            UpdateExpression="set #s = :s, #err = :e",
-            ExpressionAttributeNames={
-                '#s': 'status', 
-                '#err': 'error'
-            },
-            ExpressionAttributeValues={
-                ':s': 'Failed', 
-                ':e': str(e)
-            }
-        )
+        logger.error(f"Post Batch Flow Error: {str(e)}")
+        return {"statusCode": 500, "body": json.dumps({"error": "Failed to start batch"})}
+
+def fetch_job_statuses(job_ids):
+    """Reads only jobId/status for many jobs with BatchGetItem (100 keys per call)."""
+    statuses = {}
+    client = dynamo.meta.client
+    for start in range(0, len(job_ids), 100):
+        request = {RESULTS_TABLE: {
+            'Keys': [{'jobId': job_id} for job_id in job_ids[start:start + 100]],
+            'ProjectionExpression': 'jobId, #s',
+            'ExpressionAttributeNames': {'#s': 'status'},
+        }}
+        while request:
+            response = client.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(RESULTS_TABLE, []):
+                statuses[item['jobId']] = item.get('status')
+            request = response.get('UnprocessedKeys') or None
+    return statuses
+
+def handle_batch_get_flow(event):
+    """Handles GET /batch/{batchId}: aggregate progress across the batch's jobs."""
+    batch_id = (event.get("pathParameters") or {}).get("batchId")
+    if not batch_id:
+        return {"statusCode": 400, "body": json.dumps({"error": "Missing batchId"})}
+
+    logger.info(f"GET BATCH: Fetching progress for {batch_id}")
+    item = dynamo.get_item(Key={'jobId': batch_id}).get('Item')
+    if not item or item.get('recordType') != 'batch':
+        return {"statusCode": 404, "body": json.dumps({"error": "Batch ID not found"})}
+
+    job_ids = item.get('jobIds', [])
+    statuses = fetch_job_statuses(job_ids)
+    counts = {}
+    for job_id in job_ids:
+        status = statuses.get(job_id, 'Unknown')
+        counts[status] = counts.get(status, 0) + 1
+    finished = sum(counts.get(s, 0) for s in TERMINAL_STATUSES)
+
+    return {
+        "statusCode": 200,
+        "headers": {"Content-Type": "application/json"},
+        "body": json.dumps({
+            "batchId": batch_id,
+            "status": "Completed" if finished == len(job_ids) else "Running",
+            "total": len(job_ids),
+            "counts": counts,
+            "progress": round(100 * finished / len(job_ids), 1) if job_ids else 100.0,
+            "jobs": [{"jobId": job_id, "status": statuses.get(job_id, 'Unknown')} for job_id in job_ids],
+        })
+    }
+
+def handle_worker_flow(event, context=None):
+    """Handles background execution of the ADK pipeline for one job or a list of jobs."""
+    # Accepts {"jobs": [{"job_id", "note"}, ...]} or the single-job {"job_id", "note"} shape
+    jobs = event.get("jobs") or [{"job_id": event["job_id"], "note": event["note"], "cache_key": event.get("cache_key"),
+                                  "continuations": event.get("continuations", 0)}]
+    concurrency = int(event.get("concurrency", WORKER_CONCURRENCY))
+    logger.info(f"WORKER: Execution started for {len(jobs)} job(s) with concurrency {concurrency}")
+    # Load ADK before the event loop starts, so the first pipelines do not block it on imports;
+    # every concurrent pipeline needs its session resident
+    get_agent_stack().session_service.ensure_capacity(concurrency)
+
+    results = asyncio.run(run_jobs(jobs, concurrency, Deadline.from_context(context)))
+    logger.info(f"WORKER: {sum(results)}/{len(jobs)} job(s) completed.")
+    return results
+
+def handle_queue_flow(event, context=None):
+    """
+    Handles a batch of SQS job messages: runs them concurrently (capped by WORKER_CONCURRENCY)
+    and reports only the failed messages, so SQS redelivers just those notes.
+    """
+    records = event["Records"]
+    failures, jobs, job_records = [], [], []
+    for record in records:
+        try:
+            job = json.loads(record["body"])
+            job["final_attempt"] = int(record.get("attributes", {}).get("ApproximateReceiveCount", 1)) >= MAX_RECEIVE_COUNT
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"QUEUE: Malformed message {record.get('messageId')}: {str(e)}")
+            failures.append({"itemIdentifier": record.get("messageId")})
+            continue
+        jobs.append(job)
+        job_records.append(record)
+
+    logger.info(f"QUEUE: {len(jobs)} job(s) received with concurrency {WORKER_CONCURRENCY}")
+    if jobs:
+        get_agent_stack().session_service.ensure_capacity(WORKER_CONCURRENCY)
+        results = asyncio.run(run_jobs(jobs, WORKER_CONCURRENCY, Deadline.from_context(context)))
+        failures.extend({"itemIdentifier": r["messageId"]} for r, ok in zip(job_records, results) if not ok)
+    logger.info(f"QUEUE: {len(records) - len(failures)}/{len(records)} message(s) processed.")
+    return {"batchItemFailures": failures}
 
 # 5. --- MAIN ENTRY POINT ---
 
@@ -173,14 +738,24 @@ def lambda_handler(event, context):
     
     # Check for internal Worker trigger
     if event.get("worker_mode"):
-        handle_worker_flow(event)
+        handle_worker_flow(event, context)
         return
+
+    # SQS event source mapping (DISPATCH_MODE=sqs)
+    records = event.get("Records") or []
+    if records and records[0].get("eventSource") == "aws:sqs":
+        return handle_queue_flow(event, context)
     
-    # Route based on HTTP Method
+    # Route based on HTTP Method and resource path
     method = event.get("httpMethod")
+    resource = event.get("resource") or event.get("path") or ""
     if method == "GET":
-        return handle_get_flow(event)
+        if (event.get("pathParameters") or {}).get("batchId"):
+            return handle_batch_get_flow(event)
+        return handle_get_flow(event, context)
     elif method == "POST":
+        if resource.rstrip("/").endswith("/process-encounters"):
+            return handle_batch_post_flow(event, context)
         return handle_post_flow(event, context)
 
     return {
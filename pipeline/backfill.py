@@ -0,0 +1,382 @@
+"""
+Resumable bulk backfill of historical notes through the agent pipeline, run locally.
+
+Streams notes from a JSONL file (one {"id", "note"} object or one JSON string per line) or
+a Parquet file (read one batch at a time, never loaded whole). Each note runs through
+handler.run_pipeline, so it gets the same agents, stage checkpoints and 429 retries as
+the worker. No DynamoDB, SQS or S3 is touched: stage progress stays in memory, and only
+the LLM calls leave the machine (--stub-model replays benchmark/scripts instead).
+
+At most --concurrency pipelines share one event loop. Results are written in batches to a
+JSONL file (--output results.jsonl) or as Parquet part files in a directory
+(--output results/). After each batch, <output>.checkpoint.json records the notes done
+and the output position (byte offset or part count). A rerun after a crash truncates the
+output to that position and skips those notes. Every note is in the output exactly
+once. Notes finished after the last checkpoint are run again.
+
+Usage:
+    python -m pipeline.backfill --input archive/2025.jsonl --output backfill/2025.jsonl --concurrency 16
+    python -m pipeline.backfill --input archive/2025.parquet --output backfill/2025/ --id-field encounter_id
+    python -m pipeline.backfill --input notes.jsonl --output out.jsonl --stub-model --limit 100
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import pathlib
+import time
+
+# handler builds its boto3 clients at import; they are never called here but need a region
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import handler
+from pipeline.metrics import PipelineMetrics
+from pipeline.result_store import summarize, truncate_error
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+
+SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("ordinal", pa.int64()),
+    ("status", pa.string()),
+    ("final_status", pa.string()),
+    ("confidence_score", pa.float64()),
+    ("icd10_codes", pa.list_(pa.string())),
+    ("cpt_codes", pa.list_(pa.string())),
+    ("result", pa.string()),  # JSON of the encounter record (or markdown report)
+    ("error", pa.string()),
+    ("latency_ms", pa.int64()),
+    ("loop_iterations", pa.int32()),
+    ("retries", pa.int32()),
+])
+
+
+# --- Input ---
+
+def read_notes(path: str, note_field: str = "note", id_field: str = "id", start: int = 0,
+               batch_size: int = 1024):
+    """Yields (ordinal, id, note) from JSONL or Parquet, skipping ordinals below `start` cheaply."""
+    if str(path).endswith(".parquet"):
+        parquet = pq.ParquetFile(path)
+        columns = [note_field] + ([id_field] if id_field in parquet.schema_arrow.names else [])
+        ordinal = 0
+        for group in range(parquet.num_row_groups):
+            rows = parquet.metadata.row_group(group).num_rows
+            if ordinal + rows <= start:
+                ordinal += rows  # already done: not even read
+                continue
+            for batch in parquet.iter_batches(batch_size=batch_size, row_groups=[group], columns=columns):
+                for row in batch.to_pylist():
+                    if ordinal >= start:
+                        yield ordinal, str(row.get(id_field) or ordinal), row[note_field]
+                    ordinal += 1
+        return
+
+    with open(path, encoding="utf-8") as lines:
+        ordinal = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            if ordinal >= start:
+                record = json.loads(line)
+                if isinstance(record, str):
+                    yield ordinal, str(ordinal), record
+                else:
+                    yield ordinal, str(record.get(id_field) or ordinal), record.get(note_field, "")
+            ordinal += 1
+
+
+# --- Output ---
+
+class JsonlSink:
+    """Appends result rows to a JSONL file; its position is the byte offset."""
+
+    def __init__(self, path: str):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, "ab")
+
+    def restore(self, position: int) -> None:
+        # Rows written after the last checkpoint belong to notes that will run again
+        self.file.truncate(position)
+        self.file.seek(position)
+
+    def write(self, rows: list[dict]) -> None:
+        self.file.write(b"".join(json.dumps(row, default=handler.json_default).encode() + b"\n" for row in rows))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def position(self) -> int:
+        return self.file.tell()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class ParquetSink:
+    """Writes each batch of result rows as one zstd Parquet part file; its position is the part count."""
+
+    def __init__(self, directory: str):
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.parts = len(list(self.directory.glob("part-*.parquet")))
+
+    def restore(self, position: int) -> None:
+        for part in self.directory.glob("part-*.parquet"):
+            if int(part.stem.removeprefix("part-")) >= position:
+                part.unlink()
+        self.parts = position
+
+    def write(self, rows: list[dict]) -> None:
+        table = pa.Table.from_pylist([{**row, "result": json.dumps(row["result"], default=handler.json_default)
+                                       if row["result"] is not None else None} for row in rows], schema=SCHEMA)
+        pq.write_table(table, self.directory / f"part-{self.parts:06d}.parquet", compression="zstd")
+        self.parts += 1
+
+    def position(self) -> int:
+        return self.parts
+
+    def close(self) -> None:
+        pass
+
+
+def open_sink(output: str):
+    return JsonlSink(output) if output.endswith((".jsonl", ".ndjson")) else ParquetSink(output)
+
+
+# --- Progress ---
+
+class BackfillCheckpoint:
+    """
+    The notes whose rows are in the output: every ordinal below `next`, plus `done` (the
+    few finished out of order). Saved atomically with the sink position after each batch.
+    """
+
+    def __init__(self, path: str, source: str, state: dict | None = None):
+        state = state or {}
+        if state and state.get("input") != source:
+            raise ValueError(f"Checkpoint {path} belongs to input {state.get('input')}, not {source}")
+        self.path = pathlib.Path(path)
+        self.source = source
+        self.resumed = bool(state)
+        self.next = state.get("next", 0)
+        self.done = set(state.get("done", []))
+        self.position = state.get("position", 0)
+        self.counts = state.get("counts", {"Completed": 0, "Failed": 0})
+
+    @classmethod
+    def load(cls, path: str, source: str) -> "BackfillCheckpoint":
+        checkpoint = pathlib.Path(path)
+        return cls(path, source, json.loads(checkpoint.read_text()) if checkpoint.exists() else None)
+
+    def is_done(self, ordinal: int) -> bool:
+        return ordinal < self.next or ordinal in self.done
+
+    def mark(self, ordinal: int, status: str) -> None:
+        self.done.add(ordinal)
+        self.counts[status] = self.counts.get(status, 0) + 1
+        while self.next in self.done:
+            self.done.remove(self.next)
+            self.next += 1
+
+    def save(self, position: int) -> None:
+        self.position = position
+        state = {"input": self.source, "next": self.next, "done": sorted(self.done), "position": position,
+                 "counts": self.counts, "updatedAt": int(time.time())}
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        temporary.write_text(json.dumps(state))
+        os.replace(temporary, self.path)
+
+
+class Throughput:
+    """Live notes/s over the whole run and since the last report."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.started = self.last_at = clock()
+        self.finished = self.failed = self.last_finished = 0
+
+    def record(self, status: str) -> None:
+        self.finished += 1
+        self.failed += status == "Failed"
+
+    def report(self, in_flight: int) -> dict:
+        now = self.clock()
+        window = self.finished - self.last_finished
+        report = {
+            "finished": self.finished,
+            "failed": self.failed,
+            "in_flight": in_flight,
+            "notes_per_s": round(window / (now - self.last_at), 2) if now > self.last_at else 0.0,
+            "overall_notes_per_s": round(self.finished / (now - self.started), 2) if now > self.started else 0.0,
+        }
+        self.last_at, self.last_finished = now, self.finished
+        return report
+
+
+# --- Pipeline ---
+
+def _discard(*_):
+    """Stage progress and stage outputs of a backfill note stay in memory."""
+
+
+async def run_note(ordinal: int, note_id: str, note: str) -> dict:
+    """Runs one note through the pipeline (with its 429 retries) and returns its output row."""
+    job_id = f"backfill-{ordinal}"
+    metrics = PipelineMetrics(job_id)
+    report, error = None, None
+    try:
+        report = await handler.run_pipeline(note, job_id, {}, metrics, on_progress=_discard, on_checkpoint=_discard)
+    except Exception as e:
+        logger.error(f"BACKFILL FAILURE: Note {note_id} (#{ordinal}): {str(e)}")
+        error = truncate_error(e)
+    finally:
+        handler.release_sessions(job_id, metrics)
+    summary = summarize(report) if report is not None else {}
+    stats = metrics.to_dict()
+    return {
+        "id": note_id,
+        "ordinal": ordinal,
+        "status": "Failed" if error else "Completed",
+        "final_status": summary.get("finalStatus"),
+        "confidence_score": float(summary["score"]) if summary.get("score") is not None else None,
+        "icd10_codes": summary.get("icd10", []),
+        "cpt_codes": summary.get("cpts", []),
+        "result": report,
+        "error": error,
+        "latency_ms": stats["total_ms"],
+        "loop_iterations": stats["loop_iterations"],
+        "retries": stats["retries"],
+    }
+
+
+async def backfill(input_path: str, output: str, concurrency: int = handler.WORKER_CONCURRENCY,
+                   note_field: str = "note", id_field: str = "id", batch_rows: int = 100,
+                   flush_seconds: float = 10.0, report_seconds: float = 30.0, limit: int | None = None,
+                   checkpoint_path: str | None = None) -> dict:
+    source = str(pathlib.Path(input_path).resolve())
+    checkpoint = BackfillCheckpoint.load(checkpoint_path or output.rstrip("/") + CHECKPOINT_SUFFIX, source)
+    sink = open_sink(output)
+    if sink.position() and not checkpoint.resumed:
+        sink.close()
+        raise ValueError(f"{output} already has results but no checkpoint at {checkpoint.path}; "
+                         "pass --checkpoint or choose a new output")
+    sink.restore(checkpoint.position)
+    resumed_from = checkpoint.next
+    throughput = Throughput()
+    # Bounded so a multi-million-note input is never read ahead of the pipelines
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, concurrency) * 2)
+    pending: list[dict] = []
+    in_flight = 0
+    last_flush = time.monotonic()
+
+    def flush() -> None:
+        nonlocal last_flush
+        if pending:
+            sink.write(pending)
+            for row in pending:
+                checkpoint.mark(row["ordinal"], row["status"])
+            checkpoint.save(sink.position())
+            pending.clear()
+        last_flush = time.monotonic()
+
+    async def produce() -> None:
+        queued = 0
+        for ordinal, note_id, note in read_notes(input_path, note_field, id_field, start=checkpoint.next):
+            if checkpoint.is_done(ordinal):
+                continue
+            if limit is not None and queued >= limit:
+                break
+            await queue.put((ordinal, note_id, note))
+            queued += 1
+        for _ in range(max(1, concurrency)):
+            await queue.put(None)
+
+    async def work() -> None:
+        nonlocal in_flight
+        while (item := await queue.get()) is not None:
+            in_flight += 1
+            row = await run_note(*item)
+            in_flight -= 1
+            throughput.record(row["status"])
+            pending.append(row)
+            if len(pending) >= batch_rows or time.monotonic() - last_flush >= flush_seconds:
+                # Blocking write on the loop: brief, and it keeps the checkpoint in step with the output
+                flush()
+
+    async def report() -> None:
+        while True:
+            await asyncio.sleep(report_seconds)
+            logger.info(f"BACKFILL PROGRESS: {json.dumps(throughput.report(in_flight))}")
+
+    # Every pipeline in flight keeps its session resident until it finishes
+    handler.get_agent_stack().session_service.ensure_capacity(concurrency)
+    logger.info(f"BACKFILL START: {input_path} -> {output}, resuming at note #{resumed_from}")
+    reporter = asyncio.create_task(report())
+    try:
+        await asyncio.gather(produce(), *(work() for _ in range(max(1, concurrency))))
+    finally:
+        reporter.cancel()
+        flush()
+        sink.close()
+
+    elapsed = time.monotonic() - throughput.started
+    return {
+        "input": input_path,
+        "output": output,
+        "resumed_from": resumed_from,
+        "processed": throughput.finished,
+        "failed": throughput.failed,
+        "totals": checkpoint.counts,
+        "next": checkpoint.next,
+        "elapsed_s": round(elapsed, 3),
+        "notes_per_s": round(throughput.finished / elapsed, 3) if elapsed else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resumable local backfill of notes through the agent pipeline.")
+    parser.add_argument("--input", required=True, help="JSONL or .parquet file of notes.")
+    parser.add_argument("--output", required=True, help="results.jsonl, or a directory for Parquet part files.")
+    parser.add_argument("--concurrency", type=int, default=handler.WORKER_CONCURRENCY, help="Pipelines in flight.")
+    parser.add_argument("--note-field", default="note")
+    parser.add_argument("--id-field", default="id", help="Field carried to the output as 'id' (default: ordinal).")
+    parser.add_argument("--batch-rows", type=int, default=100, help="Rows per output write and checkpoint.")
+    parser.add_argument("--flush-seconds", type=float, default=10.0, help="Max seconds between writes.")
+    parser.add_argument("--report-seconds", type=float, default=30.0, help="Seconds between throughput logs.")
+    parser.add_argument("--limit", type=int, help="Process at most this many new notes.")
+    parser.add_argument("--checkpoint", help=f"Progress file (default: <output>{CHECKPOINT_SUFFIX}).")
+    parser.add_argument("--stub-model", action="store_true", help="Replay benchmark/scripts instead of Gemini.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    # handler logs every ADK event at INFO; keep the backfill's own progress lines
+    logging.getLogger().setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    # Load ADK before the event loop starts, as the worker does
+    handler.get_agent_stack()
+    with contextlib.ExitStack() as stack:
+        if args.stub_model:
+            from unittest import mock
+            from agents.development_workflow import rate_limiter
+            from agents.development_workflow.agent import root_agent
+            from benchmark.stub_llm import stub_models
+            # Every note replays benchmark/scripts/default.json, without client-side throttling
+            stack.enter_context(stub_models(root_agent, {}))
+            stack.enter_context(mock.patch.object(rate_limiter, "RATE_LIMIT_ENABLED", False))
+        report = asyncio.run(backfill(args.input, args.output, args.concurrency, args.note_field, args.id_field,
+                                      args.batch_rows, args.flush_seconds, args.report_seconds, args.limit,
+                                      args.checkpoint))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import os
+
+# --- Deadline-Aware Execution ---
+# A worker invocation shares one deadline (context.get_remaining_time_in_millis()) across
+# its pipelines. Before each stage a pipeline checks that the stage's budget still fits,
+# leaving DEADLINE_SAFETY_MS to persist state and hand off. A hard timeout at the same
+# margin also stops a model call that overruns its budget. Stage outputs are checkpointed
+# per event, so the job then continues in a fresh invocation (a re-invoke or a new SQS
+# message) from its last finished stage. After MAX_CONTINUATIONS hand-offs, the job is
+# finalized with its best draft so far and 'HUMAN REVIEW NEEDED' instead of being left 'Running'.
+
+DEADLINE_SAFETY_MS = int(os.environ.get("DEADLINE_SAFETY_MS", "15000"))
+MAX_CONTINUATIONS = int(os.environ.get("MAX_CONTINUATIONS", "2"))
+
+# Wall time one stage may need (gemini-2.5-pro call plus tool turns), by ProgressTracker stage
+STAGE_BUDGET_MS = {"extracting": 90_000, "coding": 60_000, "judging": 60_000, "finalizing": 20_000}
+DEFAULT_STAGE_BUDGET_MS = 60_000
+
+
+class DeadlineExceeded(Exception):
+    """Raised by run_pipeline when the next stage does not fit in the invocation's remaining time."""
+
+    def __init__(self, stage: str | None, remaining_ms: int):
+        super().__init__(f"Deadline reached before stage '{stage}' ({remaining_ms} ms left)")
+        self.stage = stage
+        self.remaining_ms = remaining_ms
+
+
+def stage_budget_ms(stage: str | None) -> int:
+    return STAGE_BUDGET_MS.get(stage, DEFAULT_STAGE_BUDGET_MS)
+
+
+def next_stage(checkpoint: dict) -> str | None:
+    """The stage a pipeline resumed from `checkpoint` runs next (None once finalized)."""
+    if checkpoint.get("final_billing_report"):
+        return None
+    if not checkpoint.get("tech_spec"):
+        return "extracting"
+    if checkpoint.get("loop_complete"):
+        return "finalizing"
+    if checkpoint.get("drafted_iteration", 0) > checkpoint.get("reviewed_iteration", 0):
+        return "judging"
+    return "coding"
+
+
+class Deadline:
+    """The invocation's remaining time, less the safety margin reserved for the hand-off."""
+
+    def __init__(self, context, safety_ms: int = DEADLINE_SAFETY_MS):
+        self.context = context
+        self.safety_ms = safety_ms
+
+    @classmethod
+    def from_context(cls, context) -> "Deadline | None":
+        """None when the context has no clock (local runs, tests), which disables the checks."""
+        return cls(context) if callable(getattr(context, "get_remaining_time_in_millis", None)) else None
+
+    def remaining_ms(self) -> int:
+        return int(self.context.get_remaining_time_in_millis())
+
+    def usable_ms(self) -> int:
+        return max(0, self.remaining_ms() - self.safety_ms)
+
+    def allows(self, budget_ms: float) -> bool:
+        return self.usable_ms() >= budget_ms
+
+    def check(self, stage: str | None, extra_ms: float = 0) -> None:
+        """Raises DeadlineExceeded unless `stage` (plus `extra_ms`, e.g. a backoff) still fits."""
+        if stage is not None and not self.allows(stage_budget_ms(stage) + extra_ms):
+            raise DeadlineExceeded(stage, self.remaining_ms())
+
+
+def deadline_record(checkpoint: dict, continuations: int):
+    """Best-effort final result of a job that ran out of continuations: always 'HUMAN REVIEW NEEDED'."""
+    # pydantic is only needed here; the handler's GET/POST path imports this module
+    from pipeline.encounter_schema import AuditResult, EncounterRecord, INSUFFICIENT_DATA
+
+    best = checkpoint.get("best_review") or {}
+    # A real score of 0 is a score; only None means "not reviewed"
+    best_score, current_score = best.get("score"), checkpoint.get("confidence_score")
+    use_best = best_score is not None and (current_score is None or best_score > current_score)
+    draft = (best.get("billing_draft") if use_best else checkpoint.get("billing_draft")) or None
+    score = best_score if use_best else current_score
+    score = 0 if score is None else score
+    feedback = (f"Processing deadline reached after {continuations} continuation(s); "
+                f"best draft so far (score {score}) needs human review.")
+    if draft is not None and not isinstance(draft, dict):
+        # Markdown drafts (STRUCTURED_OUTPUTS off)
+        return "\n".join([
+            "# [FINAL-ENCOUNTER-RECORD] Pediatric Associates", "",
+            f"Final Confidence Score: {score}", "Final Status: HUMAN REVIEW NEEDED", "",
+            "## 2. Billing Summary", str(draft), "", feedback,
+        ])
+    spec = checkpoint.get("tech_spec")
+    audit = AuditResult(
+        review_status=(best.get("review_status") if use_best else checkpoint.get("review_status")),
+        confidence_score=score,
+        final_status="HUMAN REVIEW NEEDED",
+        review_feedback=feedback if draft else f"{feedback} {INSUFFICIENT_DATA}",
+        code_findings=(best.get("code_findings") if use_best else checkpoint.get("code_findings")) or [],
+    )
+    return EncounterRecord(clinical_spec=spec if isinstance(spec, dict) else None, billing_draft=draft,
+                           audit=audit).model_dump(exclude_none=True)
@@ -0,0 +1,146 @@
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field
+
+# --- Typed Stage Outputs ---
+# With STRUCTURED_OUTPUTS on, the extractor and coder answer with these schemas (LlmAgent
+# output_schema) instead of four-backtick markdown. ADK validates each answer and stores it
+# in session state as a plain dict. The finalizer assembles the EncounterRecord locally from
+# state, with no model call. The job item stores it as a native DynamoDB map, so consumers
+# can read result.billing_draft.primary_icd10.code directly. Markdown is rendered from the
+# dicts only where text is still needed: the rule engine's parsers, and GET
+# /status?format=markdown. This module imports nothing but pydantic, so the dispatch path
+# can render without loading the agent stack.
+
+APPROVAL_THRESHOLD = 90
+HUMAN_REVIEW_THRESHOLD = 70
+INSUFFICIENT_DATA = "INSUFFICIENT DATA - MANUAL REVIEW REQUIRED"
+
+
+class Finding(BaseModel):
+    finding: str
+    evidence: str = Field(description="Direct quote from the patient note.")
+
+
+class ClinicalSpec(BaseModel):
+    """The extractor's Clinical Spec."""
+    subject: str = Field(description="Short title of the encounter, e.g. 'Asthma Exacerbation'.")
+    patient_info: str = Field(description="Age/sex and identifiers relevant to coding, e.g. '5-year-old male'.")
+    chief_complaint: str
+    findings: list[Finding] = Field(default_factory=list)
+    laterality: Literal["Right", "Left", "Bilateral", "Not Specified"] = "Not Specified"
+    icd10_ranges: list[str] = Field(default_factory=list, description="Target ICD-10 code families, e.g. 'J45.x'.")
+    cpt_scope: list[str] = Field(default_factory=list, description="CPT codes and the Scenario that applies.")
+    risk_factors: list[str] = Field(default_factory=list, description="Ambiguities the auditor must weigh.")
+    insufficient_data: bool = False
+
+
+class BilledCode(BaseModel):
+    code: str
+    description: str = ""
+
+
+class BillingDraft(BaseModel):
+    """The coder's Billing Draft."""
+    primary_icd10: Optional[BilledCode] = None
+    secondary_icd10: list[BilledCode] = Field(default_factory=list)
+    cpts: list[BilledCode] = Field(default_factory=list)
+    integrity_check: str = ""
+    insufficient_data: bool = Field(False, description="True when the note cannot be coded accurately.")
+
+
+class CodeFinding(BaseModel):
+    """One flagged line item of the billing draft."""
+    code: str
+    rule: str  # e.g. 'laterality', 'bundle', 'age-logic', 'evidence'
+    issue: str
+    penalty: int = 0
+
+
+class AuditResult(BaseModel):
+    review_status: Optional[str] = None  # the judge's last decision
+    confidence_score: float = 0
+    final_status: Literal["APPROVED", "HUMAN REVIEW NEEDED", "REJECTED"]
+    review_feedback: str = ""
+    code_findings: list[CodeFinding] = Field(default_factory=list)
+
+
+class EncounterRecord(BaseModel):
+    """The job's final result: spec, draft and audit in one document."""
+    clinical_spec: Optional[ClinicalSpec] = None
+    billing_draft: Optional[BillingDraft] = None
+    audit: AuditResult
+
+
+def final_status(confidence_score) -> str:
+    score = confidence_score or 0
+    if score >= APPROVAL_THRESHOLD:
+        return "APPROVED"
+    return "HUMAN REVIEW NEEDED" if score >= HUMAN_REVIEW_THRESHOLD else "REJECTED"
+
+
+# --- Markdown Rendering (dicts in, text out) ---
+
+def _code(line: dict) -> str:
+    return f"{line['code']} - {line['description']}" if line.get("description") else line["code"]
+
+
+def render_clinical_spec(spec: dict) -> str:
+    findings = "; ".join(f"{f['finding']} (Evidence: \"{f['evidence']}\")" for f in spec.get("findings") or [])
+    lines = [
+        f"# [RCM-SPEC] Clinical Extraction: {spec.get('subject', '')}",
+        "",
+        f"* **Patient Information:** {spec.get('patient_info', '')}",
+        f"* **Chief Complaint:** {spec.get('chief_complaint', '')}",
+        f"* **Key Clinical Findings:** {findings or 'None.'}",
+        f"* **Laterality Profile:** {spec.get('laterality', 'Not Specified')}",
+        f"* **Target ICD-10 Ranges:** {', '.join(spec.get('icd10_ranges') or []) or 'None'}",
+        f"* **CPT Procedural Scope:** {', '.join(spec.get('cpt_scope') or []) or 'None'}",
+        f"* **Confidence Risk Factors:** {'; '.join(spec.get('risk_factors') or []) or 'None identified.'}",
+    ]
+    if spec.get("insufficient_data"):
+        lines.append("Insufficient Data - Manual Review Required")
+    return "\n".join(lines)
+
+
+def render_billing_draft(draft: dict) -> str:
+    """Same layout as the markdown drafts, so the rule engine's parsers read both."""
+    lines = ["# [BILLING-DRAFT] Encounter Summary"]
+    if draft.get("insufficient_data") or not draft.get("primary_icd10"):
+        return "\n".join(lines + [INSUFFICIENT_DATA])
+    lines.append(f"* **Primary ICD-10:** {_code(draft['primary_icd10'])}")
+    if draft.get("secondary_icd10"):
+        lines.append(f"* **Secondary ICD-10:** {', '.join(_code(c) for c in draft['secondary_icd10'])}")
+    lines.append(f"* **Supporting CPTs:** {', '.join(_code(c) for c in draft.get('cpts') or []) or 'None'}")
+    if draft.get("integrity_check"):
+        lines.append(f"* **Integrity Check:** {draft['integrity_check']}")
+    return "\n".join(lines)
+
+
+def render_encounter_record(record) -> str:
+    """Markdown of a stored result; legacy (already markdown) results are returned as-is."""
+    if not isinstance(record, dict):
+        return str(record)
+    audit = record.get("audit") or {}
+    lines = [
+        "# [FINAL-ENCOUNTER-RECORD] Pediatric Associates",
+        "",
+        f"Final Confidence Score: {audit.get('confidence_score', 0)}",
+        f"Final Status: {audit.get('final_status', final_status(audit.get('confidence_score')))}",
+    ]
+    if record.get("clinical_spec"):
+        lines += ["", "## 1. Clinical Summary", render_clinical_spec(record["clinical_spec"]).split("\n", 2)[2]]
+    draft = render_billing_draft(record.get("billing_draft") or {})
+    lines += ["", "## 2. Billing Summary", draft.split("\n", 1)[1]]
+    lines += ["", "## 3. Audit", f"* **Review Status:** {audit.get('review_status') or 'Not reviewed'}",
+              f"* **Feedback:** {audit.get('review_feedback') or 'None'}"]
+    lines += [f"* Flagged {f['code']} ({f['rule']}, -{f['penalty']}pt): {f['issue']}"
+              for f in audit.get("code_findings") or []]
+    return "\n".join(lines)
+
+
+def as_markdown(value, render) -> str:
+    """A stage output as text: markdown strings pass through, typed (dict) outputs are rendered."""
+    if isinstance(value, dict):
+        return render(value)
+    return str(value or "")
@@ -0,0 +1,244 @@
+"""
+Parquet export of finished jobs for billing analytics.
+
+Runs a segmented parallel Scan of the results table (one thread and one client per
+segment), keeps only finished job items, and normalizes each one into a flat row (job id,
+timestamps, final status, ICD-10 / CPT codes, confidence score, loop iterations, latency).
+Rows are streamed into Parquet files partitioned by completion date
+(<output>/date=YYYY-MM-DD/part-<run>-<segment>-<n>.parquet); the run id keeps an
+incremental run from overwriting the files of earlier runs. Each segment buffers at most
+--batch-rows rows, so memory stays bounded whatever the table size.
+
+Reads are paced to --max-read-units per second across all segments, so the nightly run
+does not throttle the live table. With --incremental, only jobs updated since the
+watermark of the previous run (<output>/_watermark.json) are exported. A job updated
+exactly at the watermark second can appear in two runs; deduplicate on job_id.
+
+Usage:
+    python -m pipeline.export --output ./exports/jobs --segments 8
+    python -m pipeline.export --output s3://analytics-bucket/rcm/jobs --incremental --max-read-units 200
+"""
+import argparse
+import json
+import logging
+import os
+import pathlib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import boto3
+import pyarrow as pa
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+from boto3.dynamodb.types import TypeDeserializer
+
+from pipeline.result_store import ResultStore, summarize
+
+logger = logging.getLogger(__name__)
+
+RESULTS_TABLE = os.environ.get("RESULTS_TABLE", "PediatricRcmResults")
+WATERMARK_FILE = "_watermark.json"
+
+# Only the attributes a row needs; nested metrics paths keep the large per-agent maps out
+PROJECTION = {
+    "#id": "jobId", "#s": "status", "#b": "batchId", "#c": "createdAt", "#u": "updatedAt", "#sum": "summary",
+    "#res": "result", "#m": "metrics", "#tot": "total_ms", "#it": "loop_iterations", "#rt": "retries",
+}
+PROJECTION_EXPRESSION = "#id, #s, #b, #c, #u, #sum, #res, #m.#tot, #m.#it, #m.#rt"
+
+SCHEMA = pa.schema([
+    ("job_id", pa.string()),
+    ("batch_id", pa.string()),
+    ("status", pa.string()),
+    ("final_status", pa.string()),
+    ("created_at", pa.timestamp("s", tz="UTC")),
+    ("updated_at", pa.timestamp("s", tz="UTC")),
+    ("confidence_score", pa.float64()),
+    ("icd10_codes", pa.list_(pa.string())),
+    ("cpt_codes", pa.list_(pa.string())),
+    ("loop_iterations", pa.int32()),
+    ("latency_ms", pa.int64()),
+    ("retries", pa.int32()),
+])
+
+
+def _timestamp(value):
+    return datetime.fromtimestamp(int(value), tz=timezone.utc) if value is not None else None
+
+
+def normalize(item: dict) -> dict:
+    """One export row from a finished job item (deserialized, Decimals allowed)."""
+    # Items written before the compressed result store only carry the markdown 'result'
+    summary = item.get("summary") or (summarize(ResultStore().decode(item)) if "result" in item else {})
+    metrics = item.get("metrics") or {}
+    score = summary.get("score")
+    return {
+        "job_id": item["jobId"],
+        "batch_id": item.get("batchId"),
+        "status": item.get("status"),
+        "final_status": summary.get("finalStatus"),
+        "created_at": _timestamp(item.get("createdAt")),
+        "updated_at": _timestamp(item.get("updatedAt")),
+        "confidence_score": float(score) if score is not None else None,
+        "icd10_codes": list(summary.get("icd10") or []),
+        "cpt_codes": list(summary.get("cpts") or []),
+        "loop_iterations": int(metrics["loop_iterations"]) if "loop_iterations" in metrics else None,
+        "latency_ms": int(metrics["total_ms"]) if "total_ms" in metrics else None,
+        "retries": int(metrics["retries"]) if "retries" in metrics else None,
+    }
+
+
+class ReadPacer:
+    """Keeps consumed read units under `units_per_second` across all segments (0 = unpaced)."""
+
+    def __init__(self, units_per_second: float, clock=time.monotonic, sleep=time.sleep):
+        self.units_per_second = units_per_second
+        self.clock = clock
+        self.sleep = sleep
+        self.started = clock()
+        self.consumed = 0.0
+        self._lock = threading.Lock()
+
+    def consume(self, units: float) -> None:
+        if not self.units_per_second:
+            return
+        with self._lock:
+            self.consumed += units
+            wait = self.consumed / self.units_per_second - (self.clock() - self.started)
+        if wait > 0:
+            self.sleep(wait)
+
+
+class PartitionedParquetSink:
+    """Writes row batches as Parquet files under date=YYYY-MM-DD partitions of `output`."""
+
+    def __init__(self, output: str, run_id: str | None = None):
+        # Unique per run, so files of earlier (incremental) runs in the same partition survive
+        self.run_id = run_id or f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        if "://" in output:
+            self.fs, self.root = pafs.FileSystem.from_uri(output)
+        else:
+            self.fs, self.root = pafs.LocalFileSystem(), str(pathlib.Path(output).resolve())
+        self.root = self.root.rstrip("/")
+        self.files: list[str] = []
+        self._lock = threading.Lock()
+
+    def write(self, segment: int, sequence: int, rows: list[dict]) -> None:
+        partitions: dict[str, list[dict]] = {}
+        for row in rows:
+            day = (row["updated_at"] or row["created_at"])
+            partitions.setdefault(day.strftime("%Y-%m-%d") if day else "unknown", []).append(row)
+        for day, part in partitions.items():
+            directory = f"{self.root}/date={day}"
+            self.fs.create_dir(directory, recursive=True)
+            path = f"{directory}/part-{self.run_id}-{segment:03d}-{sequence:05d}.parquet"
+            pq.write_table(pa.Table.from_pylist(part, schema=SCHEMA), path, filesystem=self.fs, compression="zstd")
+            with self._lock:
+                self.files.append(path)
+
+    def read_watermark(self):
+        try:
+            with self.fs.open_input_stream(f"{self.root}/{WATERMARK_FILE}") as stream:
+                return json.loads(stream.read())["updatedAt"]
+        except (FileNotFoundError, OSError):
+            return None
+
+    def write_watermark(self, updated_at: int) -> None:
+        self.fs.create_dir(self.root, recursive=True)
+        with self.fs.open_output_stream(f"{self.root}/{WATERMARK_FILE}") as stream:
+            stream.write(json.dumps({"updatedAt": updated_at}).encode())
+
+
+def scan_segment(segment: int, total_segments: int, sink: PartitionedParquetSink, pacer: ReadPacer,
+                 since=None, table_name: str = RESULTS_TABLE, page_size: int = 500, batch_rows: int = 10_000,
+                 client=None) -> dict:
+    """Scans one segment and streams its rows to the sink; returns row count and max updatedAt."""
+    client = client or boto3.client("dynamodb")
+    deserialize = TypeDeserializer().deserialize
+    names = {**PROJECTION, "#rtp": "recordType"}
+    values = {":completed": {"S": "Completed"}, ":failed": {"S": "Failed"}}
+    condition = "attribute_not_exists(#rtp) AND #s IN (:completed, :failed)"
+    if since is not None:
+        condition += " AND #u >= :since"
+        values[":since"] = {"N": str(int(since))}
+    request = {
+        "TableName": table_name, "Segment": segment, "TotalSegments": total_segments, "Limit": page_size,
+        "ProjectionExpression": PROJECTION_EXPRESSION, "FilterExpression": condition,
+        "ExpressionAttributeNames": names, "ExpressionAttributeValues": values, "ReturnConsumedCapacity": "TOTAL",
+    }
+
+    rows, sequence, count, watermark = [], 0, 0, None
+    while True:
+        page = client.scan(**request)
+        pacer.consume((page.get("ConsumedCapacity") or {}).get("CapacityUnits", 0))
+        for raw in page.get("Items", []):
+            row = normalize({k: deserialize(v) for k, v in raw.items()})
+            rows.append(row)
+            if row["updated_at"]:
+                stamp = int(row["updated_at"].timestamp())
+                watermark = stamp if watermark is None else max(watermark, stamp)
+        if len(rows) >= batch_rows or ("LastEvaluatedKey" not in page and rows):
+            sink.write(segment, sequence, rows)
+            count, sequence, rows = count + len(rows), sequence + 1, []
+        if "LastEvaluatedKey" not in page:
+            return {"rows": count, "watermark": watermark}
+        request["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+
+
+def export_jobs(output: str, segments: int = 4, since=None, incremental: bool = False, max_read_units: float = 0,
+                table_name: str = RESULTS_TABLE, page_size: int = 500, batch_rows: int = 10_000,
+                client_factory=None) -> dict:
+    sink = PartitionedParquetSink(output)
+    if incremental and since is None:
+        since = sink.read_watermark()
+    pacer = ReadPacer(max_read_units)
+    client_factory = client_factory or (lambda: boto3.client("dynamodb"))
+    started = time.perf_counter()
+
+    segments = max(1, segments)
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        results = list(pool.map(
+            lambda segment: scan_segment(segment, segments, sink, pacer, since, table_name, page_size, batch_rows,
+                                         client_factory()),
+            range(segments),
+        ))
+
+    marks = [r["watermark"] for r in results if r["watermark"] is not None]
+    watermark = max(marks) if marks else since
+    if watermark is not None:
+        sink.write_watermark(watermark)
+    return {
+        "output": output,
+        "segments": segments,
+        "since": since,
+        "watermark": watermark,
+        "rows": sum(r["rows"] for r in results),
+        "files": len(sink.files),
+        "read_units": round(pacer.consumed, 1),
+        "elapsed_s": round(time.perf_counter() - started, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export finished jobs to partitioned Parquet.")
+    parser.add_argument("--output", required=True, help="Local directory or s3://bucket/prefix.")
+    parser.add_argument("--segments", type=int, default=4, help="Parallel scan segments (threads).")
+    parser.add_argument("--since", type=int, help="Only jobs updated at or after this epoch second.")
+    parser.add_argument("--incremental", action="store_true", help="Resume from the output's _watermark.json.")
+    parser.add_argument("--max-read-units", type=float, default=0, help="Read units per second across segments.")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--batch-rows", type=int, default=10_000, help="Rows buffered per segment before a write.")
+    parser.add_argument("--table", default=RESULTS_TABLE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    report = export_jobs(args.output, args.segments, args.since, args.incremental, args.max_read_units,
+                         args.table, args.page_size, args.batch_rows)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
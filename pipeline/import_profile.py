@@ -0,0 +1,64 @@
+"""
+Import-time profile of the Lambda entry point.
+
+Runs `python -X importtime -c "import handler"` in a fresh interpreter and reports the
+total import time, the slowest top-level imports, and any agent-stack module that was loaded.
+The GET and POST dispatch paths must import only boto3, so the exit status is 1 whenever
+ADK, genai, pyarrow or the agent tree show up at import time.
+
+Usage:
+    python -m pipeline.import_profile [--module handler] [--top 15]
+"""
+import argparse
+import json
+import os
+import pathlib
+import subprocess
+import sys
+
+REPO_ROOT = pathlib.Path(__file__).parent.parent.resolve()
+
+# Modules that belong to the worker path only (loaded by handler.get_agent_stack)
+AGENT_STACK_MODULES = ("google.adk", "google.genai", "pyarrow", "agents")
+
+
+def profile_imports(module: str = "handler", top: int = 15) -> dict:
+    env = {**os.environ, "AWS_DEFAULT_REGION": os.environ.get("AWS_DEFAULT_REGION", "us-east-1")}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+
+    # Lines look like: "import time:  self [us] | cumulative | <indent>package"
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((name.rstrip()[1:], int(cumulative)))  # drop the space after "|"
+
+    # Nesting is two spaces per level; depth 1 rows are the module's own imports
+    direct = [(name.strip(), us) for name, us in rows if name.startswith("  ") and not name.startswith("    ")]
+    loaded = {name.strip() for name, _ in rows}
+    return {
+        "module": module,
+        "total_ms": round(next((us for name, us in reversed(rows) if name == module), 0) / 1000, 1),
+        "top_imports_ms": {name: round(us / 1000, 1) for name, us in sorted(direct, key=lambda row: -row[1])[:top]},
+        "agent_stack_modules": sorted(name for name in loaded
+                                      if any(name == m or name.startswith(m + ".") for m in AGENT_STACK_MODULES)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time profile of the Lambda entry point.")
+    parser.add_argument("--module", default="handler")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    report = profile_imports(args.module, args.top)
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report["agent_stack_modules"] else 0)
+
+
+if __name__ == "__main__":
+    main()
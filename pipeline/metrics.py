@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# --- Per-Job Pipeline Instrumentation ---
+# Built from the ADK event stream in run_pipeline. The wall time between two consecutive
+# events is attributed to the author of the later one, so an agent's time covers its model
+# calls and tool executions. Tool time runs from the function_call event to the matching
+# function_response. Token counts come from each event's usage_metadata.
+# The summary is stored as the job item's 'metrics' attribute and emitted as CloudWatch
+# Embedded Metric Format (EMF) lines, one per agent plus one for the whole pipeline.
+# Every tool result is also sized (~4 characters per token): it stays in the agent's
+# context for the rest of the run, so a result over TOOL_RESULT_TOKEN_BUDGET is logged.
+# A model-cascade escalation (fast -> strong tier) is recorded with its reason and
+# iteration; the per-job Escalated 0/1 metric averages to the escalation rate. An early
+# loop stop records its convergence reason. Once the job's sessions are released, the
+# worker's session store footprint (resident sessions and bytes) is recorded as well.
+
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "PediatricRcm")
+TOOL_RESULT_TOKEN_BUDGET = int(os.environ.get("TOOL_RESULT_TOKEN_BUDGET", "2000"))
+CHARS_PER_TOKEN = 4
+LOOP_AGENTS = ("MedicalCoderAgent", "RevenueIntegrityJudge")
+
+
+def _counter() -> dict[str, int]:
+    return {"wall_ms": 0, "events": 0, "model_calls": 0, "prompt_tokens": 0, "candidate_tokens": 0, "tool_calls": 0,
+            "tool_result_tokens": 0}
+
+
+def result_tokens(response) -> int:
+    """Approximate number of context tokens a function_response adds to the conversation."""
+    return len(str(getattr(response, "response", None) or "")) // CHARS_PER_TOKEN
+
+
+class PipelineMetrics:
+    """Accumulates per-agent, per-tool and per-iteration timings for one job."""
+
+    def __init__(self, job_id: str, clock=time.time):
+        self.job_id = job_id
+        self.clock = clock
+        self.started = clock()
+        self.last_event = self.started
+        self.agents: dict[str, dict[str, int]] = {}
+        self.tools: dict[str, dict[str, int]] = {}
+        self.iterations: dict[int, dict[str, int]] = {}
+        self.iteration = 0
+        self.retries = 0
+        self.escalation: dict | None = None
+        self.converged: str | None = None
+        self.session_store: dict[str, int] | None = None
+        self._open_tools: dict[str, tuple[str, float]] = {}
+
+    def restore(self, checkpoint: dict) -> None:
+        """Seeds loop progress and escalation from a checkpoint, for resumed jobs."""
+        self.iteration = checkpoint.get("loop_iteration", 0)
+        self._observe_escalation(checkpoint)
+
+    def _observe_escalation(self, state: dict) -> None:
+        if state.get("loop_converged"):
+            self.converged = state["loop_converged"]
+        if state.get("escalation_reason"):
+            self.escalation = {"reason": state["escalation_reason"],
+                               "iteration": int(state.get("escalated_iteration") or 0)}
+
+    def start_attempt(self, attempt: int) -> None:
+        self.retries = attempt
+        self.last_event = self.clock()
+
+    def record_event(self, event) -> None:
+        now = getattr(event, "timestamp", None) or self.clock()
+        author = getattr(event, "author", None) or "unknown"
+        elapsed_ms = max(0, int((now - self.last_event) * 1000))
+        self.last_event = now
+
+        delta = getattr(getattr(event, "actions", None), "state_delta", None) or {}
+        if delta.get("loop_iteration"):
+            self.iteration = int(delta["loop_iteration"])
+        self._observe_escalation(delta)
+
+        buckets = [self.agents.setdefault(author, _counter())]
+        if author in LOOP_AGENTS and self.iteration:
+            buckets.append(self.iterations.setdefault(self.iteration, _counter()))
+
+        usage = getattr(event, "usage_metadata", None)
+        calls = event.get_function_calls() if hasattr(event, "get_function_calls") else []
+        for bucket in buckets:
+            bucket["wall_ms"] += elapsed_ms
+            bucket["events"] += 1
+            bucket["tool_calls"] += len(calls)
+            if usage:
+                bucket["model_calls"] += 1
+                bucket["prompt_tokens"] += getattr(usage, "prompt_token_count", None) or 0
+                bucket["candidate_tokens"] += getattr(usage, "candidates_token_count", None) or 0
+
+        for call in calls:
+            self._open_tools[call.id or call.name] = (call.name, now)
+        responses = event.get_function_responses() if hasattr(event, "get_function_responses") else []
+        for response in responses:
+            name, called_at = self._open_tools.pop(response.id or response.name, (response.name, now))
+            tokens = result_tokens(response)
+            tool = self.tools.setdefault(name, {"calls": 0, "wall_ms": 0, "result_tokens": 0, "max_result_tokens": 0})
+            tool["calls"] += 1
+            tool["wall_ms"] += max(0, int((now - called_at) * 1000))
+            tool["result_tokens"] += tokens
+            tool["max_result_tokens"] = max(tool["max_result_tokens"], tokens)
+            for bucket in buckets:
+                bucket["tool_result_tokens"] += tokens
+            if tokens > TOOL_RESULT_TOKEN_BUDGET:
+                logger.warning("Job %s: %s result for %s is ~%d tokens (budget %d)",
+                               self.job_id, name, author, tokens, TOOL_RESULT_TOKEN_BUDGET)
+
+    def to_dict(self) -> dict:
+        """Summary stored on the job item; integers only, so DynamoDB accepts it as-is."""
+        agents = self.agents.values()
+        summary = {
+            "total_ms": max(0, int((self.clock() - self.started) * 1000)),
+            "retries": self.retries,
+            "loop_iterations": self.iteration,
+            "prompt_tokens": sum(a["prompt_tokens"] for a in agents),
+            "candidate_tokens": sum(a["candidate_tokens"] for a in agents),
+            "tool_calls": sum(t["calls"] for t in self.tools.values()),
+            "agents": self.agents,
+            "tools": self.tools,
+            "iterations": {str(n): bucket for n, bucket in sorted(self.iterations.items())},
+        }
+        if self.escalation:
+            summary["escalation"] = self.escalation
+        if self.converged:
+            summary["loop_converged"] = self.converged
+        if self.session_store is not None:
+            summary["session_store"] = self.session_store
+        return summary
+
+    def emf_records(self, summary: dict, status: str) -> list[dict]:
+        timestamp = int(self.clock() * 1000)
+
+        def record(dimensions: dict, values: dict, units: dict) -> dict:
+            return {
+                "_aws": {"Timestamp": timestamp, "CloudWatchMetrics": [{
+                    "Namespace": METRICS_NAMESPACE,
+                    "Dimensions": [list(dimensions)],
+                    "Metrics": [{"Name": name, "Unit": units[name]} for name in values],
+                }]},
+                **dimensions, **values, "jobId": self.job_id,
+            }
+
+        agent_units = {"AgentLatency": "Milliseconds", "PromptTokens": "Count", "CandidateTokens": "Count",
+                       "ModelCalls": "Count", "ToolCalls": "Count", "ToolResultTokens": "Count"}
+        records = [
+            record({"Agent": name}, {
+                "AgentLatency": a["wall_ms"], "PromptTokens": a["prompt_tokens"],
+                "CandidateTokens": a["candidate_tokens"], "ModelCalls": a["model_calls"], "ToolCalls": a["tool_calls"],
+                "ToolResultTokens": a["tool_result_tokens"],
+            }, agent_units)
+            for name, a in summary["agents"].items()
+        ]
+        escalation = summary.get("escalation")
+        pipeline_values = {
+            "PipelineLatency": summary["total_ms"], "Retries": summary["retries"],
+            "LoopIterations": summary["loop_iterations"], "PromptTokens": summary["prompt_tokens"],
+            "CandidateTokens": summary["candidate_tokens"], "ToolCalls": summary["tool_calls"],
+            "Escalated": int(bool(escalation)),
+        }
+        pipeline_units = {"PipelineLatency": "Milliseconds", "Retries": "Count", "LoopIterations": "Count",
+                          "PromptTokens": "Count", "CandidateTokens": "Count", "ToolCalls": "Count",
+                          "Escalated": "Count"}
+        if "session_store" in summary:
+            pipeline_values["ResidentSessions"] = summary["session_store"]["resident_sessions"]
+            pipeline_values["ResidentSessionBytes"] = summary["session_store"]["resident_bytes"]
+            pipeline_units.update(ResidentSessions="Count", ResidentSessionBytes="Bytes")
+        records.append(record({"Status": status}, pipeline_values, pipeline_units))
+        if escalation:
+            records.append(record({"EscalationReason": escalation["reason"]}, {"Escalations": 1},
+                                  {"Escalations": "Count"}))
+        return records
+
+    def emit(self, summary: dict, status: str) -> None:
+        # EMF lines must be bare JSON on stdout; the Lambda logger would prefix them
+        for record in self.emf_records(summary, status):
+            print(json.dumps(record), flush=True)
@@ -0,0 +1,41 @@
+# --- Incremental Job Progress ---
+# The worker maps ADK events to a coarse stage and writes it to the job item whenever it
+# changes, bumping the item's monotonically increasing 'version'. GET /status uses the
+# version as its ETag, so pollers get 304s until something actually moved.
+
+STAGE_BY_AGENT = {
+    "ClinicalEntityExtractor": "extracting",
+    "MedicalCoderAgent": "coding",
+    "RevenueIntegrityJudge": "judging",
+    "BillingFinalizer": "finalizing",
+}
+
+
+class ProgressTracker:
+    """Turns the event stream into {stage, iteration, score} updates, emitting only changes."""
+
+    def __init__(self, checkpoint: dict | None = None):
+        checkpoint = checkpoint or {}
+        self.iteration = checkpoint.get("loop_iteration", 0)
+        self.score = checkpoint.get("confidence_score")
+        self.current: dict | None = None
+
+    def observe(self, event) -> dict | None:
+        delta = getattr(getattr(event, "actions", None), "state_delta", None) or {}
+        if delta.get("loop_iteration"):
+            self.iteration = int(delta["loop_iteration"])
+        if delta.get("confidence_score") is not None:
+            self.score = delta["confidence_score"]
+
+        stage = STAGE_BY_AGENT.get(getattr(event, "author", None))
+        if stage is None:
+            return None
+        progress = {"stage": stage}
+        if stage in ("coding", "judging"):
+            progress["iteration"] = self.iteration
+        if self.score is not None:
+            progress["score"] = self.score  # latest judge score, once there is one
+        if progress == self.current:
+            return None
+        self.current = progress
+        return progress
@@ -0,0 +1,134 @@
+import hashlib
+import logging
+import os
+import pathlib
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+# --- Content-Addressed Result Cache ---
+# Identical encounters map to the same cache item in the results table:
+#   key = sha256(whitespace-normalized note) + fingerprint(knowledge base + agent sources)
+# The fingerprint covers billing_codes.md, the code store, every agent module (model names and
+# instructions live there) and the settings that change the output, so any manual, prompt,
+# code-set or configuration change produces new keys.
+
+REPO_ROOT = pathlib.Path(__file__).parent.parent.resolve()
+FINGERPRINT_GLOBS = ("knowledge_base/**/*.md", "knowledge_base/**/*.txt", "knowledge_base/**/*.csv",
+                     "knowledge_base/**/*.arrow", "knowledge_base/**/*.parquet", "agents/**/*.py")
+# Environment settings read by the agents that change what a job returns. Read by name here:
+# the handler's POST path must not import the agents package.
+FINGERPRINT_SETTINGS = ("RESULT_CACHE_VERSION", "STRUCTURED_OUTPUTS", "MODEL_CASCADE_ENABLED",
+                        "CASCADE_FAST_MODEL", "CASCADE_STRONG_MODEL", "PRELOAD_KNOWLEDGE",
+                        "CLINIC_CONTEXT_MAX_CHARS", "BILLING_MANUAL_MAX_CHARS", "LOOP_CONVERGENCE_ENABLED",
+                        "RULE_ENGINE_ENABLED", "CODE_STORE_PATH")
+
+RESULT_CACHE_ENABLED = os.environ.get("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_TTL_SECONDS = int(os.environ.get("RESULT_CACHE_TTL_SECONDS", str(24 * 3600)))
+# An in-flight claim expires after the worker's maximum runtime, so a crashed worker cannot pin it
+INFLIGHT_TTL_SECONDS = int(os.environ.get("RESULT_CACHE_INFLIGHT_TTL_SECONDS", "900"))
+# How often a job whose note is in flight in another job re-reads the entry while it waits
+RESULT_CACHE_POLL_SECONDS = float(os.environ.get("RESULT_CACHE_POLL_SECONDS", "2"))
+CACHE_PREFIX = "cache#"
+
+_fingerprint_lock = threading.Lock()
+_fingerprint_cache: tuple[tuple, str] | None = None
+_source_files_cache: list[pathlib.Path] | None = None
+
+
+def normalize_note(note: str) -> str:
+    return " ".join(note.split())
+
+
+def _source_files() -> list[pathlib.Path]:
+    """The fingerprinted files, globbed once per process (the deployed tree does not change)."""
+    global _source_files_cache
+    if _source_files_cache is None:
+        files = {path for pattern in FINGERPRINT_GLOBS for path in REPO_ROOT.glob(pattern) if path.is_file()}
+        code_store = pathlib.Path(os.environ.get("CODE_STORE_PATH", REPO_ROOT / "knowledge_base" / "code_store.arrow"))
+        if code_store.is_file():
+            files.add(code_store.resolve())
+        _source_files_cache = sorted(files)
+    return _source_files_cache
+
+
+def pipeline_fingerprint() -> str:
+    """
+    Hash of the settings, knowledge base, code store and agent sources; recomputed only
+    when a setting or a file's mtime changes.
+    """
+    global _fingerprint_cache
+    files = _source_files()
+    settings = tuple((name, os.environ.get(name)) for name in FINGERPRINT_SETTINGS)
+    signature = (settings, tuple((str(p), p.stat().st_mtime_ns, p.stat().st_size) for p in files))
+    with _fingerprint_lock:
+        if _fingerprint_cache and _fingerprint_cache[0] == signature:
+            return _fingerprint_cache[1]
+        digest = hashlib.sha256(repr(settings).encode())
+        for path in files:
+            name = path.relative_to(REPO_ROOT) if path.is_relative_to(REPO_ROOT) else path.name
+            digest.update(str(name).encode())
+            digest.update(path.read_bytes())
+        _fingerprint_cache = (signature, digest.hexdigest())
+        return _fingerprint_cache[1]
+
+
+def cache_key(note: str) -> str:
+    note_hash = hashlib.sha256(normalize_note(note).encode()).hexdigest()
+    return hashlib.sha256(f"{note_hash}:{pipeline_fingerprint()}".encode()).hexdigest()
+
+
+class ResultCache:
+    """Single-flight result cache stored as 'cache#<key>' items in the results table."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def get(self, key: str) -> dict | None:
+        """Returns the live (unexpired) cache entry for `key`, if any."""
+        item = self.table.get_item(Key={"jobId": CACHE_PREFIX + key}).get("Item")
+        if not item or int(item.get("expiresAt", 0)) <= int(time.time()):
+            return None
+        return item
+
+    def claim(self, key: str, job_id: str) -> dict | None:
+        """
+        Registers `job_id` as the in-flight owner of `key`.
+        Returns None when claimed, or the existing live entry (in-flight or completed) otherwise.
+        """
+        now = int(time.time())
+        try:
+            self.table.put_item(
+                Item={"jobId": CACHE_PREFIX + key, "recordType": "cache", "status": "Running",
+                      "ownerJobId": job_id, "expiresAt": now + INFLIGHT_TTL_SECONDS},
+                ConditionExpression="attribute_not_exists(jobId) OR expiresAt <= :now",
+                ExpressionAttributeValues={":now": now},
+            )
+            return None
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+        return self.get(key)
+
+    def complete(self, key: str, job_id: str, stored: dict) -> None:
+        """Stores the owner job's result attributes (see ResultStore.encode) under the cache key."""
+        self.table.put_item(Item={
+            "jobId": CACHE_PREFIX + key, "recordType": "cache", "status": "Completed", "ownerJobId": job_id,
+            "expiresAt": int(time.time()) + RESULT_CACHE_TTL_SECONDS, **stored,
+        })
+
+    def release(self, key: str, job_id: str) -> None:
+        """Drops an in-flight claim after a failure so the next submission runs again."""
+        try:
+            self.table.delete_item(
+                Key={"jobId": CACHE_PREFIX + key},
+                ConditionExpression="ownerJobId = :j AND #s = :running",
+                ExpressionAttributeNames={"#s": "status"},
+                ExpressionAttributeValues={":j": job_id, ":running": "Running"},
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
@@ -0,0 +1,109 @@
+import decimal
+import gzip
+import json
+import logging
+import os
+import re
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# --- Compressed Result Storage ---
+# A job's result (the encounter record, or a markdown report) is stored as one compressed
+# JSON body instead of a raw 'result' attribute. Bodies up to RESULT_INLINE_MAX_BYTES
+# compressed stay on the item as a Binary 'resultBody'. Larger ones are written gzipped to
+# RESULT_BUCKET and referenced by 'resultRef', so an item stays well under DynamoDB's
+# 400 KB limit and costs a predictable number of write units. The hot fields (final status,
+# score, billed codes) are kept inline in a small 'summary' map for cheap projection reads.
+# GET rehydrates the body. Items written before this change keep their plain 'result'
+# attribute, and decode() still reads them. Error text is capped at ERROR_MAX_CHARS.
+
+RESULT_BUCKET = os.environ.get("RESULT_BUCKET")
+RESULT_INLINE_MAX_BYTES = int(os.environ.get("RESULT_INLINE_MAX_BYTES", str(32 * 1024)))
+RESULT_PREFIX = os.environ.get("RESULT_PREFIX", "results/")
+ERROR_MAX_CHARS = int(os.environ.get("ERROR_MAX_CHARS", "1000"))
+ENCODING = "zlib+json"
+
+# Where a result body can live (legacy 'result' first), and what GET reads to rehydrate it
+BODY_FIELDS = ("result", "resultBody", "resultRef")
+STORAGE_FIELDS = BODY_FIELDS + ("summary",)
+
+SCORE_PATTERN = re.compile(r"Final Confidence Score:\W*(\d+(?:\.\d+)?)")
+STATUS_PATTERN = re.compile(r"Final Status:\W*(APPROVED|HUMAN REVIEW NEEDED|REJECTED)", re.IGNORECASE)
+ICD10_PATTERN = re.compile(r"\b[A-Z]\d{2}\.[0-9A-Z]{1,4}\b")
+CPT_LINE_PATTERN = re.compile(r"Supporting CPTs?:\**(.*)", re.IGNORECASE)
+CPT_PATTERN = re.compile(r"\b\d{5}\b")
+
+
+def _plain(value):
+    """json.dumps default for the DynamoDB Decimals of results served from the cache."""
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def summarize(result) -> dict:
+    """Final status, score and billed codes of a result, for inline projection reads."""
+    if isinstance(result, dict):
+        audit = result.get("audit") or {}
+        draft = result.get("billing_draft") or {}
+        primary = [draft["primary_icd10"]] if draft.get("primary_icd10") else []
+        summary = {
+            "finalStatus": audit.get("final_status"),
+            "score": audit.get("confidence_score"),
+            "icd10": [c["code"] for c in primary + (draft.get("secondary_icd10") or [])],
+            "cpts": [c["code"] for c in draft.get("cpts") or []],
+        }
+    else:
+        # Markdown reports (STRUCTURED_OUTPUTS off, or items written before typed outputs)
+        text = str(result)
+        status, score, cpt_line = STATUS_PATTERN.search(text), SCORE_PATTERN.search(text), CPT_LINE_PATTERN.search(text)
+        summary = {"finalStatus": status.group(1).upper() if status else None,
+                   "score": float(score.group(1)) if score else None,
+                   "icd10": list(dict.fromkeys(ICD10_PATTERN.findall(text))),
+                   "cpts": list(dict.fromkeys(CPT_PATTERN.findall(cpt_line.group(1)))) if cpt_line else []}
+    return {k: v for k, v in summary.items() if v is not None}
+
+
+def truncate_error(error, limit: int = ERROR_MAX_CHARS) -> str:
+    text = str(error)
+    return text if len(text) <= limit else f"{text[:limit]}... [truncated {len(text) - limit} chars]"
+
+
+class ResultStore:
+    """Encodes results into compact item attributes and rehydrates them, offloading large bodies to S3."""
+
+    def __init__(self, s3_client=None, bucket: str | None = RESULT_BUCKET,
+                 inline_max_bytes: int = RESULT_INLINE_MAX_BYTES):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.inline_max_bytes = inline_max_bytes
+
+    def encode(self, job_id: str, result) -> dict:
+        """The item attributes that store `result`; large bodies are uploaded to S3 first."""
+        body = json.dumps(result, default=_plain, separators=(",", ":")).encode()
+        compressed = zlib.compress(body, 6)
+        # DynamoDB rejects floats (e.g. a judge score); store the summary's numbers as Decimals
+        summary = json.loads(json.dumps(summarize(json.loads(body))), parse_float=decimal.Decimal)
+        attributes = {"resultEncoding": ENCODING, "summary": summary,
+                      "resultBytes": len(body), "resultStoredBytes": len(compressed)}
+        if len(compressed) <= self.inline_max_bytes or not (self.s3 and self.bucket):
+            if len(compressed) > self.inline_max_bytes:
+                logger.warning(f"RESULT STORE: {len(compressed)} byte result of {job_id} kept inline (no RESULT_BUCKET).")
+            attributes["resultBody"] = compressed
+            return attributes
+        key = f"{RESULT_PREFIX}{job_id}.json.gz"
+        self.s3.put_object(Bucket=self.bucket, Key=key, Body=gzip.compress(body, 6),
+                           ContentType="application/json", ContentEncoding="gzip")
+        attributes["resultRef"] = f"s3://{self.bucket}/{key}"
+        return attributes
+
+    def decode(self, item: dict):
+        """The result stored on `item`: inline body, S3 object or legacy 'result' attribute."""
+        if item.get("resultBody") is not None:
+            body = item["resultBody"]
+            return json.loads(zlib.decompress(getattr(body, "value", body)))
+        if item.get("resultRef"):
+            bucket, _, key = item["resultRef"].removeprefix("s3://").partition("/")
+            return json.loads(gzip.decompress(self.s3.get_object(Bucket=bucket, Key=key)["Body"].read()))
+        return item.get("result")
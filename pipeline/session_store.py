@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from google.adk.sessions import InMemorySessionService
+
+logger = logging.getLogger(__name__)
+
+# --- Bounded In-Memory Session Store ---
+# InMemorySessionService keeps every session, with its full event history, for the life
+# of the container. A warm worker serving many invocations therefore grows without bound
+# whenever a session is not deleted (a timed-out or cancelled pipeline). This store caps
+# the number of resident sessions (least recently updated are evicted first) and evicts
+# sessions idle for longer than max_age_seconds. A session whose run is still in progress
+# (created and not yet deleted or released) is never evicted for capacity: the cap is then
+# exceeded with a warning, and workers raise it to their concurrency (ensure_capacity). It also tracks an approximate byte size
+# per session, so each job's metrics can report the store's footprint.
+
+SESSION_STORE_MAX_SESSIONS = int(os.environ.get("SESSION_STORE_MAX_SESSIONS", "64"))
+SESSION_STORE_MAX_AGE_SECONDS = float(os.environ.get("SESSION_STORE_MAX_AGE_SECONDS", "900"))
+
+
+def _size(value) -> int:
+    return len(json.dumps(value, default=str))
+
+
+class BoundedSessionService(InMemorySessionService):
+    """InMemorySessionService with capacity- and age-based eviction and size accounting."""
+
+    def __init__(self, max_sessions: int = SESSION_STORE_MAX_SESSIONS,
+                 max_age_seconds: float = SESSION_STORE_MAX_AGE_SECONDS, clock=time.time):
+        super().__init__()
+        self.max_sessions = max(1, max_sessions)
+        self.max_age_seconds = max_age_seconds
+        self.clock = clock
+        self.evicted = 0
+        # (app_name, user_id, session_id) -> (last update time, approximate bytes), oldest first
+        self._resident: OrderedDict[tuple[str, str, str], tuple[float, int]] = OrderedDict()
+        # Sessions a pipeline is running in, between create_session and delete_session / release
+        self._active: set[tuple[str, str, str]] = set()
+
+    def ensure_capacity(self, sessions: int) -> None:
+        """Raises the cap so `sessions` concurrent runs fit without evicting each other."""
+        self.max_sessions = max(self.max_sessions, sessions)
+
+    async def create_session(self, *, app_name, user_id, state=None, session_id=None):
+        self.evict(reserve=1)
+        session = await super().create_session(app_name=app_name, user_id=user_id, state=state,
+                                               session_id=session_id)
+        self._resident[(app_name, user_id, session.id)] = (self.clock(), _size(state or {}))
+        self._active.add((app_name, user_id, session.id))
+        return session
+
+    async def append_event(self, session, event):
+        event = await super().append_event(session=session, event=event)
+        key = (session.app_name, session.user_id, session.id)
+        if key in self._resident and not event.partial:
+            _, size = self._resident.pop(key)
+            self._resident[key] = (self.clock(), size + len(event.model_dump_json(exclude_none=True)))
+        return event
+
+    async def delete_session(self, *, app_name, user_id, session_id):
+        await super().delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        self._resident.pop((app_name, user_id, session_id), None)
+        self._active.discard((app_name, user_id, session_id))
+
+    def _drop(self, key: tuple[str, str, str]) -> None:
+        app_name, user_id, session_id = key
+        self._delete_session_impl(app_name=app_name, user_id=user_id, session_id=session_id)
+        self._resident.pop(key, None)
+        self._active.discard(key)
+
+    def evict(self, reserve: int = 0) -> int:
+        """
+        Drops idle sessions (abandoned runs included), then the least recently updated ones
+        without a run in progress until `reserve` slots are free.
+        """
+        now = self.clock()
+        expired = [key for key, (updated, _) in self._resident.items() if now - updated > self.max_age_seconds]
+        while len(self._resident) - len(expired) + reserve > self.max_sessions:
+            key = next((key for key in self._resident if key not in expired and key not in self._active), None)
+            if key is None:
+                logger.warning(f"SESSION STORE: {len(self._active)} run(s) in progress exceed the cap of "
+                               f"{self.max_sessions} sessions; none evicted.")
+                break
+            expired.append(key)
+        for key in expired:
+            self._drop(key)
+        if expired:
+            self.evicted += len(expired)
+            logger.warning(f"SESSION STORE: evicted {len(expired)} session(s); {len(self._resident)} resident.")
+        return len(expired)
+
+    def release(self, session_prefix: str) -> int:
+        """Explicit cleanup once a job is terminal: drops every session whose id starts with the prefix."""
+        keys = [key for key in self._resident if key[2].startswith(session_prefix)]
+        for key in keys:
+            self._drop(key)
+        return len(keys)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "resident_sessions": len(self._resident),
+            "resident_bytes": sum(size for _, size in self._resident.values()),
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,81 @@
+import asyncio
+import json
+import os
+import sys
+from unittest import mock
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Add parent directory to path so we can import the pipeline package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# handler (imported by the backfill) builds its boto3 clients at import. The handler and
+# benchmark suites reuse those clients under mock_aws, which only intercepts them when moto
+# was imported first, so this suite must not be the first to import handler without it.
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+import moto  # noqa: F401
+
+from agents.development_workflow import rate_limiter
+from agents.development_workflow.agent import root_agent
+from benchmark.stub_llm import stub_models
+from pipeline.backfill import backfill, read_notes
+
+NOTES = [f"{age}-year-old with left ear pain and fever for two days." for age in range(1, 8)]
+
+
+def run(*args, **kwargs):
+    with stub_models(root_agent, {}), mock.patch.object(rate_limiter, "RATE_LIMIT_ENABLED", False):
+        return asyncio.run(backfill(*args, **kwargs))
+
+
+def test_backfill_resumes_without_duplicates(tmp_path):
+    source = tmp_path / "notes.jsonl"
+    source.write_text("\n".join(json.dumps({"id": f"enc-{i}", "note": note}) for i, note in enumerate(NOTES)) + "\n")
+    output = str(tmp_path / "results.jsonl")
+
+    first = run(str(source), output, concurrency=3, batch_rows=2, limit=4)
+    assert first["processed"] == 4 and first["next"] == 4
+    # A crash after a write but before its checkpoint leaves rows the resume must drop
+    with open(output, "a") as partial:
+        partial.write('{"id": "enc-4", "status": "Completed"')
+
+    second = run(str(source), output, concurrency=3, batch_rows=2)
+    assert second["resumed_from"] == 4 and second["processed"] == 3
+    assert second["totals"] == {"Completed": 7, "Failed": 0}
+
+    rows = [json.loads(line) for line in open(output)]
+    assert sorted(row["id"] for row in rows) == [f"enc-{i}" for i in range(7)]
+    row = rows[0]
+    assert row["status"] == "Completed" and row["final_status"] and row["icd10_codes"]
+    assert isinstance(row["result"], dict) and row["latency_ms"] >= 0
+
+    # Nothing left to do
+    assert run(str(source), output, concurrency=3)["processed"] == 0
+
+
+def test_parquet_input_streams_to_parquet_parts(tmp_path):
+    source = tmp_path / "notes.parquet"
+    pq.write_table(pa.table({"encounter_id": [f"e{i}" for i in range(5)], "note": NOTES[:5]}), source,
+                   row_group_size=2)
+    assert [o for o, _, _ in read_notes(str(source), start=3)] == [3, 4]
+
+    output = str(tmp_path / "results")
+    report = run(str(source), output, concurrency=2, id_field="encounter_id", batch_rows=2)
+    assert report["processed"] == 5
+    table = pq.read_table(output)
+    assert sorted(table.column("id").to_pylist()) == [f"e{i}" for i in range(5)]
+    assert set(table.column("status").to_pylist()) == {"Completed"}
+    assert json.loads(table.column("result")[0].as_py())["audit"]["final_status"]
+
+
+if __name__ == "__main__":
+    import pathlib
+    import tempfile
+    with tempfile.TemporaryDirectory() as directory:
+        test_backfill_resumes_without_duplicates(pathlib.Path(directory))
+    with tempfile.TemporaryDirectory() as directory:
+        test_parquet_input_streams_to_parquet_parts(pathlib.Path(directory))
+    print("Backfill checks passed.")
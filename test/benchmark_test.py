@@ -0,0 +1,32 @@
+import os
+import sys
+
+# Add parent directory to path so we can import the benchmark package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmark.run_benchmark import load_scenarios, percentile, run_benchmark
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert (percentile(values, 50), percentile(values, 95), percentile(values, 99)) == (50, 95, 99)
+    assert percentile([7], 99) == 7 and percentile([], 50) == 0.0
+
+
+def test_benchmark_replays_every_scenario_offline():
+    scenarios = load_scenarios()
+    report = run_benchmark(scenarios, concurrency_levels=[2], jobs=2 * len(scenarios))
+
+    assert report["scenarios"] == [name for name, _ in scenarios]
+    level = report["levels"][0]
+    assert level["completed"] == level["jobs"] == 2 * len(scenarios)
+    assert level["latency_ms"]["p50"] <= level["latency_ms"]["p95"] <= level["latency_ms"]["p99"]
+    assert {"ClinicalEntityExtractor", "MedicalCoderAgent", "BillingFinalizer"} <= set(level["stages"])
+    # The insufficient-data script never gets approved and resubmits the same draft,
+    # so its loop stops on convergence after the second pass instead of spending all 5
+    assert level["loop_iterations"]["max"] == 2
+    assert level["loop_iterations"]["converged"] == {"same_draft": 2}
+    # ...and its rejected fast-tier draft escalates the job to the strong tier
+    assert level["escalations"]["reasons"] == {"low_confidence": 2}
+    assert level["memory"]["max_rss_kb"] > 0
+    assert report["tools"]["lookup_code"]["calls"] > 0
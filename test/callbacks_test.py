@@ -0,0 +1,111 @@
+import os
+import sys
+from types import SimpleNamespace
+
+# Add parent directory to path so we can import the agents package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from google.adk.events.event_actions import EventActions
+
+from agents.development_workflow.callbacks import (
+    MAX_LOOP_ITERATIONS,
+    record_draft_iteration,
+    skip_extraction_if_checkpointed,
+    skip_review_if_checkpointed,
+    start_coding_iteration,
+)
+from agents.development_workflow.subagents.revenue_integrity_judge.tools import set_review_status_and_exit_if_approved
+
+
+def context(**state):
+    return SimpleNamespace(state=dict(state), _event_actions=EventActions())
+
+
+def test_fresh_run_counts_coder_iterations():
+    ctx = context()
+    assert skip_extraction_if_checkpointed(ctx) is None
+    assert start_coding_iteration(ctx) is None
+    assert ctx.state["loop_iteration"] == 1
+    assert skip_review_if_checkpointed(ctx) is None
+
+
+def test_resume_skips_finished_stages():
+    assert skip_extraction_if_checkpointed(context(tech_spec="# [RCM-SPEC]")) is not None
+
+    # Draft produced but not yet audited: keep it and go straight to the judge
+    ctx = context(loop_iteration=2, drafted_iteration=2, reviewed_iteration=1)
+    assert start_coding_iteration(ctx) is not None
+    assert ctx.state["loop_iteration"] == 2 and not ctx._event_actions.escalate
+
+    # Coder interrupted mid-iteration: redo the same iteration
+    ctx = context(loop_iteration=2, drafted_iteration=1, reviewed_iteration=1)
+    assert start_coding_iteration(ctx) is None and ctx.state["loop_iteration"] == 2
+
+    # Audit already recorded for this iteration
+    ctx = context(loop_iteration=2, reviewed_iteration=2, review_status="APPROVED")
+    assert skip_review_if_checkpointed(ctx) is not None and ctx._event_actions.escalate
+
+
+def test_loop_ends_once_approved_or_out_of_budget():
+    ctx = context(loop_iteration=1, drafted_iteration=1, reviewed_iteration=1, review_status="APPROVED")
+    assert start_coding_iteration(ctx) is not None and ctx._event_actions.escalate
+
+    n = MAX_LOOP_ITERATIONS
+    ctx = context(loop_iteration=n, drafted_iteration=n, reviewed_iteration=n, review_status="NEEDS_REVISION")
+    assert start_coding_iteration(ctx) is not None and ctx._event_actions.escalate
+    assert ctx.state["loop_iteration"] == n
+
+
+def review(ctx, draft, score, findings=()):
+    ctx.state["billing_draft"] = draft
+    ctx.state["drafted_iteration"] = ctx.state["loop_iteration"]
+    tool_context = SimpleNamespace(state=ctx.state, actions=ctx._event_actions)
+    set_review_status_and_exit_if_approved("NEEDS_REVISION", score, "see findings", tool_context,
+                                           code_findings=list(findings))
+
+
+def test_review_carries_per_code_findings_for_a_targeted_revision():
+    ctx = context()
+    start_coding_iteration(ctx)
+    review(ctx, "draft A", 70, [{"code": "H66.001", "rule": "laterality", "issue": "note says left", "penalty": 20}])
+    assert ctx.state["code_findings"] == [{"code": "H66.001", "rule": "laterality", "issue": "note says left",
+                                           "penalty": 20}]
+    assert ctx.state["revision_request"] == "- H66.001 (laterality, -20pt): note says left"
+    assert ctx.state["iteration_scores"] == {"1": 70}
+
+
+def test_loop_stops_when_the_score_stops_improving_and_keeps_the_best_draft():
+    ctx = context()
+    start_coding_iteration(ctx)
+    review(ctx, "draft A", 70)
+    assert start_coding_iteration(ctx) is None
+    review(ctx, "draft B", 55)
+
+    assert start_coding_iteration(ctx) is not None and ctx._event_actions.escalate
+    assert ctx.state["loop_converged"] == "score_regressed" and ctx.state["loop_iteration"] == 2
+    assert ctx.state["billing_draft"] == "draft A" and ctx.state["confidence_score"] == 70
+
+    # A resumed run does not start another pass
+    resumed = context(**ctx.state)
+    assert start_coding_iteration(resumed) is not None and resumed._event_actions.escalate
+
+
+def test_loop_stops_when_the_coder_repeats_its_draft():
+    ctx = context()
+    start_coding_iteration(ctx)
+    review(ctx, "# [BILLING-DRAFT]\n* J45.51", 70)
+    record_draft_iteration(ctx)
+    start_coding_iteration(ctx)
+    ctx.state["billing_draft"] = "# [billing-draft]  \n* J45.51 "
+    assert record_draft_iteration(ctx) is not None and ctx._event_actions.escalate
+    assert ctx.state["loop_converged"] == "same_draft"
+
+
+if __name__ == "__main__":
+    test_fresh_run_counts_coder_iterations()
+    test_resume_skips_finished_stages()
+    test_loop_ends_once_approved_or_out_of_budget()
+    test_review_carries_per_code_findings_for_a_targeted_revision()
+    test_loop_stops_when_the_score_stops_improving_and_keeps_the_best_draft()
+    test_loop_stops_when_the_coder_repeats_its_draft()
+    print("All checkpoint callback checks passed.")
@@ -0,0 +1,69 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+# Add parent directory to path so we can import the agents package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from google.adk.utils.instructions_utils import inject_session_state
+
+from agents.development_workflow.clinic_context import (
+    build_digest,
+    get_clinic_context,
+    get_digest,
+    preload_knowledge_state,
+)
+from agents.development_workflow.common_tools import onboard_project
+from agents.development_workflow.subagents.clinical_entity_extractor.agent import clinical_entity_extractor_agent
+from agents.development_workflow.subagents.medical_coder.agent import medical_coder_agent
+
+
+def test_onboard_project_returns_the_bounded_digest():
+    context = onboard_project()
+    assert context == get_clinic_context()
+    assert "Pediatric Associates" in context and "knowledge_base/billing_codes.md" in context
+    assert "<!--" not in context
+    assert len(context) <= 4000
+
+
+def test_digest_strips_comments_and_cuts_on_line_boundaries():
+    content = "# Title\n<!-- maintainer note -->\n\n- first rule\n\n- second rule that does not fit\n"
+    digest = build_digest(content, max_chars=30, source="knowledge_base/clinic_context.md")
+    # A partial copy says so, so the agents keep searching for what it does not show
+    assert digest.startswith("# Title\n- first rule\n[TRUNCATED: 1 more line(s) of knowledge_base/clinic_context.md")
+    assert build_digest(content, max_chars=100) == "# Title\n- first rule\n- second rule that does not fit"
+
+
+def test_digest_is_rebuilt_when_the_source_changes(tmp_path):
+    source = tmp_path / "clinic_context.md"
+    source.write_text("- rule one\n")
+    assert get_digest(source, 100) == "- rule one"
+    assert get_digest(source, 100) is get_digest(source, 100)
+
+    source.write_text("- rule one\n- rule two\n")
+    assert get_digest(source, 100) == "- rule one\n- rule two"
+
+
+def render(instruction: str, state: dict) -> str:
+    context = SimpleNamespace(_invocation_context=SimpleNamespace(session=SimpleNamespace(state=state)))
+    return asyncio.run(inject_session_state(instruction, context))
+
+
+def test_preloaded_knowledge_is_rendered_into_the_instructions():
+    state = preload_knowledge_state()
+    assert state["clinic_context"] == get_clinic_context()
+    assert "J45.51" in state["billing_manual"] and "Scenario 4" in state["billing_manual"]
+    assert "[TRUNCATED" not in state["billing_manual"]
+
+    for agent in (clinical_entity_extractor_agent, medical_coder_agent):
+        assert "Scenario 4: Well-Child Visit" in render(agent.instruction, state)
+        # Without preloaded state the instructions fall back to the tool-driven flow
+        assert "Scenario 4: Well-Child Visit" not in render(agent.instruction, {})
+
+
+if __name__ == "__main__":
+    test_onboard_project_returns_the_bounded_digest()
+    test_digest_strips_comments_and_cuts_on_line_boundaries()
+    test_preloaded_knowledge_is_rendered_into_the_instructions()
+    print("All clinic context checks passed.")
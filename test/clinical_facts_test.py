@@ -0,0 +1,102 @@
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+from google.genai import types
+
+# Add parent directory to path so we can import the agents package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.development_workflow.clinical_facts import extract_clinical_facts, preextract_clinical_facts
+
+WELL_CHILD_NOTE = (
+    "Well-child visit. DOB: 03/21/2019. Date of Service: 2024-03-21. "
+    "Right ear TM clear. Hearing screen normal."
+)
+
+
+def test_age_is_computed_from_dob_and_dos_with_evidence():
+    facts = extract_clinical_facts(WELL_CHILD_NOTE)
+    assert (facts.age_years, facts.age_source) == (5, "dob_dos")
+    assert (facts.date_of_birth, facts.date_of_service) == ("2019-03-21", "2024-03-21")
+    # Exactly five years old falls in the 5-11 band
+    assert facts.preventive_cpt == "99393"
+
+    quotes = [e.quote for e in facts.evidence if e.fact == "age"]
+    assert quotes == ["DOB: 03/21/2019", "Date of Service: 2024-03-21"]
+    for e in facts.evidence:
+        assert WELL_CHILD_NOTE[e.start:e.end] == e.quote
+
+    # One day before the birthday the patient is still four
+    assert extract_clinical_facts("DOB 03/21/2019, DOS 03/20/2024").preventive_cpt == "99392"
+    assert extract_clinical_facts("18-month-old with fever").age_years == 0
+
+
+def test_durations_are_not_stated_ages():
+    facts = extract_clinical_facts("Patient has a 2 yr history of asthma.")
+    assert (facts.age_years, facts.age_source) == (None, None)
+    assert extract_clinical_facts("Symptoms for 3 yrs, onset age 4 years ago.").age_years is None
+    assert extract_clinical_facts("2 yr history of wheeze in an 8 y/o").age_years == 8
+    for note, age in (("4 yr old", 4), ("6yo", 6), ("Age: 9", 9), ("aged 10", 10)):
+        assert extract_clinical_facts(note).age_years == age
+
+
+def test_laterality_and_procedures():
+    facts = extract_clinical_facts("7 yo. Left ear bulging TM. Rapid strep negative, nebulizer given.")
+    assert facts.age_years == 7 and facts.laterality == "left"
+    assert facts.procedures == ("nebulizer", "strep_test")
+    assert {e.fact: e.quote for e in facts.evidence}["laterality"] == "Left ear"
+
+    assert extract_clinical_facts("Right ear and left ear both red").laterality == "bilateral"
+    # A side mentioned only as normal has no findings, so it does not make the note bilateral
+    facts = extract_clinical_facts("Right TM normal. Left TM red and bulging. Acute otitis media, left ear.")
+    assert (facts.laterality, facts.laterality_ambiguous) == ("left", True)
+    assert "Left (unverified" in facts.render()
+    assert extract_clinical_facts("Bilateral TMs clear, no effusion.").laterality is None
+    assert extract_clinical_facts("Cough for three days.") == extract_clinical_facts("Cough for three days.")
+    assert extract_clinical_facts("Cough for three days.").laterality is None
+
+
+def test_negated_and_unadministered_procedures_are_not_facts():
+    facts = extract_clinical_facts("Wheezing resolved. No nebulizer needed today.")
+    assert facts.procedures == () and facts.unconfirmed_procedures == ()
+    assert extract_clinical_facts("Nebulizer declined by parent.").procedures == ()
+    assert extract_clinical_facts("Rapid strep not performed.").procedures == ()
+
+    # The patient's own device, or a bare mention, is only a hint
+    facts = extract_clinical_facts("Mild wheeze; continue home nebulizer twice daily.")
+    assert facts.procedures == () and facts.unconfirmed_procedures == ("nebulizer",)
+    assert "Procedures Documented:** None" in facts.render() and "unverified: not documented" in facts.render()
+    assert extract_clinical_facts("Discussed nebulizer use.").unconfirmed_procedures == ("nebulizer",)
+
+    # One administered mention is enough, and "no" after the procedure does not negate it
+    facts = extract_clinical_facts("Uses home nebulizer. Albuterol nebulizer given in clinic with no further retractions.")
+    assert facts.procedures == ("nebulizer",) and facts.unconfirmed_procedures == ()
+
+
+def test_facts_are_written_to_state_before_extraction():
+    ctx = SimpleNamespace(state={}, user_content=types.Content(role="user", parts=[types.Part(text=WELL_CHILD_NOTE)]))
+    assert preextract_clinical_facts(ctx) is None
+    rendered = ctx.state["clinical_facts"]
+    assert "5 years (DOB 2019-03-21, DOS 2024-03-21)" in rendered
+    # "Right ear TM clear" is a normal finding, not a laterality
+    assert "99393" in rendered and "* **Laterality:** Not Specified" in rendered
+
+
+def test_thousands_of_notes_per_second():
+    notes = [f"{WELL_CHILD_NOTE} Visit #{i}. Administered nebulizer treatment." for i in range(2000)]
+    started = time.perf_counter()
+    for note in notes:
+        extract_clinical_facts(note)
+    assert time.perf_counter() - started < 2.0
+
+
+if __name__ == "__main__":
+    test_age_is_computed_from_dob_and_dos_with_evidence()
+    test_durations_are_not_stated_ages()
+    test_laterality_and_procedures()
+    test_negated_and_unadministered_procedures_are_not_facts()
+    test_facts_are_written_to_state_before_extraction()
+    test_thousands_of_notes_per_second()
+    print("All clinical facts checks passed.")
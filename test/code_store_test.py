@@ -0,0 +1,43 @@
+import os
+import sys
+
+# Add parent directory to path so we can import the agents package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.development_workflow.code_store import build_table, open_store, write_store
+
+
+def test_store_round_trips_through_memory_mapped_file(tmp_path):
+    icd10 = tmp_path / 'icd10cm_codes.txt'
+    icd10.write_text(
+        "H66001  Acute suppurative otitis media without spontaneous rupture of ear drum, right ear\n"
+        "H66002  Acute suppurative otitis media without spontaneous rupture of ear drum, left ear\n"
+        "J069    Acute upper respiratory infection, unspecified\n"
+    )
+    cpt = tmp_path / 'cpt_fee_schedule.csv'
+    cpt.write_text("code,description,fee\n94640,Pressurized or nonpressurized inhalation treatment,$25.10\n")
+
+    store_path = tmp_path / 'code_store.arrow'
+    write_store(build_table(icd10_path=icd10, cpt_path=cpt), store_path)
+    store = open_store(store_path)
+
+    # Full-set rows override the manual's descriptions; manual-only codes are kept
+    assert store.lookup('H66001')['description'].endswith('right ear')
+    assert store.lookup('j06.9')['code'] == 'J06.9'
+    assert store.lookup('Z00.129') is not None
+
+    assert [r['code'] for r in store.search('H66.00*')] == ['H66.001', 'H66.002', 'H66.003']
+    assert [r['code'] for r in store.search('otitis left')] == ['H66.002']
+
+    # Manual category labels stay searchable and the fee schedule is attached
+    (nebulizer,) = store.search('nebulizer')
+    assert nebulizer['code'] == '94640' and nebulizer['fee'] == 25.10
+
+
+if __name__ == "__main__":
+    import pathlib
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_store_round_trips_through_memory_mapped_file(pathlib.Path(tmp))
+    print("All code store checks passed.")
@@ -0,0 +1,19 @@
+import os
+import sys
+
+# Add parent directory to path so we can import the pipeline package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline.import_profile import profile_imports
+
+
+def test_dispatch_paths_do_not_import_the_agent_stack():
+    report = profile_imports("handler")
+    # GET /status and POST must stay boto3-only; ADK loads on first worker use
+    assert report["agent_stack_modules"] == []
+    assert "boto3" in report["top_imports_ms"]
+
+
+if __name__ == "__main__":
+    test_dispatch_paths_do_not_import_the_agent_stack()
+    print("Cold start check passed.")
@@ -0,0 +1,83 @@
+import os
+import sys
+
+# Add parent directory to path so we can import the pipeline package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline.deadline import Deadline, DeadlineExceeded, deadline_record, next_stage
+
+
+class Clock:
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+def test_next_stage_follows_the_checkpoint():
+    assert next_stage({}) == "extracting"
+    assert next_stage({"tech_spec": "spec"}) == "coding"
+    assert next_stage({"tech_spec": "spec", "drafted_iteration": 2, "reviewed_iteration": 1}) == "judging"
+    assert next_stage({"tech_spec": "spec", "loop_complete": True}) == "finalizing"
+    assert next_stage({"final_billing_report": "# [FINAL-ENCOUNTER-RECORD]"}) is None
+
+
+def test_stages_must_fit_before_the_safety_margin():
+    assert Deadline.from_context(object()) is None
+    deadline = Deadline(Clock(100_000), safety_ms=15_000)
+    assert deadline.usable_ms() == 85_000
+    deadline.check("coding")
+    deadline.check(None)
+    for stage, extra_ms in (("extracting", 0), ("coding", 30_000)):
+        try:
+            deadline.check(stage, extra_ms)
+        except DeadlineExceeded as e:
+            assert (e.stage, e.remaining_ms) == (stage, 100_000)
+        else:
+            raise AssertionError(f"{stage} should not fit")
+
+
+def test_deadline_record_keeps_the_best_draft_for_review():
+    checkpoint = {"tech_spec": "# [RCM-SPEC]", "billing_draft": {"primary_icd10": {"code": "J45.909"}},
+                  "confidence_score": 60,
+                  "best_review": {"score": 82, "billing_draft": {"primary_icd10": {"code": "J45.51"}},
+                                  "review_status": "NEEDS_REVISION", "code_findings": []}}
+    record = deadline_record(checkpoint, 2)
+    assert record["billing_draft"]["primary_icd10"]["code"] == "J45.51"
+    assert record["audit"]["final_status"] == "HUMAN REVIEW NEEDED" and record["audit"]["confidence_score"] == 82
+    assert "2 continuation(s)" in record["audit"]["review_feedback"]
+
+    # Markdown drafts (STRUCTURED_OUTPUTS off) get a markdown report the summary parser reads
+    report = deadline_record({"billing_draft": "* **Primary ICD-10:** J45.51", "confidence_score": 70}, 1)
+    assert "Final Status: HUMAN REVIEW NEEDED" in report and "J45.51" in report
+    # No draft at all still finalizes, flagged as insufficient
+    empty = deadline_record({}, 2)
+    assert "billing_draft" not in empty and empty["audit"]["confidence_score"] == 0
+
+
+def test_deadline_record_treats_a_zero_score_as_a_score():
+    # The only review scored 0: its draft and status are kept, not treated as unreviewed
+    checkpoint = {"billing_draft": "* **Primary ICD-10:** J06.9", "confidence_score": 0, "review_status": "REJECTED",
+                  "best_review": {"score": 0, "billing_draft": "* **Primary ICD-10:** J06.9",
+                                  "review_status": "REJECTED"}}
+    report = deadline_record(checkpoint, 2)
+    assert "Final Confidence Score: 0" in report and "J06.9" in report
+
+    # A stored review with no score never beats a reviewed draft, and does not raise
+    checkpoint = {"billing_draft": "* **Primary ICD-10:** J45.51", "confidence_score": 0,
+                  "best_review": {"score": None, "billing_draft": "* **Primary ICD-10:** J45.909"}}
+    report = deadline_record(checkpoint, 1)
+    assert "J45.51" in report and "J45.909" not in report and "Final Confidence Score: 0" in report
+    # An unreviewed current draft falls back to the best review, even one that scored 0
+    checkpoint = {"billing_draft": "* **Primary ICD-10:** J45.909",
+                  "best_review": {"score": 0, "billing_draft": "* **Primary ICD-10:** J45.51"}}
+    assert "J45.51" in deadline_record(checkpoint, 1)
+
+
+if __name__ == "__main__":
+    test_next_stage_follows_the_checkpoint()
+    test_stages_must_fit_before_the_safety_margin()
+    test_deadline_record_keeps_the_best_draft_for_review()
+    test_deadline_record_treats_a_zero_score_as_a_score()
+    print("Deadline checks passed.")
@@ -0,0 +1,87 @@
+import os
+import sys
+
+import boto3
+import pyarrow.parquet as pq
+from moto import mock_aws
+
+# Add parent directory to path so we can import the pipeline package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+
+from pipeline.export import ReadPacer, export_jobs
+from pipeline.result_store import ResultStore
+
+DAY = 1_790_000_000  # 2026-09-21 UTC
+
+
+def record(code, score):
+    return {"billing_draft": {"primary_icd10": {"code": code}, "cpts": [{"code": "99213"}]},
+            "audit": {"confidence_score": score, "final_status": "APPROVED" if score >= 90 else "REJECTED"}}
+
+
+def seed(table, count, updated_at):
+    with table.batch_writer() as writer:
+        for i in range(count):
+            stored = ResultStore().encode(f"job-{updated_at}-{i}", record("H66.002", 95))
+            writer.put_item(Item={"jobId": f"job-{updated_at}-{i}", "status": "Completed", "createdAt": updated_at - 60,
+                                  "updatedAt": updated_at, "metrics": {"total_ms": 4200, "loop_iterations": 2,
+                                                                       "retries": 0, "agents": {}}, **stored})
+
+
+@mock_aws
+def test_parallel_scan_exports_finished_jobs_to_partitioned_parquet(tmp_path):
+    table = boto3.resource("dynamodb").create_table(
+        TableName="PediatricRcmResults", KeySchema=[{"AttributeName": "jobId", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "jobId", "AttributeType": "S"}], BillingMode="PAY_PER_REQUEST")
+    seed(table, 25, DAY)
+    seed(table, 5, DAY + 86_400)
+    # Not exported: running jobs, batch / cache records
+    table.put_item(Item={"jobId": "running", "status": "Running", "updatedAt": DAY})
+    table.put_item(Item={"jobId": "batch-1", "recordType": "batch", "status": "Completed", "updatedAt": DAY})
+    # A legacy item with a markdown 'result' attribute
+    table.put_item(Item={"jobId": "legacy", "status": "Completed", "updatedAt": DAY, "result":
+                         "Final Confidence Score: 60\nFinal Status: REJECTED\n* **Primary ICD-10:** J45.51"})
+
+    output = str(tmp_path / "jobs")
+    report = export_jobs(output, segments=3, page_size=4, batch_rows=5)
+    assert report["rows"] == 31 and report["watermark"] == DAY + 86_400
+    assert sorted(os.listdir(output)) == ["_watermark.json", "date=2026-09-21", "date=2026-09-22"]
+
+    rows = {row["job_id"]: row for row in pq.read_table(output).to_pylist()}
+    assert len(rows) == 31
+    row = rows[f"job-{DAY}-0"]
+    assert (row["final_status"], row["confidence_score"], row["icd10_codes"], row["cpt_codes"]) == \
+        ("APPROVED", 95.0, ["H66.002"], ["99213"])
+    assert (row["loop_iterations"], row["latency_ms"], row["retries"]) == (2, 4200, 0)
+    assert int(row["updated_at"].timestamp()) - int(row["created_at"].timestamp()) == 60
+    assert (rows["legacy"]["final_status"], rows["legacy"]["icd10_codes"]) == ("REJECTED", ["J45.51"])
+
+    # The next incremental run only picks up jobs updated since the watermark
+    seed(table, 2, DAY + 2 * 86_400)
+    incremental = export_jobs(output, segments=2, incremental=True)
+    assert incremental["since"] == DAY + 86_400 and incremental["rows"] == 7
+    # ...without overwriting the files of the first run in the partitions both wrote to
+    rows = pq.read_table(output).to_pylist()
+    assert len(rows) == 31 + 7 and len({row["job_id"] for row in rows}) == 33
+
+
+def test_read_pacer_sleeps_to_stay_under_the_budget():
+    now, slept = [0.0], []
+    pacer = ReadPacer(100, clock=lambda: now[0], sleep=slept.append)
+    pacer.consume(50)
+    pacer.consume(150)
+    assert slept == [0.5, 2.0]
+    assert ReadPacer(0, sleep=slept.append).consume(1_000) is None and len(slept) == 2
+
+
+if __name__ == "__main__":
+    import tempfile
+    import pathlib
+    with tempfile.TemporaryDirectory() as directory:
+        test_parallel_scan_exports_finished_jobs_to_partitioned_parquet(pathlib.Path(directory))
+    test_read_pacer_sleeps_to_stay_under_the_budget()
+    print("Export checks passed.")
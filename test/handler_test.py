@@ -1,17 +1,17 @@
+import asyncio
 import json
 import boto3
 import os
 import sys
 import io
 import zipfile
+from unittest import mock
 from moto import mock_aws
 
 # Add parent directory to path so we can import handler
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from handler import lambda_handler
-
-# 1. Setup Mock Environment
+# 1. Setup Mock Environment (before importing handler, which creates boto3 clients)
 os.environ['RESULTS_TABLE'] = 'PediatricRcmResults'
 os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
 os.environ.update({
@@ -19,6 +19,9 @@ os.environ.update({
     'AWS_SECRET_ACCESS_KEY': 'testing'
 })
 
+import handler
+from handler import lambda_handler
+
 class MockContext:
     def __init__(self):
         self.aws_request_id = "local-test-id-123"
@@ -30,17 +33,20 @@ def create_mock_zip():
         zip_file.writestr('index.py', 'def handler(event, context): return {"statusCode": 200}')
     return zip_buffer.getvalue()
 
-@mock_aws
-def test_handler_full_loop(scenario_file):
-    # --- SETUP: Mock Resources ---
+def create_mock_table():
     dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-    table = dynamodb.create_table(
+    return dynamodb.create_table(
         TableName='PediatricRcmResults',
         KeySchema=[{'AttributeName': 'jobId', 'KeyType': 'HASH'}],
         AttributeDefinitions=[{'AttributeName': 'jobId', 'AttributeType': 'S'}],
         ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
     )
 
+@mock_aws
+def test_handler_full_loop(scenario_file):
+    # --- SETUP: Mock Resources ---
+    table = create_mock_table()
+
     iam = boto3.client("iam", region_name="us-east-1")
     role = iam.create_role(RoleName="test-role", AssumeRolePolicyDocument=json.dumps({}))
     
@@ -97,6 +103,310 @@ def test_handler_full_loop(scenario_file):
     print(f"Final Status: {data.get('status')}")
     print(f"Final Report: {data.get('result')}")
 
+@mock_aws
+def test_batch_submission_flow():
+    create_mock_table()
+    notes = [f"{age}-year-old with bilateral ear pain and fever." for age in range(1, 26)]
+
+    # --- STEP 1: POST /process-encounters fans out in chunks, not one invoke per note ---
+    post_event = {
+        "httpMethod": "POST",
+        "resource": "/process-encounters",
+        "body": json.dumps({"notes": notes})
+    }
+    with mock.patch.object(handler, 'DISPATCH_CHUNK_SIZE', 10), \
+         mock.patch.object(handler.lambda_client, 'invoke', return_value={'StatusCode': 202}) as invoke:
+        post_res = lambda_handler(post_event, MockContext())
+
+    assert post_res['statusCode'] == 202
+    body = json.loads(post_res['body'])
+    batch_id, job_ids = body['batchId'], body['jobIds']
+    assert len(job_ids) == 25
+    payloads = [json.loads(call.kwargs['Payload']) for call in invoke.call_args_list]
+    assert [len(p['jobs']) for p in payloads] == [10, 10, 5]
+    assert [job['job_id'] for p in payloads for job in p['jobs']] == job_ids
+
+    # --- STEP 2: GET /batch/{batchId} aggregates job progress ---
+    handler.complete_job(job_ids[0], "# [FINAL-ENCOUNTER-RECORD]")
+    handler.fail_job(job_ids[1], "boom")
+    get_event = {"httpMethod": "GET", "pathParameters": {"batchId": batch_id}}
+    data = json.loads(lambda_handler(get_event, MockContext())['body'])
+    assert data['status'] == 'Running'
+    assert data['counts'] == {'Completed': 1, 'Failed': 1, 'Running': 23}
+    assert data['progress'] == 8.0
+
+    for job_id in job_ids[2:]:
+        handler.complete_job(job_id, "# [FINAL-ENCOUNTER-RECORD]")
+    data = json.loads(lambda_handler(get_event, MockContext())['body'])
+    assert data['status'] == 'Completed' and data['progress'] == 100.0
+
+    # --- Validation and unknown ids ---
+    bad = lambda_handler({"httpMethod": "POST", "resource": "/process-encounters", "body": "{}"}, MockContext())
+    assert bad['statusCode'] == 400
+    missing = lambda_handler({"httpMethod": "GET", "pathParameters": {"batchId": "nope"}}, MockContext())
+    assert missing['statusCode'] == 404
+
+@mock_aws
+def test_worker_runs_jobs_concurrently_up_to_the_limit():
+    create_mock_table()
+    jobs = [{"job_id": f"job-{i}", "note": f"{i}-year-old with cough."} for i in range(6)]
+    for job in jobs:
+        handler.dynamo.put_item(Item={'jobId': job['job_id'], 'status': 'Running'})
+    running, peak = set(), []
+
+    async def pipeline(note, job_id, checkpoint=None, metrics=None, deadline=None):
+        running.add(job_id)
+        peak.append(len(running))
+        await asyncio.sleep(0.05)
+        running.discard(job_id)
+        return f"# [FINAL-ENCOUNTER-RECORD] {note}"
+
+    with mock.patch.object(handler, 'run_pipeline', side_effect=pipeline), \
+         mock.patch.object(handler, 'RESULT_CACHE_ENABLED', False):
+        results = asyncio.run(handler.run_jobs(jobs, concurrency=3))
+    assert results == [True] * len(jobs)
+    # Pipelines overlap, but never more than the semaphore allows
+    assert max(peak) == 3
+
+    for job in jobs:
+        item = handler.dynamo.get_item(Key={'jobId': job['job_id']})['Item']
+        assert item['status'] == 'Completed'
+        assert handler.result_store.decode(item) == f"# [FINAL-ENCOUNTER-RECORD] {job['note']}"
+
+@mock_aws
+def test_identical_notes_are_served_from_the_result_cache():
+    create_mock_table()
+    note = "3-year-old with left ear pain and fever."
+    post_event = {"httpMethod": "POST", "body": json.dumps({"note": note})}
+
+    with mock.patch.object(handler.lambda_client, 'invoke', return_value={'StatusCode': 202}) as invoke:
+        first = json.loads(lambda_handler(post_event, MockContext())['body'])
+        # A resubmission while the first job is running attaches to it instead of starting another
+        attached = lambda_handler(post_event, MockContext())
+    assert invoke.call_count == 1
+    assert attached['statusCode'] == 202
+    assert json.loads(attached['body'])['jobId'] == first['jobId']
+
+    payload = json.loads(invoke.call_args.kwargs['Payload'])
+    with mock.patch.object(handler, 'run_pipeline', return_value="# [FINAL-ENCOUNTER-RECORD]") as pipeline:
+        lambda_handler(payload, MockContext())
+        # Whitespace differences hash to the same key
+        cached = lambda_handler({"httpMethod": "POST", "body": json.dumps({"note": f"  {note}\n"})}, MockContext())
+        # A second job carrying the same note reuses the stored report
+        lambda_handler({"worker_mode": True, "job_id": "other-job", "note": note}, MockContext())
+    assert pipeline.call_count == 1
+
+    assert cached['statusCode'] == 200
+    body = json.loads(cached['body'])
+    assert body == {"jobId": first['jobId'], "status": "Completed",
+                    "result": "# [FINAL-ENCOUNTER-RECORD]", "cached": True}
+    other = json.loads(lambda_handler({"httpMethod": "GET", "pathParameters": {"jobId": "other-job"}},
+                                      MockContext())['body'])
+    assert other['status'] == 'Completed' and other['result'] == "# [FINAL-ENCOUNTER-RECORD]"
+
+@mock_aws
+def test_duplicate_notes_in_one_batch_run_a_single_pipeline():
+    create_mock_table()
+    note = "4-year-old with left ear pain and fever."
+    post_event = {"httpMethod": "POST", "resource": "/process-encounters",
+                  "body": json.dumps({"notes": [note, note, f" {note}\n"]})}
+    with mock.patch.object(handler.lambda_client, 'invoke', return_value={'StatusCode': 202}) as invoke:
+        job_ids = json.loads(lambda_handler(post_event, MockContext())['body'])['jobIds']
+    payload = json.loads(invoke.call_args.kwargs['Payload'])
+
+    async def pipeline(note, job_id, checkpoint=None, metrics=None, deadline=None):
+        # Long enough that the duplicates start while the owner is still in flight
+        await asyncio.sleep(0.2)
+        return f"# [FINAL-ENCOUNTER-RECORD] {job_id}"
+
+    with mock.patch.object(handler, 'run_pipeline', side_effect=pipeline) as run, \
+         mock.patch.object(handler, 'RESULT_CACHE_POLL_SECONDS', 0.05):
+        lambda_handler(payload, MockContext())
+    assert run.call_count == 1
+
+    owner = run.call_args.args[1]
+    for job_id in job_ids:
+        item = handler.dynamo.get_item(Key={'jobId': job_id})['Item']
+        assert item['status'] == 'Completed'
+        assert handler.result_store.decode(item) == f"# [FINAL-ENCOUNTER-RECORD] {owner}"
+
+@mock_aws
+def test_checkpoint_round_trips_and_finalized_jobs_are_not_rerun():
+    create_mock_table()
+    handler.dynamo.put_item(Item={'jobId': 'job-1', 'status': 'Running'})
+    assert handler.load_checkpoint('job-1') == {}
+
+    checkpoint = {"tech_spec": "# [RCM-SPEC]", "confidence_score": 92.5, "loop_iteration": 2, "loop_complete": True}
+    handler.save_checkpoint('job-1', checkpoint)
+    assert handler.load_checkpoint('job-1') == checkpoint
+
+    # A re-invocation after the finalizer already ran returns the stored report without the LLM
+    handler.save_checkpoint('job-1', {**checkpoint, "final_billing_report": "# [FINAL-ENCOUNTER-RECORD]"})
+    with mock.patch.object(handler.get_agent_stack().runner, 'run_async') as run_async:
+        lambda_handler({"worker_mode": True, "job_id": "job-1", "note": "note", "cache_key": None}, MockContext())
+    run_async.assert_not_called()
+    item = handler.dynamo.get_item(Key={'jobId': 'job-1'})['Item']
+    assert item['status'] == 'Completed' and handler.result_store.decode(item) == "# [FINAL-ENCOUNTER-RECORD]"
+    # Per-job metrics are stored alongside the result
+    assert item['metrics']['retries'] == 0 and item['metrics']['loop_iterations'] == 2
+    # ...with the warm worker's session store footprint after the job's sessions were released
+    assert item['metrics']['session_store']['resident_sessions'] == 0
+
+@mock_aws
+def test_status_polls_are_versioned_and_conditional():
+    create_mock_table()
+    with mock.patch.object(handler.lambda_client, 'invoke', return_value={'StatusCode': 202}):
+        post = lambda_handler({"httpMethod": "POST", "body": json.dumps({"note": "2-year-old with cough."})},
+                              MockContext())
+    job_id = json.loads(post['body'])['jobId']
+
+    def get(headers=None, **params):
+        return lambda_handler({"httpMethod": "GET", "pathParameters": {"jobId": job_id}, "headers": headers,
+                               "queryStringParameters": {k: str(v) for k, v in params.items()} or None},
+                              MockContext())
+
+    first = get()
+    assert first['headers']['ETag'] == '"1"'
+    assert json.loads(first['body'])['stage'] == 'queued'
+    # Nothing changed: 304 for the ETag and for ?sinceVersion, without a body
+    assert get({"If-None-Match": '"1"'})['statusCode'] == 304
+    assert get(sinceVersion=1)['statusCode'] == 304
+
+    handler.update_progress(job_id, {"stage": "judging", "iteration": 2, "score": 82.5})
+    data = json.loads(get(sinceVersion=1)['body'])
+    assert (data['version'], data['stage'], data['iteration'], data['score']) == (2, 'judging', 2, 82.5)
+    assert 'result' not in data and 'checkpoint' not in data
+
+    # A long-poll with no change waits (bounded) and then answers 304
+    with mock.patch.object(handler, 'LONG_POLL_INTERVAL_SECONDS', 0.05):
+        assert get(sinceVersion=2, wait=0.2)['statusCode'] == 304
+
+    handler.complete_job(job_id, "# [FINAL-ENCOUNTER-RECORD]")
+    done = get({"If-None-Match": '"2"'})
+    assert done['headers']['ETag'] == '"3"'
+    data = json.loads(done['body'])
+    assert data['status'] == 'Completed' and data['stage'] == 'completed'
+    assert data['result'] == "# [FINAL-ENCOUNTER-RECORD]"
+    # Once the client has the final version, the result is not sent again
+    assert get({"If-None-Match": '"3"'}, wait=10)['statusCode'] == 304
+
+@mock_aws
+def test_structured_results_are_stored_compressed_and_rendered_on_request():
+    create_mock_table()
+    handler.dynamo.put_item(Item={'jobId': 'job-2', 'status': 'Running'})
+    record = {"billing_draft": {"primary_icd10": {"code": "J45.51", "description": "Asthma"},
+                                "cpts": [{"code": "94640", "description": "Nebulizer"}]},
+              "audit": {"confidence_score": 92.5, "final_status": "APPROVED", "review_status": "APPROVED"}}
+    handler.complete_job('job-2', record)
+    item = handler.dynamo.get_item(Key={'jobId': 'job-2'})['Item']
+    # The body is a compressed blob; status, score and codes stay inline for projection reads
+    assert 'result' not in item and item['resultStoredBytes'] < item['resultBytes']
+    assert item['summary'] == {'finalStatus': 'APPROVED', 'score': 92.5, 'icd10': ['J45.51'], 'cpts': ['94640']}
+
+    def get(**params):
+        return json.loads(lambda_handler({"httpMethod": "GET", "pathParameters": {"jobId": "job-2"},
+                                          "queryStringParameters": params or None}, MockContext())['body'])
+
+    data = get()
+    assert data['result'] == record and data['summary']['cpts'] == ['94640']
+    assert 'resultBody' not in data
+    markdown = get(format="markdown")['result']
+    assert markdown.startswith("# [FINAL-ENCOUNTER-RECORD]")
+    assert "Final Status: APPROVED" in markdown and "* **Supporting CPTs:** 94640 - Nebulizer" in markdown
+
+class DeadlineContext(MockContext):
+    def __init__(self, remaining_ms):
+        super().__init__()
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+@mock_aws
+def test_jobs_near_the_deadline_continue_then_finalize_for_review():
+    create_mock_table()
+    draft = {"primary_icd10": {"code": "H66.002", "description": "Otitis media, left ear"},
+             "cpts": [{"code": "99213", "description": "Office visit"}]}
+    handler.dynamo.put_item(Item={'jobId': 'job-3', 'status': 'Running'})
+    handler.save_checkpoint('job-3', {"tech_spec": "# [RCM-SPEC]", "billing_draft": draft, "loop_iteration": 1,
+                                      "drafted_iteration": 1, "reviewed_iteration": 1, "confidence_score": 75})
+    event = {"worker_mode": True, "job_id": "job-3", "note": "note", "cache_key": None}
+
+    # 45s left: the next coding pass does not fit, so the job is handed to a fresh invocation
+    with mock.patch.object(handler.get_agent_stack().runner, 'run_async') as run_async, \
+         mock.patch.object(handler.lambda_client, 'invoke', return_value={'StatusCode': 202}) as invoke:
+        lambda_handler(event, DeadlineContext(45_000))
+    run_async.assert_not_called()
+    continuation = json.loads(invoke.call_args.kwargs['Payload'])['jobs'][0]
+    assert (continuation['job_id'], continuation['continuations']) == ('job-3', 1)
+    item = handler.dynamo.get_item(Key={'jobId': 'job-3'})['Item']
+    assert (item['status'], item['stage'], item['continuations']) == ('Running', 'continuing', 1)
+
+    # Out of continuations: the best draft so far is stored for human review
+    with mock.patch.object(handler.lambda_client, 'invoke') as invoke:
+        lambda_handler({**event, "continuations": handler.MAX_CONTINUATIONS}, DeadlineContext(45_000))
+    invoke.assert_not_called()
+    item = handler.dynamo.get_item(Key={'jobId': 'job-3'})['Item']
+    assert item['status'] == 'Completed'
+    assert item['summary'] == {'finalStatus': 'HUMAN REVIEW NEEDED', 'score': 75, 'icd10': ['H66.002'], 'cpts': ['99213']}
+    assert item['metrics']['deadline'] == {'continuations': handler.MAX_CONTINUATIONS, 'stage': 'coding'}
+    assert handler.result_store.decode(item)['billing_draft']['cpts'] == draft['cpts']
+
+def receive_sqs_event(sqs, queue_url):
+    """Builds the event the SQS event source mapping would deliver for the queued messages."""
+    messages = []
+    while True:
+        batch = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10, AttributeNames=['All'],
+                                    VisibilityTimeout=0).get('Messages', [])
+        if not batch:
+            break
+        messages.extend(batch)
+        for message in batch:
+            sqs.delete_message(QueueUrl=queue_url, ReceiptHandle=message['ReceiptHandle'])
+    return {"Records": [{"messageId": m['MessageId'], "body": m['Body'], "eventSource": "aws:sqs",
+                         "attributes": m['Attributes']} for m in messages]}
+
+@mock_aws
+def test_sqs_dispatch_reports_only_failed_messages():
+    create_mock_table()
+    sqs = boto3.client('sqs', region_name='us-east-1')
+    queue_url = sqs.create_queue(QueueName='PediatricRcmJobs')['QueueUrl']
+    notes = [f"{age}-year-old with right ear pain." for age in range(1, 13)]
+
+    with mock.patch.object(handler, 'DISPATCH_MODE', 'sqs'), mock.patch.object(handler, 'JOB_QUEUE_URL', queue_url), \
+         mock.patch.object(handler, 'sqs_client', sqs), mock.patch.object(handler.lambda_client, 'invoke') as invoke:
+        post = lambda_handler({"httpMethod": "POST", "resource": "/process-encounters",
+                               "body": json.dumps({"notes": notes})}, MockContext())
+    invoke.assert_not_called()
+    job_ids = json.loads(post['body'])['jobIds']
+    event = receive_sqs_event(sqs, queue_url)
+    assert sorted(json.loads(r['body'])['job_id'] for r in event['Records']) == sorted(job_ids)
+
+    async def pipeline(note, job_id, checkpoint=None, metrics=None, deadline=None):
+        if note.startswith("3-year-old"):
+            raise RuntimeError("429 RESOURCE_EXHAUSTED")
+        return "# [FINAL-ENCOUNTER-RECORD]"
+
+    with mock.patch.object(handler, 'run_pipeline', side_effect=pipeline), \
+         mock.patch.object(handler, 'RESULT_CACHE_ENABLED', False):
+        response = lambda_handler(event, MockContext())
+        failed = [r for r in event['Records'] if r['messageId'] in
+                  {f['itemIdentifier'] for f in response['batchItemFailures']}]
+        assert [json.loads(r['body'])['note'] for r in failed] == [notes[2]]
+        failed_job = json.loads(failed[0]['body'])['job_id']
+
+        # Not the last delivery: the job stays Running so the redelivery can finish it
+        item = handler.dynamo.get_item(Key={'jobId': failed_job})['Item']
+        assert item['status'] == 'Running' and item['stage'] == 'retrying'
+        done = [handler.dynamo.get_item(Key={'jobId': j})['Item']['status'] for j in job_ids if j != failed_job]
+        assert set(done) == {'Completed'}
+
+        # The last delivery before the dead-letter queue marks the job Failed
+        failed[0]['attributes']['ApproximateReceiveCount'] = str(handler.MAX_RECEIVE_COUNT)
+        response = lambda_handler({"Records": failed}, MockContext())
+    assert len(response['batchItemFailures']) == 1
+    assert handler.dynamo.get_item(Key={'jobId': failed_job})['Item']['status'] == 'Failed'
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("Usage: python handler_test.py <scenario_filename>")
@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+
+# Add parent directory to path so we can import the agents package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.development_workflow.knowledge_index import KnowledgeIndex, get_knowledge_index
+
+MANUAL_PATH = os.path.join(os.path.dirname(__file__), '..', 'knowledge_base', 'billing_codes.md')
+
+
+def load_index():
+    with open(MANUAL_PATH) as f:
+        return KnowledgeIndex(f.read())
+
+
+def test_manual_is_parsed_into_structured_tables():
+    index = load_index()
+    assert len(index.icd10) == 9
+    assert len(index.cpt) == 7
+    assert [s.number for s in index.scenarios] == [1, 2, 3, 4, 5, 6]
+    assert index.lookup('h66.002').description == 'Acute suppurative otitis media, left ear'
+    assert index.scenario(2).codes == ('J45.51', '94640', '99214')
+
+
+def test_queries_support_terms_prefixes_and_codes():
+    index = load_index()
+    assert [d.code for d in index.search('H66*')] == ['H66.001', 'H66.002', 'H66.003']
+    assert [d.code for d in index.search('Ear Infection Right')] == ['H66.001']
+
+    # Multi-term queries return whole scenario blocks, not single lines
+    (scenario,) = index.search('asthma nebulizer')
+    assert scenario.number == 2 and '94640' in scenario.text
+
+    # Partial matches fall back to the documents matching the most terms
+    assert [getattr(d, 'number', None) for d in index.search('Scenario 4')] == [4]
+    assert index.search('zzz') == []
+
+
+def test_index_rebuilds_when_file_changes(tmp_path):
+    manual = tmp_path / 'billing_codes.md'
+    manual.write_text(open(MANUAL_PATH).read())
+    first = get_knowledge_index(manual)
+    assert get_knowledge_index(manual) is first
+
+    manual.write_text(manual.read_text().replace('Strep Throat', 'Streptococcal Sore Throat'))
+    stat = manual.stat()
+    os.utime(manual, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    second = get_knowledge_index(manual)
+    assert second is not first
+    assert second.lookup('J02.0').category == 'Streptococcal Sore Throat'
+
+
+if __name__ == "__main__":
+    import pathlib
+    import tempfile
+
+    test_manual_is_parsed_into_structured_tables()
+    test_queries_support_terms_prefixes_and_codes()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_index_rebuilds_when_file_changes(pathlib.Path(tmp))
+
+    index = load_index()
+    start = time.perf_counter()
+    for _ in range(10_000):
+        index.search('asthma nebulizer 99214')
+    print(f"10k searches: {time.perf_counter() - start:.3f}s")
+    print("All knowledge index checks passed.")
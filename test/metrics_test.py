@@ -0,0 +1,93 @@
+import os
+import sys
+from types import SimpleNamespace
+
+# Add parent directory to path so we can import the pipeline package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline.metrics import PipelineMetrics
+
+
+class FakeEvent(SimpleNamespace):
+    def get_function_calls(self):
+        return self.__dict__.get("calls", [])
+
+    def get_function_responses(self):
+        return self.__dict__.get("responses", [])
+
+
+def event(author, timestamp, prompt=0, candidates=0, calls=(), responses=(), state_delta=None, result=None):
+    usage = SimpleNamespace(prompt_token_count=prompt, candidates_token_count=candidates) if prompt else None
+    return FakeEvent(author=author, timestamp=timestamp, usage_metadata=usage,
+                     actions=SimpleNamespace(state_delta=state_delta or {}),
+                     calls=[SimpleNamespace(id=c, name=c.split("#")[0]) for c in calls],
+                     responses=[SimpleNamespace(id=r, name=r.split("#")[0], response=result) for r in responses])
+
+
+def test_time_tokens_and_tools_are_attributed_per_agent_and_iteration():
+    metrics = PipelineMetrics("job-1", clock=lambda: 100.0)
+    for e in [
+        event("ClinicalEntityExtractor", 102.0, prompt=1000, candidates=200, calls=["read_file#1"]),
+        event("ClinicalEntityExtractor", 102.5, responses=["read_file#1"], result={"result": "x" * 386}),
+        event("ClinicalEntityExtractor", 105.0, prompt=3000, candidates=800, state_delta={"tech_spec": "..."}),
+        event("MedicalCoderAgent", 108.0, prompt=2000, candidates=300, state_delta={"loop_iteration": 1}),
+        event("RevenueIntegrityJudge", 110.0, prompt=2500, candidates=100),
+        event("MedicalCoderAgent", 111.0, prompt=2100, candidates=300, state_delta={"loop_iteration": 2}),
+        event("BillingFinalizer", 112.0, prompt=500, candidates=400),
+    ]:
+        metrics.record_event(e)
+
+    summary = metrics.to_dict()
+    extractor = summary["agents"]["ClinicalEntityExtractor"]
+    assert extractor["wall_ms"] == 5000 and extractor["model_calls"] == 2 and extractor["tool_calls"] == 1
+    assert extractor["prompt_tokens"] == 4000 and extractor["candidate_tokens"] == 1000
+    assert summary["tools"] == {"read_file": {"calls": 1, "wall_ms": 500, "result_tokens": 100, "max_result_tokens": 100}}
+    assert extractor["tool_result_tokens"] == 100
+    assert summary["loop_iterations"] == 2
+    assert summary["iterations"]["1"]["wall_ms"] == 5000 and summary["iterations"]["2"]["wall_ms"] == 1000
+    assert summary["prompt_tokens"] == 11100
+
+
+def test_emf_records_declare_one_metric_set_per_agent_plus_pipeline():
+    metrics = PipelineMetrics("job-1", clock=lambda: 100.0)
+    metrics.record_event(event("BillingFinalizer", 101.0, prompt=500, candidates=400))
+    records = metrics.emf_records(metrics.to_dict(), "Completed")
+
+    assert [r.get("Agent", r.get("Status")) for r in records] == ["BillingFinalizer", "Completed"]
+    definition = records[0]["_aws"]["CloudWatchMetrics"][0]
+    assert definition["Dimensions"] == [["Agent"]]
+    assert {m["Name"] for m in definition["Metrics"]} <= set(records[0])
+    assert records[0]["AgentLatency"] == 1000 and records[0]["jobId"] == "job-1"
+    assert records[1]["Escalated"] == 0
+
+
+def test_escalation_is_recorded_from_state_or_checkpoint():
+    metrics = PipelineMetrics("job-1", clock=lambda: 100.0)
+    metrics.record_event(event("MedicalCoderAgent", 101.0, state_delta={
+        "loop_iteration": 2, "model_tier": "strong", "escalation_reason": "low_confidence", "escalated_iteration": 2}))
+    summary = metrics.to_dict()
+    assert summary["escalation"] == {"reason": "low_confidence", "iteration": 2}
+    records = metrics.emf_records(summary, "Completed")
+    assert records[-2]["Escalated"] == 1 and records[-1]["EscalationReason"] == "low_confidence"
+
+    resumed = PipelineMetrics("job-1", clock=lambda: 100.0)
+    resumed.restore({"loop_iteration": 3, "escalation_reason": "rule_engine", "escalated_iteration": 1})
+    assert resumed.iteration == 3 and resumed.to_dict()["escalation"] == {"reason": "rule_engine", "iteration": 1}
+
+
+def test_tool_results_over_the_context_budget_are_reported(caplog):
+    metrics = PipelineMetrics("job-1", clock=lambda: 100.0)
+    metrics.record_event(event("MedicalCoderAgent", 101.0, calls=["onboard_project#1"]))
+    with caplog.at_level("WARNING", logger="pipeline.metrics"):
+        metrics.record_event(event("MedicalCoderAgent", 101.1, responses=["onboard_project#1"],
+                                   result={"result": "x" * 40_000}))
+
+    assert metrics.to_dict()["agents"]["MedicalCoderAgent"]["tool_result_tokens"] > 9_000
+    assert "onboard_project result for MedicalCoderAgent" in caplog.text
+
+
+if __name__ == "__main__":
+    test_time_tokens_and_tools_are_attributed_per_agent_and_iteration()
+    test_emf_records_declare_one_metric_set_per_agent_plus_pipeline()
+    test_escalation_is_recorded_from_state_or_checkpoint()
+    print("All metrics checks passed.")
@@ -0,0 +1,76 @@
+import os
+import sys
+from types import SimpleNamespace
+from unittest import mock
+
+# Add parent directory to path so we can import the agents package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.development_workflow import model_cascade
+from agents.development_workflow.model_cascade import (
+    escalate_after_rejected_draft,
+    escalate_on_malformed_draft,
+    escalate_on_missing_review,
+    select_cascade_model,
+)
+
+
+def context(**state):
+    return SimpleNamespace(state=dict(state))
+
+
+def routed_model(ctx) -> str:
+    request = SimpleNamespace(model="gemini-2.5-pro")
+    select_cascade_model(ctx, request)
+    return request.model
+
+
+def test_jobs_start_on_the_fast_tier_and_stay_there_while_approved():
+    ctx = context(loop_iteration=1, reviewed_iteration=1, review_status="APPROVED")
+    assert escalate_after_rejected_draft(ctx) is None
+    assert routed_model(ctx) == "gemini-2.5-flash" and "model_tier" not in ctx.state
+
+
+def test_rejected_drafts_escalate_with_the_deciding_check():
+    ctx = context(loop_iteration=1, reviewed_iteration=1, review_status="NEEDS_REVISION",
+                  rule_engine_report="Rule engine pre-score 70% (NEEDS_REVISION). -30pt (bundle, 94640): ...")
+    escalate_after_rejected_draft(ctx)
+    assert ctx.state["escalation_reason"] == "rule_engine" and ctx.state["escalated_iteration"] == 1
+    assert routed_model(ctx) == "gemini-2.5-pro"
+
+    ctx = context(loop_iteration=2, reviewed_iteration=2, review_status="NEEDS_REVISION",
+                  rule_engine_report="Rule engine could not decide: draft reports insufficient data")
+    escalate_after_rejected_draft(ctx)
+    assert ctx.state["escalation_reason"] == "low_confidence"
+
+    # Only the first escalation is recorded
+    ctx.state["loop_iteration"] = ctx.state["reviewed_iteration"] = 3
+    escalate_after_rejected_draft(ctx)
+    assert ctx.state["escalated_iteration"] == 2
+
+
+def test_malformed_outputs_escalate():
+    ctx = context(loop_iteration=1, billing_draft="I think this is asthma.")
+    escalate_on_malformed_draft(ctx)
+    assert ctx.state["escalation_reason"] == "malformed_draft"
+
+    ctx = context(loop_iteration=1, billing_draft="# [BILLING-DRAFT]\n* **Primary ICD-10:** J45.51")
+    escalate_on_malformed_draft(ctx)
+    assert "model_tier" not in ctx.state
+    escalate_on_missing_review(ctx)
+    assert ctx.state["escalation_reason"] == "malformed_review"
+
+
+def test_disabled_cascade_keeps_the_configured_model():
+    ctx = context(loop_iteration=1, billing_draft="?")
+    with mock.patch.object(model_cascade, "CASCADE_ENABLED", False):
+        escalate_on_malformed_draft(ctx)
+        assert routed_model(ctx) == "gemini-2.5-pro" and "model_tier" not in ctx.state
+
+
+if __name__ == "__main__":
+    test_jobs_start_on_the_fast_tier_and_stay_there_while_approved()
+    test_rejected_drafts_escalate_with_the_deciding_check()
+    test_malformed_outputs_escalate()
+    test_disabled_cascade_keeps_the_configured_model()
+    print("All model cascade checks passed.")
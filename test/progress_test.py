@@ -0,0 +1,37 @@
+import os
+import sys
+from types import SimpleNamespace
+
+# Add parent directory to path so we can import the pipeline package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline.progress import ProgressTracker
+
+
+def event(author, **state_delta):
+    return SimpleNamespace(author=author, actions=SimpleNamespace(state_delta=state_delta))
+
+
+def test_only_stage_changes_are_reported():
+    tracker = ProgressTracker()
+    assert tracker.observe(event("ClinicalEntityExtractor")) == {"stage": "extracting"}
+    assert tracker.observe(event("ClinicalEntityExtractor", tech_spec="...")) is None
+    assert tracker.observe(event("MedicalCoderAgent", loop_iteration=1)) == {"stage": "coding", "iteration": 1}
+    assert tracker.observe(event("RevenueIntegrityJudge")) == {"stage": "judging", "iteration": 1}
+    assert tracker.observe(event("RevenueIntegrityJudge", confidence_score=70)) == \
+        {"stage": "judging", "iteration": 1, "score": 70}
+    assert tracker.observe(event("BillingRefinementLoop")) is None
+    assert tracker.observe(event("MedicalCoderAgent", loop_iteration=2)) == \
+        {"stage": "coding", "iteration": 2, "score": 70}
+    assert tracker.observe(event("BillingFinalizer")) == {"stage": "finalizing", "score": 70}
+
+
+def test_resumed_runs_start_from_the_checkpointed_iteration():
+    tracker = ProgressTracker({"loop_iteration": 3, "confidence_score": 85})
+    assert tracker.observe(event("RevenueIntegrityJudge")) == {"stage": "judging", "iteration": 3, "score": 85}
+
+
+if __name__ == "__main__":
+    test_only_stage_changes_are_reported()
+    test_resumed_runs_start_from_the_checkpointed_iteration()
+    print("All progress checks passed.")
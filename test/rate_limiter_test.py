@@ -0,0 +1,131 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import boto3
+from moto import mock_aws
+
+# Add parent directory to path so we can import the agents package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+
+from agents.development_workflow.rate_limiter import (
+    BURST_SECONDS,
+    DynamoQuotaStore,
+    QuotaStore,
+    RateLimiter,
+    retry_after_seconds,
+)
+
+QUOTAS = {"gemini-2.5-pro": {"rpm": 60, "tpm": 60_000}, "gemini-2.5-flash": {"rpm": 600, "tpm": 600_000}}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_request_bucket_is_per_model():
+    clock = FakeClock()
+    limiter = RateLimiter(QUOTAS, clock=clock)
+
+    # 60 rpm with a 5 s burst admits 5 requests, then one per second
+    assert [limiter.try_acquire("gemini-2.5-pro", 10) for _ in range(int(BURST_SECONDS))] == [0.0] * 5
+    assert limiter.try_acquire("gemini-2.5-pro", 10) == 1.0
+    # flash has its own, larger budget
+    assert limiter.try_acquire("gemini-2.5-flash", 10) == 0.0
+
+    clock.now += 1
+    assert limiter.try_acquire("gemini-2.5-pro", 10) == 0.0
+
+
+def test_token_budget_and_usage_reconciliation():
+    clock = FakeClock()
+    limiter = RateLimiter(QUOTAS, clock=clock)
+
+    # 60k tpm -> 5k token bucket; an oversized request still goes once the bucket is full
+    assert limiter.try_acquire("gemini-2.5-pro", 8_000) == 0.0
+    assert limiter.try_acquire("gemini-2.5-pro", 100) > 0
+
+    # Actual usage below the estimate gives tokens back
+    clock.now += 10
+    assert limiter.try_acquire("gemini-2.5-pro", 5_000) == 0.0
+    limiter.record_success("gemini-2.5-pro", 5_000, 1_000)
+    assert limiter.try_acquire("gemini-2.5-pro", 4_000) == 0.0
+
+
+def test_429_halves_the_rate_and_honours_retry_after():
+    clock = FakeClock()
+    limiter = RateLimiter(QUOTAS, clock=clock)
+
+    assert limiter.record_rate_limited("gemini-2.5-pro", retry_after=7) == 7
+    assert limiter.try_acquire("gemini-2.5-pro", 10) == 7
+    assert limiter.try_acquire("gemini-2.5-flash", 10) == 0.0
+
+    clock.now += 7
+    budget = limiter._budgets["gemini-2.5-pro"]
+    assert budget.rate_factor == 0.5
+    # Additive increase after successful calls
+    limiter.record_success("gemini-2.5-pro", 10, None)
+    assert budget.rate_factor == 0.55
+
+
+def test_retry_after_is_read_from_headers_or_retry_info():
+    error = Exception("429 RESOURCE_EXHAUSTED")
+    error.response = SimpleNamespace(headers={"retry-after": "12"})
+    assert retry_after_seconds(error) == 12.0
+    assert retry_after_seconds(Exception("429 {'@type': 'RetryInfo', 'retryDelay': '31s'}")) == 31.0
+    assert retry_after_seconds(Exception("429 quota")) is None
+
+
+@mock_aws
+def test_shared_store_enforces_the_quota_across_limiters():
+    table = boto3.resource('dynamodb', region_name='us-east-1').create_table(
+        TableName='PediatricRcmResults',
+        KeySchema=[{'AttributeName': 'jobId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'jobId', 'AttributeType': 'S'}],
+        ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+    )
+    store = DynamoQuotaStore(table)
+    quota = {"rpm": 2, "tpm": 1_000}
+
+    # Two "Lambda instances" draw from the same per-minute window
+    assert store.reserve("gemini-2.5-pro", 100, quota) == 0.0
+    assert store.reserve("gemini-2.5-pro", 100, quota) == 0.0
+    assert 0 < store.reserve("gemini-2.5-pro", 100, quota) <= 60
+
+    # A 429 seen by one instance pauses the model everywhere
+    store.cooldown("gemini-2.5-flash", 10_000_000_000)
+    assert store.reserve("gemini-2.5-flash", 100, quota) > 0
+
+    limiter = RateLimiter({"gemini-2.5-pro": {"rpm": 600, "tpm": 600_000}}, store=DynamoQuotaStore(table))
+    asyncio.run(asyncio.wait_for(limiter.acquire("gemini-2.0-flash", 10), timeout=5))
+
+
+def test_quota_store_missing_an_override_fails_at_construction():
+    class PartialStore(QuotaStore):
+        def reserve(self, model, tokens, quota):
+            return 0.0
+
+    try:
+        PartialStore()
+    except TypeError as e:
+        assert "adjust_tokens" in str(e) and "cooldown" in str(e)
+    else:
+        raise AssertionError("an incomplete QuotaStore was constructed")
+
+
+if __name__ == "__main__":
+    test_request_bucket_is_per_model()
+    test_token_budget_and_usage_reconciliation()
+    test_429_halves_the_rate_and_honours_retry_after()
+    test_retry_after_is_read_from_headers_or_retry_info()
+    test_quota_store_missing_an_override_fails_at_construction()
+    print("All rate limiter checks passed.")
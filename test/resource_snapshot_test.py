@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+from unittest import mock
+
+# Add parent directory to path so we can import the agents package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.development_workflow import common_tools
+from agents.development_workflow.resource_snapshot import build_snapshot, reset_tool_stats, tool_stats
+
+
+def test_snapshot_holds_only_agent_visible_text_files(tmp_path):
+    (tmp_path / "knowledge_base" / "code_sources").mkdir(parents=True)
+    (tmp_path / "knowledge_base" / "billing_codes.md").write_text("# Manual")
+    (tmp_path / "knowledge_base" / "code_store.arrow").write_bytes(b"\x00ARROW")
+    (tmp_path / "knowledge_base" / "code_sources" / "icd10cm_codes.txt").write_text("A00 Cholera")
+    (tmp_path / "handler.py").write_text("secret")
+
+    snapshot = build_snapshot(tmp_path)
+    assert snapshot.list(".") == ["knowledge_base/billing_codes.md"]
+    assert snapshot.read("./knowledge_base/../knowledge_base/billing_codes.md") == "# Manual"
+
+
+def test_tools_are_served_from_memory_without_walks_or_subprocesses():
+    reset_tool_stats()
+    with mock.patch.object(subprocess, "run", side_effect=AssertionError("no subprocesses")), \
+         mock.patch("pathlib.Path.glob", side_effect=AssertionError("no filesystem walks")):
+        assert "knowledge_base/billing_codes.md" in common_tools.list_git_files().splitlines()
+        assert common_tools.list_directory(".") == common_tools.list_directory("knowledge_base")
+        assert "J45.51" in common_tools.read_file("knowledge_base/billing_codes.md")
+        assert common_tools.read_file("handler.py").startswith("Error")
+        assert common_tools.list_directory("../")[0].startswith("Error")
+
+    stats = tool_stats()
+    assert stats["read_file"]["calls"] == 2 and stats["read_file"]["errors"] == 1
+    assert stats["list_directory"]["calls"] == 3 and stats["list_git_files"]["total_ms"] >= 0
+
+
+if __name__ == "__main__":
+    test_tools_are_served_from_memory_without_walks_or_subprocesses()
+    print("All resource snapshot checks passed.")
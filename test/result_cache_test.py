@@ -0,0 +1,45 @@
+import os
+import pathlib
+import sys
+from unittest import mock
+
+# Add parent directory to path so we can import the pipeline package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline import result_cache
+from pipeline.result_cache import cache_key
+
+
+def test_output_settings_and_the_code_store_change_the_key(tmp_path):
+    note = "3-year-old with left ear pain and fever."
+    code_store = tmp_path / "code_store.arrow"
+    code_store.write_bytes(b"codes v1")
+    with mock.patch.dict(os.environ, {"CODE_STORE_PATH": str(code_store)}), \
+         mock.patch.object(result_cache, "_source_files_cache", None):
+        base = cache_key(note)
+        assert cache_key(f"  {note}\n") == base
+
+        for name, value in (("STRUCTURED_OUTPUTS", "false"), ("MODEL_CASCADE_ENABLED", "false"),
+                            ("CASCADE_STRONG_MODEL", "gemini-3-pro"), ("PRELOAD_KNOWLEDGE", "false"),
+                            ("LOOP_CONVERGENCE_ENABLED", "false")):
+            with mock.patch.dict(os.environ, {name: value}):
+                assert cache_key(note) != base, name
+        assert cache_key(note) == base
+
+        code_store.write_bytes(b"codes v2, rebuilt")
+        assert cache_key(note) != base
+
+
+def test_source_files_are_globbed_once_per_process():
+    with mock.patch.object(result_cache, "_source_files_cache", None):
+        key = cache_key("Cough for three days.")
+        with mock.patch.object(pathlib.Path, "glob", side_effect=AssertionError("tree walked again")):
+            assert cache_key("Cough for three days.") == key
+
+
+if __name__ == "__main__":
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        test_output_settings_and_the_code_store_change_the_key(pathlib.Path(tmp))
+    test_source_files_are_globbed_once_per_process()
+    print("All result cache checks passed.")
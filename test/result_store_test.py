@@ -0,0 +1,58 @@
+import os
+import sys
+
+import boto3
+from moto import mock_aws
+
+# Add parent directory to path so we can import the pipeline package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline.result_store import ResultStore, summarize, truncate_error
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+RECORD = {
+    "billing_draft": {"primary_icd10": {"code": "H66.002", "description": "Acute suppurative otitis media, left ear"},
+                      "cpts": [{"code": "99213", "description": "Office visit"}]},
+    "audit": {"confidence_score": 95, "final_status": "APPROVED", "review_feedback": "x" * 50_000},
+}
+
+
+def test_small_results_stay_inline_and_compressed():
+    stored = ResultStore().encode("job-1", RECORD)
+    assert "resultRef" not in stored and stored["resultStoredBytes"] < stored["resultBytes"] // 10
+    assert stored["summary"] == {"finalStatus": "APPROVED", "score": 95, "icd10": ["H66.002"], "cpts": ["99213"]}
+    assert ResultStore().decode(stored) == RECORD
+
+
+@mock_aws
+def test_large_results_are_offloaded_to_s3_and_rehydrated():
+    s3 = boto3.client("s3", region_name="us-east-1")
+    s3.create_bucket(Bucket="rcm-results")
+    store = ResultStore(s3, bucket="rcm-results", inline_max_bytes=64)
+
+    stored = store.encode("job-2", RECORD)
+    assert "resultBody" not in stored and stored["resultRef"] == "s3://rcm-results/results/job-2.json.gz"
+    # The hot fields stay inline even though the body moved
+    assert stored["summary"]["cpts"] == ["99213"]
+    assert store.decode(stored) == RECORD
+
+
+def test_legacy_items_and_markdown_reports_still_decode():
+    assert ResultStore().decode({"result": "# [FINAL-ENCOUNTER-RECORD]"}) == "# [FINAL-ENCOUNTER-RECORD]"
+    report = "# [FINAL-ENCOUNTER-RECORD] Pediatric Associates\n\nFinal Confidence Score: 60\nFinal Status: REJECTED"
+    assert summarize(report) == {"finalStatus": "REJECTED", "score": 60.0, "icd10": [], "cpts": []}
+    assert summarize("* **Primary ICD-10:** J45.51\n* **Supporting CPTs:** 99214, 94640")["cpts"] == ["99214", "94640"]
+
+
+def test_error_text_is_capped():
+    assert truncate_error("boom") == "boom"
+    text = truncate_error(ValueError("e" * 5000), limit=100)
+    assert text.startswith("e" * 100) and text.endswith("[truncated 4900 chars]")
+
+
+if __name__ == "__main__":
+    test_small_results_stay_inline_and_compressed()
+    test_large_results_are_offloaded_to_s3_and_rehydrated()
+    test_legacy_items_and_markdown_reports_still_decode()
+    test_error_text_is_capped()
+    print("Result store checks passed.")
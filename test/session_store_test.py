@@ -0,0 +1,81 @@
+import asyncio
+import os
+import sys
+
+from google.adk.events import Event
+from google.adk.events.event_actions import EventActions
+from google.genai import types
+
+# Add parent directory to path so we can import the pipeline package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline.session_store import BoundedSessionService
+
+APP, USER = "pediatric-rcm-automation", "api-user"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def create(store, session_id, state=None):
+    return asyncio.run(store.create_session(app_name=APP, user_id=USER, session_id=session_id, state=state))
+
+
+def resident(store):
+    return sorted(session_id for _, _, session_id in store._resident)
+
+
+def event(text):
+    return Event(author="MedicalCoderAgent", content=types.Content(role="model", parts=[types.Part(text=text)]),
+                 actions=EventActions(state_delta={"x": 1}))
+
+
+def test_sessions_with_a_run_in_progress_are_never_evicted_for_capacity():
+    store = BoundedSessionService(max_sessions=2, max_age_seconds=600, clock=FakeClock())
+
+    async def pipeline(job_id):
+        session = await store.create_session(app_name=APP, user_id=USER, session_id=f"{job_id}#0")
+        for turn in range(3):
+            await asyncio.sleep(0)  # every run is mid-pipeline while the others create theirs
+            await store.append_event(session, event(f"turn {turn}"))
+        await store.delete_session(app_name=APP, user_id=USER, session_id=session.id)
+
+    async def run_all():
+        await asyncio.gather(*(pipeline(f"job-{i}") for i in range(4)))
+
+    # Concurrency 4 over a cap of 2: the cap is exceeded instead of cutting live runs short
+    asyncio.run(run_all())
+    assert store.stats() == {"resident_sessions": 0, "resident_bytes": 0, "evicted": 0}
+
+    # Workers raise the cap to the concurrency they run at
+    store.ensure_capacity(8)
+    assert store.max_sessions == 8
+    store.ensure_capacity(4)
+    assert store.max_sessions == 8
+
+
+def test_idle_sessions_expire_and_jobs_release_theirs():
+    clock = FakeClock()
+    store = BoundedSessionService(max_sessions=10, max_age_seconds=60, clock=clock)
+    create(store, "stale#0", state={"tech_spec": "x" * 1000})
+    assert store.stats()["resident_bytes"] > 1000
+
+    clock.now += 120
+    create(store, "job-1#0")
+    create(store, "job-1#1")
+    assert resident(store) == ["job-1#0", "job-1#1"]
+
+    assert store.release("job-1#") == 2
+    assert store.stats() == {"resident_sessions": 0, "resident_bytes": 0, "evicted": 1}
+    assert store.sessions[APP][USER] == {}
+
+
+if __name__ == "__main__":
+    test_sessions_with_a_run_in_progress_are_never_evicted_for_capacity()
+    test_idle_sessions_expire_and_jobs_release_theirs()
+    print("All session store checks passed.")